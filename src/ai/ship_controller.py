@@ -1,30 +1,39 @@
-
-
 import asyncio
-from datetime import UTC, datetime
+from typing import Callable, Optional
 from schemas.ship import Ship
-from utils.utils import console, format_time_ms
-from asyncio import create_task
 
 
 class ShipController():
-    def __init__(self, ship: Ship) -> None:
+    def __init__(self, ship: Ship, on_idle: Optional[Callable[["ShipController"], None]] = None) -> None:
         self.ship = ship
         self.busy = False
         self.ship.logger = self.ship.logger
         self.work_order = None
+        # whether the last work order ran to the end
+        self.succeeded = True
+        # called whenever the controller finishes a work order and can take a new one
+        self.on_idle = on_idle
+        self._has_work = asyncio.Event()
+
+    def assign(self, work_order) -> None:
+        self.work_order = work_order
+        self._has_work.set()
 
     async def run(self):
         self.ship.logger(f"{self.ship.symbol} CONTROLLER"
                          + "@{format_time_ms(datetime.now(UTC))}] Controller Running")
         while True:
-            await asyncio.sleep(0.2)
+            await self._has_work.wait()
+            self._has_work.clear()
             if self.work_order:
                 self.busy = True
                 self.ship.logger(f"{self.ship.symbol} CONTROLLER"
                          + "@{format_time_ms(datetime.now(UTC))}] Has Work Order")
-                if not await self.work_order.execute():
+                self.succeeded = await self.work_order.execute()
+                if not self.succeeded:
                     self.ship.logger(f"{self.ship.symbol} CONTROLLER"
                          + "@{format_time_ms(datetime.now(UTC))}] EXECUTION FAILED")
                 self.work_order = None
                 self.busy = False
+                if self.on_idle:
+                    self.on_idle(self)
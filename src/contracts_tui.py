@@ -1,4 +1,4 @@
-from login import CONTRACTS_BASE_URL, HEADERS,get, post
+from login import CONTRACTS_BASE_URL, HEADERS,get, post, run_async
 from schemas.contract import get_all_contracts, get_open_contracts
 from utils.utils import print_json
 import argparse
@@ -41,8 +41,8 @@ if __name__ == "__main__":
         print(f"Fulfilling contract: {args.fulfill}")
         print_json(fulfill_contract(args.fulfill))
     if args.open:
-        for contract in get_open_contracts():
+        for contract in run_async(get_open_contracts()):
             print(contract.model_dump_json(indent=2))       
     else:
-        for contract in get_all_contracts():
+        for contract in run_async(get_all_contracts()):
             print(contract.model_dump_json(indent=2))
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import logging
+from math import ceil
+from typing import List, Tuple
+
+from crud.crawl import CrawlTask, enqueue, frontier_counts, mark_done, mark_failed, pending_tasks, retry_failed
+from crud.db_executor import run_db
+from crud.market import async_refresh_market
+from crud.system import SYSTEM_PAGE_SIZE, async_fetch_systems_page, async_get_jump_gate_connections, store_systems
+from crud.waypoint import async_ingest_system_waypoints
+from login import run_async
+from utils.rate_limiter import Priority
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+
+
+async def _crawl_systems_page(page: str) -> bool:
+    if (result := await async_fetch_systems_page(int(page))) is None:
+        return False
+    systems, total = result
+    await run_db(store_systems, systems)
+    tasks = [(CrawlTask.SYSTEM, system.symbol) for system in systems]
+    if int(page) == 1:
+        # queue every page up front so a restart does not have to walk them again
+        tasks += [(CrawlTask.SYSTEMS_PAGE, str(p))
+                  for p in range(2, ceil(total / SYSTEM_PAGE_SIZE) + 1)]
+    await run_db(enqueue, tasks)
+    return True
+
+
+async def _crawl_system(system_symbol: str, markets: bool) -> bool:
+    if (waypoints := await async_ingest_system_waypoints(system_symbol, Priority.BACKGROUND)) is None:
+        return False
+    tasks = [(CrawlTask.JUMP_GATE, wp.symbol)
+             for wp in waypoints if wp.type == "JUMP_GATE"]
+    if markets:
+        tasks += [(CrawlTask.MARKET, wp.symbol)
+                  for wp in waypoints if wp.traits and wp.has_trait("MARKETPLACE")]
+    await run_db(enqueue, tasks)
+    return True
+
+
+async def _crawl(task: Tuple[CrawlTask, str], markets: bool) -> bool:
+    kind, symbol = task
+    try:
+        match kind:
+            case CrawlTask.SYSTEMS_PAGE:
+                return await _crawl_systems_page(symbol)
+            case CrawlTask.SYSTEM:
+                return await _crawl_system(symbol, markets)
+            case CrawlTask.MARKET:
+                return await async_refresh_market(symbol, Priority.BACKGROUND) is not None
+            case CrawlTask.JUMP_GATE:
+                return await async_get_jump_gate_connections(symbol) is not None
+    except Exception as e:
+        logger.error(f"crawling {kind} {symbol} failed: {e!r}")
+    return False
+
+
+async def crawl(workers: int = 4, markets: bool = True) -> None:
+    """Work through the crawl frontier until nothing is pending, safe to stop and restart at any point."""
+    await run_db(enqueue, [(CrawlTask.SYSTEMS_PAGE, "1")])
+    semaphore = asyncio.Semaphore(workers)
+
+    async def run(task):
+        async with semaphore:
+            return task, await _crawl(task, markets)
+
+    while batch := await run_db(pending_tasks, BATCH_SIZE):
+        done: List[Tuple[CrawlTask, str]] = []
+        failed: List[Tuple[CrawlTask, str]] = []
+        for task, ok in await asyncio.gather(*(run(task) for task in batch)):
+            (done if ok else failed).append(task)
+        await run_db(mark_done, done)
+        await run_db(mark_failed, failed)
+        logger.info(f"crawled {len(done)} tasks, {len(failed)} failed")
+    for (kind, status), n in sorted((await run_db(frontier_counts)).items()):
+        print(f"{kind:<14}{status:<10}{n}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(filename='data/logs/crawler.log', level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-w", "--workers", type=int, default=4)
+    parser.add_argument("--no-markets", action="store_true")
+    parser.add_argument("--retry-failed", action="store_true")
+    args = parser.parse_args()
+    if args.retry_failed:
+        retry_failed()
+    run_async(crawl(args.workers, not args.no_markets))
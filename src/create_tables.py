@@ -1,5 +1,21 @@
-from models import Base
+from os import path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
 from login import engine
-from models.waypoint import *
-from models.market import *
-Base.metadata.create_all(engine)
+
+ALEMBIC_INI = path.join(path.dirname(path.abspath(__file__)), "alembic.ini")
+
+
+def upgrade_database(revision: str = "head") -> None:
+    config = Config(ALEMBIC_INI)
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "waypoints" in tables and "alembic_version" not in tables:
+            # made by create_all before there were migrations, later revisions skip what already exists
+            command.stamp(config, "0001")
+        command.upgrade(config, revision)
+
+
+upgrade_database()
@@ -1,5 +1,21 @@
-from .modifiers import get_modifier, store_modifier
-from .traits import get_trait, store_trait
-from .market import get_market_with_symbol
-from .waypoint import get_waypoint_with_symbol, update_waypoint_cache, get_waypoints_in_system
-from datetime import timedelta
+from .modifiers import get_modifier, store_modifier, modifiers
+from .traits import get_trait, store_trait, traits
+from .tradegood import get_good, goods
+from .market import get_market_with_symbol, async_get_market_with_symbol, async_get_markets_in_system, async_get_markets_exporting, async_get_markets_importing, async_get_markets_exchanging, async_refresh_market, best_purchase_price, best_sell_price
+from .waypoint import get_waypoint_with_symbol, async_get_waypoint_with_symbol, update_waypoint_cache, get_waypoints_in_system, async_get_waypoints_in_system, upsert_waypoints, ingest_system_waypoints, async_ingest_system_waypoints
+
+__all__ = ["get_modifier", "store_modifier", "modifiers",
+           "get_trait", "store_trait", "traits",
+           "get_good", "goods",
+           "get_market_with_symbol", "async_get_market_with_symbol", "async_get_markets_in_system",
+           "async_get_markets_exporting", "async_get_markets_importing", "async_get_markets_exchanging",
+           "async_refresh_market", "best_purchase_price", "best_sell_price",
+           "get_waypoint_with_symbol", "async_get_waypoint_with_symbol", "update_waypoint_cache",
+           "get_waypoints_in_system", "async_get_waypoints_in_system", "upsert_waypoints",
+           "ingest_system_waypoints", "async_ingest_system_waypoints",
+           "load_reference_data"]
+
+
+def load_reference_data():
+    for registry in (traits, modifiers, goods):
+        registry.load()
@@ -0,0 +1,96 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from enum import StrEnum
+from threading import Lock
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Set
+from pydantic import BaseModel
+from utils.tasks import spawn
+from utils.utils import utcnow
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+class CacheState(StrEnum):
+    MISSING = "MISSING"
+    FRESH = "FRESH"
+    STALE = "STALE"
+    EXPIRED = "EXPIRED"
+
+
+class CachePolicy(BaseModel):
+    # rows younger than ttl are served as is
+    ttl: timedelta
+    # older rows are served while a background refresh runs, until they are older than max_stale
+    # (None serves them forever), past that callers wait for the server
+    max_stale: Optional[timedelta] = None
+    stale_while_revalidate: bool = True
+
+    def state(self, updated: Optional[datetime]) -> CacheState:
+        if updated is None:
+            return CacheState.MISSING
+        age = utcnow() - updated
+        if age < self.ttl:
+            return CacheState.FRESH
+        if self.stale_while_revalidate and (self.max_stale is None or age < self.max_stale):
+            return CacheState.STALE
+        return CacheState.EXPIRED
+
+
+CACHE_POLICIES: Dict[str, CachePolicy] = {
+    "waypoint": CachePolicy(ttl=timedelta(minutes=15)),
+    "market": CachePolicy(ttl=timedelta(minutes=1), max_stale=timedelta(minutes=30)),
+}
+
+
+def get_cache_policy(entity: str) -> CachePolicy:
+    return CACHE_POLICIES[entity]
+
+
+def set_cache_policy(entity: str, policy: CachePolicy) -> None:
+    CACHE_POLICIES[entity] = policy
+
+
+class Revalidator:
+    """Runs background refreshes of stale cache rows, at most one per key at a time."""
+
+    def __init__(self, workers: int = 2) -> None:
+        self._in_flight: Set[Hashable] = set()
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="revalidate")
+
+    def _claim(self, key: Hashable) -> bool:
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+            return True
+
+    def _release(self, key: Hashable, result) -> None:
+        with self._lock:
+            self._in_flight.discard(key)
+        if isinstance(result, Future) and (e := result.exception()):
+            logger.error(f"refreshing {key} failed: {e!r}")
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._in_flight
+
+    def submit(self, key: Hashable, f: Callable, *args) -> bool:
+        """Refresh on the worker threads, for sync callers. False if key is already being refreshed."""
+        if not self._claim(key):
+            return False
+        self._executor.submit(f, *args).add_done_callback(
+            lambda future: self._release(key, future))
+        return True
+
+    def spawn(self, key: Hashable, f: Callable[..., Awaitable], *args) -> bool:
+        """Refresh as a task on the running loop, for async callers. False if key is already being refreshed."""
+        if not self._claim(key):
+            return False
+        spawn(f(*args), name=f"revalidate {key}").add_done_callback(
+            lambda _: self._release(key, None))
+        return True
+
+
+revalidator = Revalidator()
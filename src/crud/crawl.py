@@ -0,0 +1,90 @@
+from enum import StrEnum
+from typing import Iterable, List, Tuple
+from sqlalchemy import case, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from login import engine
+from models.crawl import CrawlTaskModel
+from utils.utils import utcnow
+
+MAX_ATTEMPTS = 3
+
+
+class CrawlTask(StrEnum):
+    SYSTEMS_PAGE = "SYSTEMS_PAGE"
+    SYSTEM = "SYSTEM"
+    MARKET = "MARKET"
+    JUMP_GATE = "JUMP_GATE"
+
+
+class CrawlStatus(StrEnum):
+    PENDING = "PENDING"
+    DONE = "DONE"
+    FAILED = "FAILED"
+
+
+# finish the map before filling in markets and gates
+_KIND_ORDER = case({kind: i for i, kind in enumerate(CrawlTask)},
+                   value=CrawlTaskModel.kind, else_=len(CrawlTask))
+
+
+def enqueue(tasks: Iterable[Tuple[CrawlTask, str]]) -> None:
+    """Add tasks to the frontier, tasks already known keep their status."""
+    now = utcnow()
+    rows = [{"kind": kind, "symbol": symbol, "status": CrawlStatus.PENDING, "attempts": 0, "time_updated": now}
+            for kind, symbol in dict.fromkeys(tasks)]
+    if not rows:
+        return
+    with Session(engine) as session:
+        session.execute(insert(CrawlTaskModel).on_conflict_do_nothing(), rows)
+        session.commit()
+
+
+def pending_tasks(limit: int = 100) -> List[Tuple[CrawlTask, str]]:
+    stmt = select(CrawlTaskModel.kind, CrawlTaskModel.symbol).where(
+        CrawlTaskModel.status == CrawlStatus.PENDING).order_by(_KIND_ORDER).limit(limit)
+    with Session(engine) as session:
+        return [(CrawlTask(kind), symbol) for kind, symbol in session.execute(stmt)]
+
+
+def mark_done(tasks: Iterable[Tuple[CrawlTask, str]]) -> None:
+    _set_status(tasks, CrawlStatus.DONE)
+
+
+def mark_failed(tasks: Iterable[Tuple[CrawlTask, str]]) -> None:
+    """Count a failed attempt, tasks stay pending until they used up MAX_ATTEMPTS."""
+    tasks = list(tasks)
+    if not tasks:
+        return
+    with Session(engine) as session:
+        for kind, symbol in tasks:
+            session.execute(update(CrawlTaskModel).where(CrawlTaskModel.kind == kind, CrawlTaskModel.symbol == symbol)
+                            .values(attempts=CrawlTaskModel.attempts + 1, time_updated=utcnow(),
+                                    status=case((CrawlTaskModel.attempts + 1 >= MAX_ATTEMPTS, CrawlStatus.FAILED.value),
+                                                else_=CrawlStatus.PENDING.value)))
+        session.commit()
+
+
+def retry_failed() -> None:
+    with Session(engine) as session:
+        session.execute(update(CrawlTaskModel).where(CrawlTaskModel.status == CrawlStatus.FAILED)
+                        .values(status=CrawlStatus.PENDING, attempts=0))
+        session.commit()
+
+
+def frontier_counts() -> dict:
+    stmt = select(CrawlTaskModel.kind, CrawlTaskModel.status, func.count()).group_by(
+        CrawlTaskModel.kind, CrawlTaskModel.status)
+    with Session(engine) as session:
+        return {(kind, status): n for kind, status, n in session.execute(stmt)}
+
+
+def _set_status(tasks: Iterable[Tuple[CrawlTask, str]], status: CrawlStatus) -> None:
+    now = utcnow()
+    rows = [{"kind": kind, "symbol": symbol, "status": status, "time_updated": now} for kind, symbol in tasks]
+    if not rows:
+        return
+    with Session(engine) as session:
+        session.execute(update(CrawlTaskModel), rows)
+        session.commit()
@@ -0,0 +1,48 @@
+import threading
+from time import monotonic
+from typing import Dict, Optional, Tuple
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from login import engine
+from models.data_version import DataVersionModel
+
+# how long a version read from the database is trusted, bounds how late a change
+# committed by another process (a shard, the crawler) is noticed
+VERSION_RECHECK_SECONDS = 5.0
+
+_seen: Dict[str, Tuple[int, float]] = {}
+_lock = threading.Lock()
+
+
+def peek_version(scope: str) -> Optional[int]:
+    """The version last read for scope if it is still trusted, None when the database has to be asked."""
+    with _lock:
+        seen = _seen.get(scope)
+    if seen is not None and monotonic() - seen[1] < VERSION_RECHECK_SECONDS:
+        return seen[0]
+    return None
+
+
+def get_version(scope: str) -> int:
+    if (version := peek_version(scope)) is not None:
+        return version
+    with Session(engine) as session:
+        version = session.scalar(select(DataVersionModel.version).where(DataVersionModel.scope == scope)) or 0
+    with _lock:
+        _seen[scope] = version, monotonic()
+    return version
+
+
+def bump_version(scope: str, session: Session) -> None:
+    """Count a change of scope in session's transaction, call forget_version once it committed."""
+    stmt = insert(DataVersionModel).values(scope=scope, version=1)
+    session.execute(stmt.on_conflict_do_update(index_elements=[DataVersionModel.scope],
+                                               set_={"version": DataVersionModel.version + 1}))
+
+
+def forget_version(scope: str) -> None:
+    # this process made the change, it should not wait for the recheck to see it
+    with _lock:
+        _seen.pop(scope, None)
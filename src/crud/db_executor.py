@@ -0,0 +1,19 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, TypeVar
+
+T = TypeVar("T")
+
+# one thread owns every session opened from async code: sqlite takes one writer at a time anyway,
+# and the event loop never waits on a query or a commit
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+
+
+async def run_db(f: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking crud call on the database thread and await its result."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, partial(f, *args, **kwargs))
+
+
+def shutdown() -> None:
+    _executor.shutdown(wait=True)
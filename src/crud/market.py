@@ -1,44 +1,113 @@
 
 
-from datetime import timedelta
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Tuple
 from sqlalchemy import select
-from crud.tradegood import get_good, get_good_model
-from crud.transaction import get_transaction, store_transaction
-from models.market import MarketModel, TradeGoodModel
+from sqlalchemy.dialects.sqlite import insert
+from crud.tradegood import get_good_model, goods
+from crud.cache_policy import CacheState, get_cache_policy, revalidator
+from crud.db_executor import run_db
+from crud.price_history import append_price_history
+from crud.transaction import store_transactions
+from models.market import MarketModel, MarketTradeGoodModel, TradeGoodModel
 from models.waypoint import WaypointModel
-from schemas.market import Market
-from sqlalchemy.orm import Session
-from login import HEADERS, SYSTEM_BASE_URL, engine, get
+from schemas.market import Market, MarketTradeGood
+from sqlalchemy.orm import Session, selectinload
+from utils.rate_limiter import Priority
+from login import HEADERS, SYSTEM_BASE_URL, async_get, engine, get
 from utils.utils import system_symbol_from_wp_symbol, utcnow
 from logging import getLogger
 logger = getLogger(__name__)
-STALE_TIME = timedelta(minutes=1)
+# relationships _record_to_schema reads, loaded up front in one query each
+# transactions are left out, they only ever grow, history is read through crud.price_history
+_MARKET_LOAD_OPTIONS = (selectinload(MarketModel.exports),
+                        selectinload(MarketModel.imports),
+                        selectinload(MarketModel.exchanges),
+                        selectinload(MarketModel.trade_goods))
 
 
 def get_market_with_symbol(symbol: str):
     logger.info(f"getting market with symbol {symbol}")
+    cached, updated = _read_market(symbol)
+    match get_cache_policy("market").state(updated):
+        case CacheState.FRESH:
+            logger.info("fresh from cache")
+            return cached
+        case CacheState.STALE:
+            logger.info("stale in cache, refreshing in the background")
+            revalidator.submit(("market", symbol), _refresh_market, symbol)
+            return cached
+    logger.info("updating cache")
+    fresh_market = _get_market_from_server(symbol, Priority.NORMAL)
+    if fresh_market is None:
+        return cached
+    return _write_market(fresh_market)
+
+
+async def async_get_market_with_symbol(symbol: str):
+    logger.info(f"getting market with symbol {symbol}")
+    cached, updated = await run_db(_read_market, symbol)
+    match get_cache_policy("market").state(updated):
+        case CacheState.FRESH:
+            logger.info("fresh from cache")
+            return cached
+        case CacheState.STALE:
+            logger.info("stale in cache, refreshing in the background")
+            revalidator.spawn(("market", symbol), _async_refresh_market, symbol)
+            return cached
+    logger.info("updating cache")
+    fresh_market = await _async_get_market_from_server(symbol, Priority.NORMAL)
+    if fresh_market is None:
+        return cached
+    return await run_db(_write_market, fresh_market)
+
+
+def _refresh_market(symbol: str) -> None:
+    if (fresh_market := _get_market_from_server(symbol, Priority.BACKGROUND)) is not None:
+        _write_market(fresh_market)
+
+
+async def _async_refresh_market(symbol: str) -> None:
+    if (fresh_market := await _async_get_market_from_server(symbol, Priority.BACKGROUND)) is not None:
+        await run_db(_write_market, fresh_market)
+
+
+async def async_get_markets_in_system(system: str) -> List[Market]:
+    return await run_db(get_markets_in_system, system)
+
+
+async def async_get_markets_exporting(good: str, system: Optional[str] = None) -> List[Market]:
+    return await run_db(get_markets_exporting, good, system)
+
+
+async def async_get_markets_importing(good: str, system: Optional[str] = None) -> List[Market]:
+    return await run_db(get_markets_importing, good, system)
+
+
+async def async_get_markets_exchanging(good: str, system: Optional[str] = None) -> List[Market]:
+    return await run_db(get_markets_exchanging, good, system)
+
+
+def _read_market(symbol: str) -> Tuple[Optional[Market], Optional[datetime]]:
+    """The cached market and when it was last updated, or None, None."""
     with Session(engine) as session:
         if market := _get_market_from_db(symbol, session):
-            if utcnow() - market.time_updated_utc < STALE_TIME:
-                logger.info("fresh from cache")
-                return _record_to_schema(market)
-            else:
-                logger.info("updating cache")
-                
-                fresh_market = _get_market_from_server(symbol)
-                return _record_to_schema(_update_market_in_db(market, fresh_market, session))
-        logger.info("fresh from cache")
-        fresh_market = _get_market_from_server(symbol)
-        market = _record_to_schema(_store_market_in_db(fresh_market, session))
-        return market
+            return _record_to_schema(market), market.time_updated_utc
+    return None, None
+
+
+def _write_market(fresh_market: Market) -> Market:
+    with Session(engine) as session:
+        if market := _get_market_from_db(fresh_market.symbol, session):
+            return _record_to_schema(_update_market_in_db(market, fresh_market, session))
+        return _record_to_schema(_store_market_in_db(fresh_market, session))
 
 
 def get_markets_in_system(system: str) -> List[Market]:
     stmt = select(MarketModel).join(WaypointModel).where(
         WaypointModel.systemSymbol == system)
     with Session(engine) as session:
-        return [_record_to_schema(x) for x in session.scalars(stmt)]
+        return [_record_to_schema(x) for x in session.scalars(stmt.options(*_MARKET_LOAD_OPTIONS))]
 
 
 def get_markets_exporting(good: str, system: Optional[str] = None) -> List[Market]:
@@ -50,7 +119,7 @@ def get_markets_exporting(good: str, system: Optional[str] = None) -> List[Marke
         stmt = select(MarketModel).where(
             MarketModel.exports.any(TradeGoodModel.symbol == good))
     with Session(engine) as session:
-        return [_record_to_schema(x) for x in session.scalars(stmt)]
+        return [_record_to_schema(x) for x in session.scalars(stmt.options(*_MARKET_LOAD_OPTIONS))]
 
 
 def get_markets_importing(good: str, system: Optional[str] = None) -> List[Market]:
@@ -62,7 +131,7 @@ def get_markets_importing(good: str, system: Optional[str] = None) -> List[Marke
         stmt = select(MarketModel).where(
             MarketModel.imports.any(TradeGoodModel.symbol == good))
     with Session(engine) as session:
-        return [_record_to_schema(x) for x in session.scalars(stmt)]
+        return [_record_to_schema(x) for x in session.scalars(stmt.options(*_MARKET_LOAD_OPTIONS))]
 
 
 def get_markets_exchanging(good: str, system: Optional[str] = None) -> List[Market]:
@@ -74,7 +143,7 @@ def get_markets_exchanging(good: str, system: Optional[str] = None) -> List[Mark
         stmt = select(MarketModel).where(
             MarketModel.exchanges.any(TradeGoodModel.symbol == good))
     with Session(engine) as session:
-        return [_record_to_schema(x) for x in session.scalars(stmt)]
+        return [_record_to_schema(x) for x in session.scalars(stmt.options(*_MARKET_LOAD_OPTIONS))]
 
 
 def _record_to_schema(market: MarketModel) -> Market:
@@ -82,14 +151,52 @@ def _record_to_schema(market: MarketModel) -> Market:
         return None
     return Market(
         symbol=market.symbol,
-        exports=[get_good(good.symbol) for good in market.exports],
-        imports=[get_good(good.symbol) for good in market.imports],
-        exchange=[get_good(good.symbol) for good in market.exchanges],
-        transactions=[get_transaction(
-            trans.ship_symbol, trans.time_stamp) for trans in market.transactions if trans]
+        exports=[goods.intern(good) for good in market.exports],
+        imports=[goods.intern(good) for good in market.imports],
+        exchange=[goods.intern(good) for good in market.exchanges],
+        tradeGoods=[_trade_good_to_schema(good)
+                    for good in market.trade_goods] or None
+    )
+
+
+def _trade_good_to_schema(good: MarketTradeGoodModel) -> MarketTradeGood:
+    return MarketTradeGood(
+        symbol=good.good_symbol,
+        type=good.type,
+        tradeVolume=good.trade_volume,
+        supply=good.supply,
+        activity=good.activity,
+        purchasePrice=good.purchase_price,
+        sellPrice=good.sell_price
     )
 
 
+def _trade_good_row(market_symbol: str, good: MarketTradeGood, now) -> dict:
+    return {"market_symbol": market_symbol,
+            "good_symbol": good.symbol,
+            "type": good.type,
+            "trade_volume": good.tradeVolume,
+            "supply": good.supply,
+            "activity": good.activity,
+            "purchase_price": good.purchasePrice,
+            "sell_price": good.sellPrice,
+            "time_updated": now}
+
+
+def _store_trade_goods(market_symbol: str, trade_goods: List[MarketTradeGood], session: Session) -> None:
+    # only markets with a ship present report prices, one upsert writes the whole snapshot
+    if not trade_goods:
+        return
+    now = utcnow()
+    rows = [_trade_good_row(market_symbol, good, now) for good in trade_goods]
+    stmt = insert(MarketTradeGoodModel)
+    stmt = stmt.on_conflict_do_update(index_elements=[MarketTradeGoodModel.market_symbol, MarketTradeGoodModel.good_symbol],
+                                      set_={key: stmt.excluded[key] for key in rows[0]
+                                            if key not in ("market_symbol", "good_symbol")})
+    session.execute(stmt, rows)
+    append_price_history(market_symbol, trade_goods, session, now)
+
+
 def _store_market_in_db(market: Market, session: Session) -> MarketModel:
     new_market = MarketModel()
     new_market.symbol = market.symbol
@@ -100,27 +207,84 @@ def _store_market_in_db(market: Market, session: Session) -> MarketModel:
         good, session) for good in market.exports]
     new_market.exchanges = [get_good_model(good, session)
                             for good in market.exchange]
-    if market.transactions:
-        new_market.transactions = [store_transaction(
-            trans, session) for trans in market.transactions]
-    else:
-        new_market.transactions = []
+    session.flush()
+    store_transactions(market.transactions, session)
+    _store_trade_goods(market.symbol, market.tradeGoods, session)
     session.commit()
     return new_market
 
 
 def _update_market_in_db(db_market: MarketModel, market: Market, session: Session) -> MarketModel:
-    if market.transactions:
-        db_market.transactions = [store_transaction(trans, session)
-                                  for trans in market.transactions]
+    store_transactions(market.transactions, session)
+    _store_trade_goods(db_market.symbol, market.tradeGoods, session)
     db_market.time_updated = utcnow()
     session.commit()
     return db_market
 
 
-def _get_market_from_server(symbol: str) -> Optional[Market]:
-    response = get(f"{SYSTEM_BASE_URL}/{system_symbol_from_wp_symbol(symbol)
-                                        }/waypoints/{symbol}/market", headers=HEADERS)
+async def async_refresh_market(symbol: str, priority: Priority = Priority.NORMAL, force: bool = True) -> Optional[Market]:
+    """Fetch the market even if the cached copy is fresh, used while a ship is docked there and prices are visible.
+
+    Without force a copy still inside the cache ttl is returned instead.
+    """
+    if not force:
+        cached, updated = await run_db(_read_market, symbol)
+        if get_cache_policy("market").state(updated) == CacheState.FRESH:
+            return cached
+    if (fresh_market := await _async_get_market_from_server(symbol, priority)) is None:
+        return None
+    return await run_db(_write_market, fresh_market)
+
+
+def _price_stmt(good: str, system: Optional[str], price):
+    stmt = select(MarketTradeGoodModel.market_symbol, price).where(
+        MarketTradeGoodModel.good_symbol == good)
+    if system:
+        stmt = stmt.join(WaypointModel, WaypointModel.symbol == MarketTradeGoodModel.market_symbol).where(
+            WaypointModel.systemSymbol == system)
+    return stmt
+
+
+def best_purchase_price(good: str, system: Optional[str] = None) -> Optional[Tuple[str, int]]:
+    """Cheapest known market to buy good at, as (market symbol, price per unit)."""
+    stmt = _price_stmt(good, system, MarketTradeGoodModel.purchase_price).order_by(
+        MarketTradeGoodModel.purchase_price).limit(1)
+    with Session(engine) as session:
+        row = session.execute(stmt).first()
+    return tuple(row) if row else None
+
+
+def best_sell_price(good: str, system: Optional[str] = None) -> Optional[Tuple[str, int]]:
+    """Best paying known market to sell good at, as (market symbol, price per unit)."""
+    stmt = _price_stmt(good, system, MarketTradeGoodModel.sell_price).order_by(
+        MarketTradeGoodModel.sell_price.desc()).limit(1)
+    with Session(engine) as session:
+        row = session.execute(stmt).first()
+    return tuple(row) if row else None
+
+
+def get_trade_goods_in_system(system: str) -> List[Tuple[str, MarketTradeGood]]:
+    stmt = select(MarketTradeGoodModel).join(WaypointModel, WaypointModel.symbol == MarketTradeGoodModel.market_symbol).where(
+        WaypointModel.systemSymbol == system)
+    with Session(engine) as session:
+        return [(good.market_symbol, _trade_good_to_schema(good)) for good in session.scalars(stmt)]
+
+
+def get_trade_price_rows(system: str) -> List[Tuple[str, str, int, int, int]]:
+    """(market, good, purchase price, sell price, trade volume) for every priced good in system."""
+    stmt = select(MarketTradeGoodModel.market_symbol, MarketTradeGoodModel.good_symbol, MarketTradeGoodModel.purchase_price,
+                  MarketTradeGoodModel.sell_price, MarketTradeGoodModel.trade_volume).join(
+        WaypointModel, WaypointModel.symbol == MarketTradeGoodModel.market_symbol).where(WaypointModel.systemSymbol == system)
+    with Session(engine) as session:
+        return [tuple(row) for row in session.execute(stmt)]
+
+
+def _market_url(symbol: str) -> str:
+    return f"{SYSTEM_BASE_URL}/{system_symbol_from_wp_symbol(symbol)}/waypoints/{symbol}/market"
+
+
+def _get_market_from_server(symbol: str, priority: Priority = Priority.NORMAL) -> Optional[Market]:
+    response = get(_market_url(symbol), priority, headers=HEADERS)
     if response.ok:
         js = response.json()
         return Market.model_validate(js["data"])
@@ -128,5 +292,15 @@ def _get_market_from_server(symbol: str) -> Optional[Market]:
         return None
 
 
+async def _async_get_market_from_server(symbol: str, priority: Priority = Priority.NORMAL) -> Optional[Market]:
+    response = await async_get(_market_url(symbol), priority, headers=HEADERS)
+    if response.is_success:
+        js = response.json()
+        return Market.model_validate(js["data"])
+    else:
+        return None
+
+
 def _get_market_from_db(symbol: str, session):
-    return session.scalars(select(MarketModel).where(MarketModel.symbol == symbol)).first()
+    return session.scalars(select(MarketModel).where(MarketModel.symbol == symbol)
+                           .options(*_MARKET_LOAD_OPTIONS)).first()
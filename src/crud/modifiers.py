@@ -1,27 +1,27 @@
-from login import engine
+from crud.registry import Registry
 from models.waypoint import ModifierModel
 from schemas.navigation import WaypointModifier
 from sqlalchemy.orm import Session
 
 def get_modifier(symbol: str):
-    return _record_to_schema(_get_modifier(symbol))
+    return modifiers.get(symbol)
 
 
 def store_modifier(trait: WaypointModifier, session: Session) -> ModifierModel:
-    if t := _get_modifier(trait.symbol):
+    if t := _get_modifier(trait.symbol, session):
+        modifiers.intern(t)
         return t
     t = ModifierModel()
     t.symbol = trait.symbol
     t.name = trait.name
     t.description = trait.description
     session.add(t)
-    session.commit()
+    modifiers.intern(t)
     return t
 
 
-def _get_modifier(symbol: str):
-    with Session(engine) as session:
-        return session.query(ModifierModel).filter(ModifierModel.symbol == symbol).first()
+def _get_modifier(symbol: str, session: Session):
+    return session.get(ModifierModel, symbol)
 
 
 def _record_to_schema(record: ModifierModel) -> WaypointModifier:
@@ -32,3 +32,6 @@ def _record_to_schema(record: ModifierModel) -> WaypointModifier:
         name=record.name,
         description=record.description
     )
+
+
+modifiers = Registry(ModifierModel, _record_to_schema)
@@ -0,0 +1,95 @@
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from login import engine
+from models.market import MarketPriceHistoryModel
+from models.waypoint import WaypointModel
+from schemas.market import MarketTradeGood
+from utils.utils import utcnow
+
+SUPPLY_LEVELS = ["SCARCE", "LIMITED", "MODERATE", "HIGH", "ABUNDANT"]
+_SUPPLY_CODES = {supply: code for code, supply in enumerate(SUPPLY_LEVELS)}
+
+PRICE_HISTORY_DTYPE = np.dtype([
+    ("market", "S20"),  # symbols are ascii, bytes take a quarter of the space of str
+    ("good", "S30"),
+    ("time_stamp", "datetime64[s]"),
+    ("purchase_price", np.int32),
+    ("sell_price", np.int32),
+    ("supply", np.int8),  # index into SUPPLY_LEVELS, -1 when unknown
+    ("trade_volume", np.int32),
+])
+
+
+def append_price_history(market_symbol: str, trade_goods: List[MarketTradeGood], session: Session,
+                         time_stamp: Optional[datetime] = None) -> None:
+    if not trade_goods:
+        return
+    time_stamp = time_stamp or utcnow()
+    session.execute(insert(MarketPriceHistoryModel), [
+        {"market_symbol": market_symbol,
+         "good_symbol": good.symbol,
+         "time_stamp": time_stamp,
+         "purchase_price": good.purchasePrice,
+         "sell_price": good.sellPrice,
+         "supply": good.supply,
+         "trade_volume": good.tradeVolume} for good in trade_goods])
+
+
+def get_price_history(good: Optional[str] = None, market: Optional[str] = None, system: Optional[str] = None,
+                      since: Optional[datetime] = None, until: Optional[datetime] = None) -> np.ndarray:
+    """Price snapshots as a structured array with PRICE_HISTORY_DTYPE, oldest first."""
+    h = MarketPriceHistoryModel
+    stmt = select(h.market_symbol, h.good_symbol, h.time_stamp, h.purchase_price,
+                  h.sell_price, h.supply, h.trade_volume)
+    if good:
+        stmt = stmt.where(h.good_symbol == good)
+    if market:
+        stmt = stmt.where(h.market_symbol == market)
+    if system:
+        stmt = stmt.join(WaypointModel, WaypointModel.symbol == h.market_symbol).where(
+            WaypointModel.systemSymbol == system)
+    if since:
+        stmt = stmt.where(h.time_stamp >= since)
+    if until:
+        stmt = stmt.where(h.time_stamp < until)
+    stmt = stmt.order_by(h.time_stamp)
+    with Session(engine) as session:
+        rows = session.execute(stmt).all()
+    history = np.empty(len(rows), dtype=PRICE_HISTORY_DTYPE)
+    if not rows:
+        return history
+    markets, goods, stamps, purchase, sell, supply, volume = zip(*rows)
+    history["market"] = markets
+    history["good"] = goods
+    history["time_stamp"] = np.array(stamps, dtype="datetime64[s]")
+    history["purchase_price"] = purchase
+    history["sell_price"] = sell
+    history["supply"] = [_SUPPLY_CODES.get(s, -1) for s in supply]
+    history["trade_volume"] = volume
+    return history
+
+
+def export_price_history_parquet(path: str, **filters) -> int:
+    """Write get_price_history(**filters) to a parquet file, returns the number of rows written."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError(
+            "parquet export needs pyarrow, install it with `pip install pyarrow`") from e
+    history = get_price_history(**filters)
+    table = pa.table({
+        "market": pa.array(history["market"]).dictionary_encode(),
+        "good": pa.array(history["good"]).dictionary_encode(),
+        "time_stamp": pa.array(history["time_stamp"]),
+        "purchase_price": pa.array(history["purchase_price"]),
+        "sell_price": pa.array(history["sell_price"]),
+        "supply": pa.array(history["supply"]),
+        "trade_volume": pa.array(history["trade_volume"]),
+    })
+    pq.write_table(table, path, compression="zstd")
+    return len(history)
@@ -0,0 +1,61 @@
+from threading import Lock
+from typing import Callable, Dict, Generic, Optional, Type, TypeVar
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from login import engine
+
+Record = TypeVar("Record")
+Schema = TypeVar("Schema")
+
+
+class Registry(Generic[Record, Schema]):
+    """Process wide symbol -> schema map for reference tables that never change once the api reports them.
+
+    The table is read once on first use, afterwards lookups never touch the database and every caller
+    gets the same frozen schema instance for a symbol.
+    """
+
+    def __init__(self, model: Type[Record], to_schema: Callable[[Record], Schema]) -> None:
+        self.model = model
+        self.to_schema = to_schema
+        self._entries: Dict[str, Schema] = {}
+        self._loaded = False
+        self._lock = Lock()
+
+    def load(self) -> None:
+        with self._lock:
+            if self._loaded:
+                return
+            with Session(engine) as session:
+                for record in session.scalars(select(self.model)):
+                    self._entries.setdefault(
+                        record.symbol, self.to_schema(record))
+            self._loaded = True
+
+    def get(self, symbol: str) -> Optional[Schema]:
+        if not self._loaded:
+            self.load()
+        if (entry := self._entries.get(symbol)) is not None:
+            return entry
+        # another process may have stored it since we loaded
+        with Session(engine) as session:
+            if record := session.get(self.model, symbol):
+                return self.intern(record)
+        return None
+
+    def intern(self, record: Record) -> Schema:
+        if (entry := self._entries.get(record.symbol)) is not None:
+            return entry
+        with self._lock:
+            return self._entries.setdefault(record.symbol, self.to_schema(record))
+
+    def __contains__(self, symbol: str) -> bool:
+        if not self._loaded:
+            self.load()
+        return symbol in self._entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._loaded = False
@@ -0,0 +1,139 @@
+from typing import List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from crud.data_version import bump_version, forget_version, get_version
+from crud.db_executor import run_db
+from login import HEADERS, SYSTEM_BASE_URL, async_get, engine, get
+from models.system import JumpGateConnectionModel, JumpGateModel, SystemModel
+from schemas.navigation import System
+from utils.rate_limiter import Priority
+from utils.utils import system_symbol_from_wp_symbol, utcnow
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+SYSTEM_PAGE_SIZE = 20
+
+_system_list = TypeAdapter(List[System])
+GALAXY_SCOPE = "galaxy"
+
+
+def galaxy_data_version() -> int:
+    """Counts changes to systems and jump gates, in every process."""
+    return get_version(GALAXY_SCOPE)
+
+
+def _system_row(system: System) -> dict:
+    gate = next((wp.symbol for wp in system.waypoints if wp.type == "JUMP_GATE"), None)
+    return {"symbol": system.symbol,
+            "sectorSymbol": system.sectorSymbol,
+            "system_type": system.type,
+            "x": system.x,
+            "y": system.y,
+            "jump_gate_symbol": gate,
+            "time_updated": utcnow()}
+
+
+def store_systems(systems: List[System]) -> None:
+    rows = [_system_row(system) for system in systems]
+    if not rows:
+        return
+    stmt = insert(SystemModel)
+    stmt = stmt.on_conflict_do_update(index_elements=[SystemModel.symbol],
+                                      set_={key: stmt.excluded[key] for key in rows[0] if key != "symbol"})
+    with Session(engine) as session:
+        session.execute(stmt, rows)
+        bump_version(GALAXY_SCOPE, session)
+        session.commit()
+    forget_version(GALAXY_SCOPE)
+
+
+def store_jump_gate(gate_symbol: str, connections: List[str]) -> None:
+    with Session(engine) as session:
+        gate = session.get(JumpGateModel, gate_symbol)
+        if not gate:
+            gate = JumpGateModel(symbol=gate_symbol,
+                                 system_symbol=system_symbol_from_wp_symbol(gate_symbol))
+            session.add(gate)
+        gate.connections = [JumpGateConnectionModel(connection_symbol=symbol)
+                            for symbol in connections]
+        gate.time_updated = utcnow()
+        bump_version(GALAXY_SCOPE, session)
+        session.commit()
+    forget_version(GALAXY_SCOPE)
+
+
+def get_jump_gate_connections(gate_symbol: str) -> Optional[List[str]]:
+    if (connections := _get_jump_gate_from_db(gate_symbol)) is not None:
+        return connections
+    if (connections := _get_jump_gate_from_server(gate_symbol)) is None:
+        return None
+    store_jump_gate(gate_symbol, connections)
+    return connections
+
+
+async def async_get_jump_gate_connections(gate_symbol: str) -> Optional[List[str]]:
+    if (connections := await run_db(_get_jump_gate_from_db, gate_symbol)) is not None:
+        return connections
+    if (connections := await _async_get_jump_gate_from_server(gate_symbol)) is None:
+        return None
+    await run_db(store_jump_gate, gate_symbol, connections)
+    return connections
+
+
+def get_system_rows() -> List[Tuple[str, int, int, Optional[str]]]:
+    with Session(engine) as session:
+        return [tuple(row) for row in session.execute(
+            select(SystemModel.symbol, SystemModel.x, SystemModel.y, SystemModel.jump_gate_symbol))]
+
+
+def get_jump_connection_rows() -> List[Tuple[str, str, str]]:
+    stmt = select(JumpGateModel.system_symbol, JumpGateConnectionModel.gate_symbol,
+                  JumpGateConnectionModel.connection_symbol).join(JumpGateConnectionModel.gate)
+    with Session(engine) as session:
+        return [tuple(row) for row in session.execute(stmt)]
+
+
+def _get_jump_gate_from_db(gate_symbol: str) -> Optional[List[str]]:
+    with Session(engine) as session:
+        if gate := session.get(JumpGateModel, gate_symbol):
+            return [connection.connection_symbol for connection in gate.connections]
+    return None
+
+
+def _jump_gate_url(gate_symbol: str) -> str:
+    return f"{SYSTEM_BASE_URL}/{system_symbol_from_wp_symbol(gate_symbol)}/waypoints/{gate_symbol}/jump-gate"
+
+
+def _get_jump_gate_from_server(gate_symbol: str) -> Optional[List[str]]:
+    response = get(_jump_gate_url(gate_symbol),
+                   Priority.BACKGROUND, headers=HEADERS)
+    if response.ok:
+        return response.json()["data"]["connections"]
+    logger.info(response)
+    return None
+
+
+async def _async_get_jump_gate_from_server(gate_symbol: str) -> Optional[List[str]]:
+    response = await async_get(_jump_gate_url(gate_symbol), Priority.BACKGROUND, headers=HEADERS)
+    if response.is_success:
+        return response.json()["data"]["connections"]
+    logger.info(response)
+    return None
+
+
+async def async_fetch_systems_page(page: int, priority: Priority = Priority.BACKGROUND) -> Optional[Tuple[List[System], int]]:
+    """One page of /systems and the total number of systems in the galaxy."""
+    response = await async_get(f"{SYSTEM_BASE_URL}?page={page}&limit={SYSTEM_PAGE_SIZE}", priority, headers=HEADERS)
+    if not response.is_success:
+        logger.info(response)
+        return None
+    js = response.json()
+    try:
+        return _system_list.validate_python(js["data"]), js["meta"]["total"]
+    except ValidationError as e:
+        logger.info(e)
+        return None
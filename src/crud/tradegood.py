@@ -1,22 +1,23 @@
-from sqlalchemy import select
 from sqlalchemy.orm import Session
+from crud.registry import Registry
 from login import engine
 from models.market import TradeGoodModel
 from schemas.market import Good
 
 
 def get_good(symbol: str):
-    with Session(engine) as session:
-        return _record_to_schema(_get_trade_good(symbol, session))
+    return goods.get(symbol)
 
 
 def get_good_model(good: Good, session) -> TradeGoodModel:
     if g := _get_trade_good(good.symbol, session):
+        goods.intern(g)
         return g
     g = TradeGoodModel()
     g.symbol = good.symbol
     g.name = good.name
     g.description = good.description
+    goods.intern(g)
     return g
 
 
@@ -30,6 +31,7 @@ def store_good(good: Good) -> TradeGoodModel:
         g.description = good.description
         session.add(g)
         session.commit()
+        goods.intern(g)
         return g
 
 
@@ -44,4 +46,7 @@ def _record_to_schema(good: TradeGoodModel) -> Good:
 
 
 def _get_trade_good(symbol: str, session: Session) -> TradeGoodModel:
-    return session.scalars(select(TradeGoodModel).where(TradeGoodModel.symbol == symbol)).first()
+    return session.get(TradeGoodModel, symbol)
+
+
+goods = Registry(TradeGoodModel, _record_to_schema)
@@ -1,29 +1,28 @@
-from sqlalchemy import select
-from login import engine
+from crud.registry import Registry
 from models.waypoint import TraitModel
 from schemas.navigation import WaypointTrait
 from sqlalchemy.orm import Session
 
 
 def get_trait(symbol: str):
-    with Session(engine) as session:
-        return _record_to_schema(_get_trait(symbol, session))
+    return traits.get(symbol)
 
 
 def store_trait(trait: WaypointTrait, session: Session) -> TraitModel:
     if t := _get_trait(trait.symbol, session):
+        traits.intern(t)
         return t
     t = TraitModel()
     t.symbol = trait.symbol
     t.name = trait.name
     t.description = trait.description
     session.add(t)
-    session.commit()
+    traits.intern(t)
     return t
 
 
 def _get_trait(symbol: str, session: Session):
-    return session.scalars(select(TraitModel).where(TraitModel.symbol == symbol)).first()
+    return session.get(TraitModel, symbol)
 
 
 def _record_to_schema(record: TraitModel) -> WaypointTrait:
@@ -34,3 +33,6 @@ def _record_to_schema(record: TraitModel) -> WaypointTrait:
         name=record.name,
         description=record.description
     )
+
+
+traits = Registry(TraitModel, _record_to_schema)
@@ -1,5 +1,7 @@
 from datetime import datetime
+from typing import List
 from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 from login import engine
 from models.market import MarketTransactionModel, TradeGoodModel
@@ -24,10 +26,24 @@ def store_transaction(trans: MarketTransaction, session)-> MarketTransactionMode
     t.total_price=trans.totalPrice
     t.time_stamp=trans.timestamp
     session.add(t)
-    session.commit()
     return t
 
 
+def store_transactions(transactions: List[MarketTransaction], session: Session) -> None:
+    # transactions are immutable, ones already stored are skipped instead of rewritten
+    if not transactions:
+        return
+    session.execute(insert(MarketTransactionModel).on_conflict_do_nothing(), [
+        {"symbol": trans.waypointSymbol,
+         "ship_symbol": trans.shipSymbol,
+         "trade_symbol": trans.tradeSymbol,
+         "type": trans.type_field,
+         "units": trans.units,
+         "price_per_unit": trans.pricePerUnit,
+         "total_price": trans.totalPrice,
+         "time_stamp": trans.timestamp} for trans in transactions])
+
+
 def _record_to_schema(trans: MarketTransactionModel)-> MarketTransaction:
     if not trans:
         return None
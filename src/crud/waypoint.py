@@ -1,38 +1,125 @@
 
-from datetime import UTC, timedelta
-from typing import List, Optional
-from pydantic import ValidationError
-from sqlalchemy import select
-
-from login import SYSTEM_BASE_URL, engine, get
-from sqlalchemy.orm import Session
-from models.waypoint import TraitModel, WaypointModel
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+
+from utils.rate_limiter import Priority
+from login import HEADERS, SYSTEM_BASE_URL, async_get, engine, get
+from sqlalchemy.orm import Session, selectinload
+from models.waypoint import ModifierModel, TraitModel, WaypointModel, waypoint_modifiers, waypoint_traits
 from utils.utils import utcnow
 
 from schemas.navigation import Waypoint, WaypointFaction
-from crud import get_modifier, store_modifier, get_trait, store_trait
+from crud.cache_policy import CacheState, get_cache_policy, revalidator
+from crud.data_version import bump_version, forget_version, get_version, peek_version
+from crud.db_executor import run_db
+from crud.modifiers import modifiers
+from crud.traits import traits
 from logging import getLogger
 
-STALE_TIME = timedelta(minutes=15)
+# the list endpoint refuses pages larger than 20
+WAYPOINT_PAGE_SIZE = 20
 
 logger = getLogger(__name__)
 
+# relationships _record_to_schema reads, loaded up front in one query each
+_WAYPOINT_LOAD_OPTIONS = (selectinload(WaypointModel.traits),
+                          selectinload(WaypointModel.modifiers),
+                          selectinload(WaypointModel.orbitals))
+
+_waypoint_list = TypeAdapter(List[Waypoint])
+
+_system_listeners: List[Callable[[str], None]] = []
+
+
+def _system_scope(system_symbol: str) -> str:
+    return f"system:{system_symbol}"
+
+
+def system_data_version(system_symbol: str) -> int:
+    """Counts changes to a system's waypoint set, positions and marketplaces, in every process."""
+    return get_version(_system_scope(system_symbol))
+
+
+def cached_system_data_version(system_symbol: str) -> Optional[int]:
+    """system_data_version without a query, None when it has to be read from the database again."""
+    return peek_version(_system_scope(system_symbol))
+
+
+def add_system_change_listener(f: Callable[[str], None]) -> None:
+    """f is called with the system symbol after a change made by this process."""
+    _system_listeners.append(f)
+
+
+def _system_changed(system_symbol: str) -> None:
+    forget_version(_system_scope(system_symbol))
+    for listener in _system_listeners:
+        listener(system_symbol)
+
 
 def get_waypoint_with_symbol(symbol: str):
     logger.info(f"getting waypoint with symbol {symbol}")
+    cached, updated = _read_waypoint(symbol)
+    match get_cache_policy("waypoint").state(updated):
+        case CacheState.FRESH:
+            logger.info("fresh from cache")
+            return cached
+        case CacheState.STALE:
+            logger.info("stale in cache, refreshing in the background")
+            revalidator.submit(("waypoint", symbol), _refresh_waypoint, symbol)
+            return cached
+    logger.info("updating cache" if cached else "added new cache row")
+    fresh_wp = _get_waypoint_from_server(symbol, Priority.NORMAL)
+    if fresh_wp is None:
+        return cached
+    return _write_waypoint(fresh_wp)
+
+
+async def async_get_waypoint_with_symbol(symbol: str):
+    logger.info(f"getting waypoint with symbol {symbol}")
+    cached, updated = await run_db(_read_waypoint, symbol)
+    match get_cache_policy("waypoint").state(updated):
+        case CacheState.FRESH:
+            logger.info("fresh from cache")
+            return cached
+        case CacheState.STALE:
+            logger.info("stale in cache, refreshing in the background")
+            revalidator.spawn(("waypoint", symbol), _async_refresh_waypoint, symbol)
+            return cached
+    logger.info("updating cache" if cached else "added new cache row")
+    fresh_wp = await _async_get_waypoint_from_server(symbol, Priority.NORMAL)
+    if fresh_wp is None:
+        return cached
+    return await run_db(_write_waypoint, fresh_wp)
+
+
+def _refresh_waypoint(symbol: str) -> None:
+    if (fresh_wp := _get_waypoint_from_server(symbol, Priority.BACKGROUND)) is not None:
+        _write_waypoint(fresh_wp)
+
+
+async def _async_refresh_waypoint(symbol: str) -> None:
+    if (fresh_wp := await _async_get_waypoint_from_server(symbol, Priority.BACKGROUND)) is not None:
+        await run_db(_write_waypoint, fresh_wp)
+
+
+async def async_get_waypoints_in_system(system_symbol: str, trait_symbol: Optional[str] = None) -> List[Waypoint]:
+    return await run_db(get_waypoints_in_system, system_symbol, trait_symbol)
+
+
+def _read_waypoint(symbol: str) -> Tuple[Optional[Waypoint], Optional[datetime]]:
+    """The cached waypoint and when it was last updated, or None, None."""
     with Session(engine) as session:
         if wp := _get_waypoint_from_db(symbol, session):
-            if utcnow() - wp.time_updated_utc < STALE_TIME:
-                logger.info("fresh from cache")
-                return _record_to_schema(wp)
-            else:
-                logger.info("updating cache")
-                fresh_wp = _get_waypoint_from_server(symbol)
-                return _record_to_schema(_update_waypoint_in_db(wp, fresh_wp, session))
-        logger.info("added new cache row")
-        fresh_wp = _get_waypoint_from_server(symbol)
-        wp = _record_to_schema(_store_waypoint_in_db(fresh_wp, session))
-        return wp
+            return _record_to_schema(wp), wp.time_updated_utc
+    return None, None
+
+
+def _write_waypoint(wp: Waypoint) -> Optional[Waypoint]:
+    with Session(engine) as session:
+        return _record_to_schema(_store_waypoint_in_db(wp, session))
 
 
 def update_waypoint_cache(wp: Waypoint) -> Waypoint:
@@ -44,59 +131,220 @@ def update_waypoint_cache(wp: Waypoint) -> Waypoint:
         return wp
 
 
-def _get_waypoint_from_server(symbol: str) -> Optional[Waypoint]:
+def _system_waypoints_url(system_symbol: str, page: int) -> str:
+    return f"{SYSTEM_BASE_URL}{system_symbol}/waypoints?page={page}&limit={WAYPOINT_PAGE_SIZE}"
+
+
+def _validate_waypoint_page(js) -> Optional[List[Waypoint]]:
+    try:
+        return _waypoint_list.validate_python(js["data"])
+    except ValidationError as e:
+        logger.info(e)
+        return None
+
+
+def fetch_system_waypoints(system_symbol: str, priority: Priority = Priority.NORMAL) -> Optional[List[Waypoint]]:
+    waypoints: List[Waypoint] = []
+    page = 1
+    total = None
+    while total is None or len(waypoints) < total:
+        response = get(_system_waypoints_url(system_symbol, page), priority, headers=HEADERS)
+        if not response.ok:
+            logger.info(response)
+            return None
+        js = response.json()
+        if (page_waypoints := _validate_waypoint_page(js)) is None:
+            return None
+        if not page_waypoints:
+            break
+        waypoints.extend(page_waypoints)
+        total = js["meta"]["total"]
+        page += 1
+    return waypoints
+
+
+async def async_fetch_system_waypoints(system_symbol: str, priority: Priority = Priority.NORMAL) -> Optional[List[Waypoint]]:
+    waypoints: List[Waypoint] = []
+    page = 1
+    total = None
+    while total is None or len(waypoints) < total:
+        response = await async_get(_system_waypoints_url(system_symbol, page), priority, headers=HEADERS)
+        if not response.is_success:
+            logger.info(response)
+            return None
+        js = response.json()
+        if (page_waypoints := _validate_waypoint_page(js)) is None:
+            return None
+        if not page_waypoints:
+            break
+        waypoints.extend(page_waypoints)
+        total = js["meta"]["total"]
+        page += 1
+    return waypoints
+
+
+def ingest_system_waypoints(system_symbol: str, priority: Priority = Priority.NORMAL) -> Optional[List[Waypoint]]:
+    """Page through every waypoint of a system and store them all in one transaction."""
+    if (waypoints := fetch_system_waypoints(system_symbol, priority)) is None:
+        return None
+    upsert_waypoints(waypoints)
+    return waypoints
+
+
+async def async_ingest_system_waypoints(system_symbol: str, priority: Priority = Priority.NORMAL) -> Optional[List[Waypoint]]:
+    if (waypoints := await async_fetch_system_waypoints(system_symbol, priority)) is None:
+        return None
+    await run_db(upsert_waypoints, waypoints)
+    return waypoints
+
+
+_REQUIRED_COLUMNS = ("wp_type", "x", "y")
+
+
+def _waypoint_row(wp: Waypoint, now) -> dict:
+    return {"symbol": wp.symbol,
+            "systemSymbol": wp.systemSymbol,
+            "wp_type": wp.type,
+            "x": wp.x,
+            "y": wp.y,
+            "isUnderConstruction": wp.isUnderConstruction,
+            "parent_symbol": wp.orbits,
+            "faction": wp.faction.symbol if wp.faction else None,
+            "time_updated": now}
+
+
+def _upsert_reference_rows(model, entries, session: Session) -> None:
+    rows = {entry.symbol: {"symbol": entry.symbol, "name": entry.name, "description": entry.description}
+            for entry in entries}
+    if rows:
+        session.execute(insert(model).on_conflict_do_nothing(), list(rows.values()))
+
+
+def _replace_links(table, column: str, links: Dict[str, list], session: Session) -> None:
+    if not links:
+        return
+    symbols = list(links)
+    # stay well under sqlite's bound parameter limit on large batches
+    for i in range(0, len(symbols), 500):
+        session.execute(delete(table).where(table.c.wp_symbol.in_(symbols[i:i + 500])))
+    rows = [{"wp_symbol": symbol, column: entry.symbol}
+            for symbol, entries in links.items() for entry in {e.symbol: e for e in entries}.values()]
+    if rows:
+        session.execute(insert(table), rows)
+
+
+def _graph_fields(symbols: List[str], session: Session) -> Dict[str, Tuple[int, int, bool]]:
+    """Position and marketplace flag of the stored waypoints, everything a system graph is built from."""
+    markets = {symbol for i in range(0, len(symbols), 500) for symbol in session.scalars(
+        select(waypoint_traits.c.wp_symbol).where(waypoint_traits.c.trait_symbol == "MARKETPLACE",
+                                                  waypoint_traits.c.wp_symbol.in_(symbols[i:i + 500])))}
+    return {row.symbol: (row.x, row.y, row.symbol in markets) for i in range(0, len(symbols), 500)
+            for row in session.execute(select(WaypointModel.symbol, WaypointModel.x, WaypointModel.y)
+                                       .where(WaypointModel.symbol.in_(symbols[i:i + 500])))}
+
+
+def _changes_graph(row: dict, wp_traits, stored: Dict[str, Tuple[int, int, bool]]) -> bool:
+    if row["symbol"] not in stored:
+        # incomplete rows for unknown waypoints are skipped, they add nothing
+        return all(row[key] is not None for key in _REQUIRED_COLUMNS)
+    x, y, market = stored[row["symbol"]]
+    return (row["x"] is not None and row["x"] != x or row["y"] is not None and row["y"] != y
+            or wp_traits is not None and any(t.symbol == "MARKETPLACE" for t in wp_traits) != market)
+
+
+def upsert_waypoints(waypoints: List[Waypoint], session: Optional[Session] = None) -> None:
+    """Insert or update waypoints with one executemany per table.
+
+    Fields left as None keep their stored value, traits and modifiers are only replaced when given.
+    """
+    if not waypoints:
+        return
+    if session is None:
+        with Session(engine) as session:
+            return upsert_waypoints(waypoints, session)
+    now = utcnow()
+    rows = list({wp.symbol: _waypoint_row(wp, now) for wp in waypoints}.values())
+    # rows missing required columns can only update waypoints we already have
+    complete = [row for row in rows if all(row[key] is not None for key in _REQUIRED_COLUMNS)]
+    partial = [{key: value for key, value in row.items() if value is not None}
+               for row in rows if any(row[key] is None for key in _REQUIRED_COLUMNS)]
+    with_traits = {wp.symbol: wp.traits for wp in waypoints if wp.traits is not None}
+    with_modifiers = {wp.symbol: wp.modifiers for wp in waypoints if wp.modifiers is not None}
+    stored = _graph_fields([row["symbol"] for row in rows], session)
+    changed = {row["systemSymbol"] for row in rows if _changes_graph(row, with_traits.get(row["symbol"]), stored)}
+    _upsert_reference_rows(TraitModel, [t for ts in with_traits.values() for t in ts], session)
+    _upsert_reference_rows(ModifierModel, [m for ms in with_modifiers.values() for m in ms], session)
+    if complete:
+        stmt = insert(WaypointModel)
+        stmt = stmt.on_conflict_do_update(index_elements=[WaypointModel.symbol],
+                                          set_={key: func.coalesce(stmt.excluded[key], getattr(WaypointModel, key))
+                                                for key in complete[0] if key not in ("symbol", "time_updated")}
+                                          | {"time_updated": stmt.excluded.time_updated})
+        session.execute(stmt, complete)
+    if partial:
+        for row in partial:
+            if row["symbol"] not in stored:
+                logger.info(f"skipping incomplete unknown waypoint {row['symbol']}")
+                with_traits.pop(row["symbol"], None)
+                with_modifiers.pop(row["symbol"], None)
+        if partial := [row for row in partial if row["symbol"] in stored]:
+            session.execute(update(WaypointModel), partial)
+    _replace_links(waypoint_traits, "trait_symbol", with_traits, session)
+    _replace_links(waypoint_modifiers, "modifier_symbol", with_modifiers, session)
+    for system_symbol in changed:
+        bump_version(_system_scope(system_symbol), session)
+    session.commit()
+    for wp in waypoints:
+        for trait in wp.traits or []:
+            traits.intern(trait)
+        for modifier in wp.modifiers or []:
+            modifiers.intern(modifier)
+    for system_symbol in changed:
+        _system_changed(system_symbol)
+
+
+def _waypoint_url(symbol: str) -> str:
     split_symbol = symbol.split("-")
     system_symbol = f"{split_symbol[0]}-{split_symbol[1]}"
-    response = get(f"{SYSTEM_BASE_URL}/{system_symbol}/waypoints/{symbol}")
+    return f"{SYSTEM_BASE_URL}/{system_symbol}/waypoints/{symbol}"
+
+
+def _validate_waypoint(js) -> Optional[Waypoint]:
+    try:
+        return Waypoint.model_validate(js["data"])
+    except ValidationError as e:
+        logger.info(e)
+        return None
+
+
+def _get_waypoint_from_server(symbol: str, priority: Priority = Priority.NORMAL) -> Optional[Waypoint]:
+    response = get(_waypoint_url(symbol), priority)
     if response.ok:
-        js = response.json()
-        try:
-            return Waypoint.model_validate(js["data"])
-        except ValidationError as e:
-            logger.info(e)
-            return None
+        return _validate_waypoint(response.json())
     logger.info(response)
     return None
 
 
-def _update_waypoint_in_db(db_wp: WaypointModel, wp: Waypoint, session: Session) -> WaypointModel:
-    if wp.type:
-        db_wp.wp_type = wp.type
-    if wp.systemSymbol:
-        db_wp.systemSymbol = wp.systemSymbol
-    if wp.x:
-        db_wp.x = wp.x
-    if wp.y:
-        db_wp.y = wp.y
-    if wp.orbits:
-        db_wp.parent_symbol = wp.orbits
-    if wp.faction:
-        db_wp.faction = wp.faction.symbol
-    if wp.traits is not None:
-        db_wp.traits = [store_trait(trait, session) for trait in wp.traits]
-    if wp.modifiers is not None:
-        db_wp.modifiers = [store_modifier(modifier)
-                           for modifier in wp.modifiers]
-    db_wp.time_updated = utcnow()
-    session.commit()
-    return db_wp
-
-
-def _store_waypoint_in_db(wp: Waypoint, session: Session)->WaypointModel:
-    added_wp = WaypointModel()
-    added_wp.symbol = wp.symbol
-    added_wp.wp_type = wp.type
-    added_wp.systemSymbol = wp.systemSymbol
-    added_wp.x = wp.x
-    added_wp.y = wp.y
-    added_wp.parent_symbol = wp.orbits
-    added_wp.faction = wp.faction.symbol
-    added_wp.traits = [store_trait(trait, session) for trait in wp.traits]
-    added_wp.modifiers = [store_modifier(modifier, session)
-                          for modifier in wp.modifiers]
-    session.add(added_wp)
-    session.commit()
-    return added_wp
+async def _async_get_waypoint_from_server(symbol: str, priority: Priority = Priority.NORMAL) -> Optional[Waypoint]:
+    response = await async_get(_waypoint_url(symbol), priority)
+    if response.is_success:
+        return _validate_waypoint(response.json())
+    logger.info(response)
+    return None
+
+
+def _update_waypoint_in_db(db_wp: WaypointModel, wp: Optional[Waypoint], session: Session) -> WaypointModel:
+    if wp is None:
+        return db_wp
+    upsert_waypoints([wp], session)
+    return _get_waypoint_from_db(wp.symbol, session)
+
+
+def _store_waypoint_in_db(wp: Waypoint, session: Session) -> Optional[WaypointModel]:
+    if wp is None:
+        return None
+    upsert_waypoints([wp], session)
+    return _get_waypoint_from_db(wp.symbol, session)
 
 
 def _record_to_schema(wp: WaypointModel) -> Waypoint:
@@ -108,10 +356,10 @@ def _record_to_schema(wp: WaypointModel) -> Waypoint:
         x=wp.x,
         y=wp.y,
         orbits=wp.parent_symbol,
-        orbitals=[_record_to_schema(w) for w in wp.orbitals],
-        traits=[get_trait(t.symbol) for t in wp.traits],
-        modifiers=[get_modifier(m.symbol) for m in wp.modifiers],
-        faction=WaypointFaction(symbol=wp.faction),
+        orbitals=[Waypoint(symbol=w.symbol) for w in wp.orbitals],
+        traits=[traits.intern(t) for t in wp.traits],
+        modifiers=[modifiers.intern(m) for m in wp.modifiers],
+        faction=WaypointFaction(symbol=wp.faction) if wp.faction else None,
         isUnderConstruction=wp.isUnderConstruction
     )
 
@@ -124,8 +372,10 @@ def get_waypoints_in_system(system_symbol: str, trait_symbol: Optional[str] = No
         else:
             stmt = select(WaypointModel).where(
                 WaypointModel.systemSymbol == system_symbol)
+        stmt = stmt.options(*_WAYPOINT_LOAD_OPTIONS)
         return [_record_to_schema(t) for t in session.scalars(stmt).all()]
 
 
 def _get_waypoint_from_db(symbol: str, session):
-    return session.scalars(select(WaypointModel).where(WaypointModel.symbol == symbol)).first()
+    return session.scalars(select(WaypointModel).where(WaypointModel.symbol == symbol)
+                           .options(*_WAYPOINT_LOAD_OPTIONS)).first()
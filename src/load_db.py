@@ -1,5 +1,7 @@
 import argparse
-from crud import get_waypoint_with_symbol, get_market_with_symbol
+from crud import get_market_with_symbol
+from crud.system import get_jump_gate_connections, store_systems
+from crud.waypoint import ingest_system_waypoints
 from schemas.navigation import get_system_with_symbol
 
 if __name__ == "__main__":
@@ -9,7 +11,9 @@ if __name__ == "__main__":
     args = parser.parse_args()
     if args.symbol:
         system = get_system_with_symbol(args.symbol)
-        for waypoint in system.waypoints:
-            wp = get_waypoint_with_symbol(waypoint.symbol)
+        store_systems([system])
+        for wp in ingest_system_waypoints(system.symbol) or []:
             if wp.has_trait("MARKETPLACE"):
                 get_market_with_symbol(wp.symbol)
+            if wp.type == "JUMP_GATE":
+                get_jump_gate_connections(wp.symbol)
@@ -1,17 +1,42 @@
-from requests_ratelimiter import LimiterSession
-from sqlalchemy import create_engine
+import asyncio
+import time
+from itertools import count
+from typing import Awaitable, Dict, TypeVar
+import httpx
+from requests import RequestException, Response, Session
+from utils.rate_limiter import Priority, RateLimiter
+from utils.retry import MAX_RETRIES, backoff, retry_delay
+from utils.single_flight import SingleFlight
+from utils.storage import PROFILES, create_storage_engine
 from utils.utils import print_json
 from pathlib import Path
-from os import path
+from os import environ, path
 
 
 DB_PATH = 'sqlite:///data/test.db'
+DB_PROFILE = environ.get("SPACETRADERS_DB_PROFILE", "default")
 REGISTER_URL = 'https://api.spacetraders.io/v2/register'
 SYSTEM_BASE_URL = "https://api.spacetraders.io/v2/systems/"
 CONTRACTS_BASE_URL = "https://api.spacetraders.io/v2/my/contracts/"
 CREDENTIALS_PATH = Path("data/apikey")
 USERNAME = "shocsoares"
 FACTION = "VOID"
+REQUESTS_PER_SECOND = 2
+BURST_REQUESTS = 30
+BURST_PERIOD = 60
+ASYNC_TIMEOUT = 30
+
+T = TypeVar("T")
+
+
+class ApiError(Exception):
+    """The api still refused a request after the retries."""
+
+    def __init__(self, url: str, status_code: int, text: str) -> None:
+        super().__init__(f"{status_code} from {url}: {text}")
+        self.url = url
+        self.status_code = status_code
+        self.text = text
 
 
 def register_request(username, faction):
@@ -47,14 +72,117 @@ def register():
         print("REGISTER FAILED")
 
 
-session = LimiterSession(per_second=2)
-get = session.get
-post = session.post
-patch = session.patch
+rate_limiter = RateLimiter(REQUESTS_PER_SECOND, BURST_REQUESTS, BURST_PERIOD)
+# identical GETs made while one is already in flight share its response
+single_flight = SingleFlight()
+session = Session()
+
+
+def _flight_key(method: str, url: str, kwargs: dict):
+    # headers stay out of the key, it is logged and they carry the api token
+    params = kwargs.get("params") or {}
+    return method, url, repr(sorted(dict(params).items()))
+
+
+def request(method: str, url: str, priority: Priority = Priority.NORMAL, **kwargs) -> Response:
+    for attempt in count():
+        rate_limiter.acquire(priority)
+        try:
+            response = session.request(method, url, **kwargs)
+        except RequestException:
+            if attempt >= MAX_RETRIES:
+                raise
+            time.sleep(backoff(attempt))
+            continue
+        delay = retry_delay(attempt, response)
+        if delay is None:
+            return response
+        if response.status_code == 429:
+            # the retry is re-queued in the limiter, which now holds everyone back
+            rate_limiter.penalize(delay)
+        else:
+            time.sleep(delay)
+
+
+def get(url: str, priority: Priority = Priority.NORMAL, **kwargs) -> Response:
+    return single_flight.do(_flight_key("GET", url, kwargs), priority,
+                            lambda: request("GET", url, priority, **kwargs))
+
+
+def post(url: str, priority: Priority = Priority.NORMAL, **kwargs) -> Response:
+    return request("POST", url, priority, **kwargs)
+
+
+def patch(url: str, priority: Priority = Priority.NORMAL, **kwargs) -> Response:
+    return request("PATCH", url, priority, **kwargs)
+
+
+# an AsyncClient's connections belong to the loop that opened them, so every loop gets its own
+_async_clients: Dict[asyncio.AbstractEventLoop, httpx.AsyncClient] = {}
+
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        for old in [old for old in _async_clients if old.is_closed()]:
+            # ended without close_async_client, its sockets are gone with the loop
+            del _async_clients[old]
+        client = _async_clients[loop] = httpx.AsyncClient(timeout=ASYNC_TIMEOUT)
+    return client
+
+
+async def close_async_client() -> None:
+    """Close the running loop's client, has to happen before the loop ends."""
+    if (client := _async_clients.pop(asyncio.get_running_loop(), None)) is not None:
+        await client.aclose()
+
+
+def run_async(main: Awaitable[T]) -> T:
+    """asyncio.run that closes the api client of its loop on the way out."""
+    async def run() -> T:
+        try:
+            return await main
+        finally:
+            await close_async_client()
+    return asyncio.run(run())
+
+
+async def async_request(method: str, url: str, priority: Priority = Priority.NORMAL, **kwargs) -> httpx.Response:
+    for attempt in count():
+        await rate_limiter.async_acquire(priority)
+        try:
+            response = await get_async_client().request(method, url, **kwargs)
+        except httpx.TransportError:
+            if attempt >= MAX_RETRIES:
+                raise
+            await asyncio.sleep(backoff(attempt))
+            continue
+        delay = retry_delay(attempt, response)
+        if delay is None:
+            return response
+        if response.status_code == 429:
+            rate_limiter.penalize(delay)
+        else:
+            await asyncio.sleep(delay)
+
+
+async def async_get(url: str, priority: Priority = Priority.NORMAL, **kwargs) -> httpx.Response:
+    return await single_flight.async_do(_flight_key("GET", url, kwargs), priority,
+                                        lambda: async_request("GET", url, priority, **kwargs))
+
+
+async def async_post(url: str, priority: Priority = Priority.NORMAL, **kwargs) -> httpx.Response:
+    return await async_request("POST", url, priority, **kwargs)
+
+
+async def async_patch(url: str, priority: Priority = Priority.NORMAL, **kwargs) -> httpx.Response:
+    return await async_request("PATCH", url, priority, **kwargs)
+
 
 if __name__ == "__main__":
     register()
 else:
-    engine =  create_engine(DB_PATH)
+    engine = create_storage_engine(DB_PATH, PROFILES[DB_PROFILE])
     HEADERS = get_api_key()
     HEADERS = {"Authorization": f"Bearer {HEADERS}"}
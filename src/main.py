@@ -1,16 +1,25 @@
-import asyncio
+from crud import load_reference_data
+from login import run_async, single_flight
 from management.fleet_manager import FleetManager
+from management.shards import Coordinator
+from os import environ
 import logging
 
 logger = logging.getLogger(__name__)
 
 ui = False
+# above 1 the ships are split across that many worker processes
+shards = int(environ.get("SPACETRADERS_SHARDS", "1"))
 if __name__ == "__main__":
     logging.basicConfig(filename='data/logs/main.log', level=logging.INFO)
-    manager = FleetManager()
+    load_reference_data()
+    manager = Coordinator(shards) if shards > 1 else FleetManager()
     if ui:
         #app = SpaceTraders(ships, ship_controllers)
         #app.run()
         pass
     else:
-        asyncio.run(manager.run())
+        try:
+            run_async(manager.run())
+        finally:
+            logger.info(f"api calls {single_flight.stats}")
@@ -0,0 +1,84 @@
+from typing import Dict, List, Protocol, Tuple
+import numpy as np
+
+
+class AssignmentSolver(Protocol):
+    def __call__(self, cost: np.ndarray) -> List[Tuple[int, int]]:
+        """(row, column) pairs matching rows to columns at most once each, inf marks a forbidden pair."""
+        ...
+
+
+def greedy_assignment(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """Cheapest pair first, fast and usually close to optimal when there is little contention."""
+    rows, columns = np.nonzero(np.isfinite(cost))
+    order = np.argsort(cost[rows, columns], kind="stable")
+    used_rows, used_columns = set(), set()
+    pairs = []
+    for r, c in zip(rows[order].tolist(), columns[order].tolist()):
+        if r in used_rows or c in used_columns:
+            continue
+        used_rows.add(r)
+        used_columns.add(c)
+        pairs.append((r, c))
+    return pairs
+
+
+def hungarian_assignment(cost: np.ndarray) -> List[Tuple[int, int]]:
+    """As many allowed pairs as possible at the minimum total cost, shortest augmenting paths in O(n^3)."""
+    n_rows, n_columns = cost.shape
+    if n_rows == 0 or n_columns == 0:
+        return []
+    finite = np.isfinite(cost)
+    if not finite.any():
+        return []
+    # forbidden pairs cost more than any full matching of allowed ones, leaving something
+    # unmatched is always cheaper than taking one
+    forbidden = (np.abs(cost[finite]).sum() + 1) * 2
+    n = max(n_rows, n_columns)
+    padded = np.full((n, n), forbidden / 2)
+    padded[:n_rows, :n_columns] = np.where(finite, cost, forbidden)
+
+    # potentials u, v and column -> row matching, index 0 is a virtual column
+    u = np.zeros(n + 1)
+    v = np.zeros(n + 1)
+    match = np.zeros(n + 1, dtype=np.int64)
+    way = np.zeros(n + 1, dtype=np.int64)
+    for row in range(1, n + 1):
+        match[0] = row
+        column = 0
+        min_slack = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[column] = True
+            current = match[column]
+            free = ~used[1:]
+            slack = padded[current - 1] - u[current] - v[1:]
+            better = free & (slack < min_slack[1:])
+            min_slack[1:][better] = slack[better]
+            way[1:][better] = column
+            candidates = np.where(free, min_slack[1:], np.inf)
+            next_column = int(np.argmin(candidates)) + 1
+            delta = candidates[next_column - 1]
+            u[match[used]] += delta
+            v[used] -= delta
+            min_slack[1:][free] -= delta
+            column = next_column
+            if match[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            match[column] = match[previous]
+            column = previous
+
+    pairs = []
+    for column in range(1, n + 1):
+        r, c = match[column] - 1, column - 1
+        if r < n_rows and c < n_columns and finite[r, c]:
+            pairs.append((int(r), int(c)))
+    return sorted(pairs)
+
+
+SOLVERS: Dict[str, AssignmentSolver] = {
+    "greedy": greedy_assignment,
+    "hungarian": hungarian_assignment,
+}
@@ -1,52 +1,167 @@
-
-
 import asyncio
-from enum import StrEnum
-from typing import Dict
+from datetime import UTC, datetime, timedelta
+from typing import Dict, List, Optional
 from ai.ship_controller import ShipController
-from management.work_orders.work_order import FulfillProcurementContract
-from schemas.contract import get_open_contracts
-from schemas.ship import Ship, get_ship_list
+from management.work_orders.queue import PendingWorkOrder, WorkOrderKind, WorkOrderQueue
+from login import ApiError
+from schemas.contract import Contract, get_contract, get_open_contracts
+from schemas.ship import Ship, ShipNavStatus, get_ship_list
+from utils.scheduler import scheduler
+from utils.tasks import spawn
+from utils.utils import utcnow
 from logging import getLogger
 logger = getLogger(__name__)
 
+# how long to wait before asking for a contract again after none could be had
+NEGOTIATION_RETRY = timedelta(minutes=1)
+
+
+def contract_key(contract: Contract) -> str:
+    return f"contract {contract.id}"
+
 
-class ShipRoles(StrEnum):
-    CONTRACTOR = "Contractor"
+def contract_work_order(contract: Contract) -> PendingWorkOrder:
+    return PendingWorkOrder(contract_key(contract), WorkOrderKind.CONTRACT,
+                            contract.terms.deliver[0].destinationSymbol,
+                            can_do=lambda ship: ship.cargo.capacity > 0,
+                            payload=contract.model_dump(mode="json", by_alias=True))
 
 
 class FleetManager():
-    def __init__(self) -> None:
+    def __init__(self, solver: str = "greedy") -> None:
         logger.info("STARTING MANAGER")
-        self.ships: Dict[str, Ship] = {
-            ship.symbol: ship for ship in get_ship_list()}
-        self.roles = {"SHOCSOARES-1": ShipRoles.CONTRACTOR}
-        self.controllers: Dict[str, ShipController] = {
-            symbol: ShipController(self.ships[symbol]) for symbol in self.ships}
-        self.contract_negotiator = self.ships["SHOCSOARES-2"]
+        self.ships: Dict[str, Ship] = {}
+        self.controllers: Dict[str, ShipController] = {}
+        self.queue = WorkOrderQueue(solver)
+        # ship symbol -> key of the order it is running
+        self._running: Dict[str, str] = {}
+        self.contract: Optional[Contract] = None
+        # the ship works on its own copy of the contract, ours is stale once it is done
+        self._contract_stale = False
+        self._negotiate_after = datetime.min.replace(tzinfo=UTC)
+        self._retry_wakeup: Optional[datetime] = None
+        self._wakeup = asyncio.Event()
+
+    def wake(self, *_) -> None:
+        self._wakeup.set()
+
+    def wake_at(self, when: datetime) -> None:
+        async def wake_later():
+            await scheduler.sleep_until(when)
+            self.wake()
+        spawn(wake_later(), name=f"manager wakeup {when}")
+
+    def finished(self, ship_symbol: str, succeeded: bool = True) -> None:
+        if key := self._running.pop(ship_symbol, None):
+            self.queue.finish(key, succeeded)
+            if self.contract and key == contract_key(self.contract):
+                self._contract_stale = True
+        self.wake()
+
+    def _on_idle(self, controller: ShipController) -> None:
+        self.finished(controller.ship.symbol, controller.succeeded)
+
+    def idle_ships(self) -> List[Ship]:
+        return [self.ships[symbol] for symbol, controller in self.controllers.items() if not controller.work_order]
+
+    def push(self, order: PendingWorkOrder) -> None:
+        if self.queue.push(order):
+            self.wake()
+
+    async def load_ships(self):
+        self.ships = {ship.symbol: ship for ship in await get_ship_list()}
+        self.controllers = {
+            symbol: ShipController(self.ships[symbol], on_idle=self._on_idle) for symbol in self.ships}
+
+    def _negotiator(self) -> Optional[Ship]:
+        # negotiating needs a ship at a waypoint that is not in the middle of other work
+        idle = [ship for ship in self.idle_ships() if ship.nav.status != ShipNavStatus.IN_TRANSIT]
+        return idle[0] if idle else None
+
+    async def _find_contracts(self) -> List[Contract]:
+        contracts = await get_open_contracts()
+        # other wakeups in between do not count as retries
+        if not contracts and utcnow() >= self._negotiate_after:
+            if negotiator := self._negotiator():
+                logger.info(f"No open contracts, {negotiator.symbol} negotiating")
+                await negotiator.negotiate_contract()
+                contracts = await get_open_contracts()
+                if not contracts:
+                    self._negotiate_after = utcnow() + NEGOTIATION_RETRY
+                    self.wake_at(self._negotiate_after)
+            else:
+                # tried again once a ship goes idle
+                logger.info("No open contracts and no ship free to negotiate")
+        return contracts
+
+    async def update_contract(self) -> None:
+        if not self.contract:
+            logger.info("No Contract")
+            try:
+                contracts = await self._find_contracts()
+            except ApiError as e:
+                # not knowing our contracts is not the same as having none, do not negotiate on it
+                logger.warning(f"could not list contracts: {e}")
+                self.wake_at(utcnow() + NEGOTIATION_RETRY)
+                return
+            if not contracts:
+                return
+            self.contract = contracts[0]
+            logger.info(f"New Contract is {self.contract.id}")
+            self.wake_at(self.contract.terms.deadline)
+        if self._contract_stale:
+            self._contract_stale = False
+            self.contract = await get_contract(self.contract.id) or self.contract
+        contract = self.contract
+        order = contract_work_order(contract)
+        if contract.fulfilled:
+            logger.info(f"Contract Fulfilled {contract.id}")
+            self.contract = None
+            self.wake()
+            return
+        deadline = contract.terms.deadline if contract.accepted else contract.deadlineToAccept
+        if deadline <= utcnow():
+            logger.info(f"Contract Expired {contract.id}")
+            self.queue.cancel(order.key)
+            self.contract = None
+            self.wake()
+            return
+        if not contract.accepted:
+            logger.info(f"Accepting {contract.id}")
+            if not await contract.accept():
+                self.wake_at(utcnow() + NEGOTIATION_RETRY)
+                return
+        # back in the queue if the ship working on it gave up
+        self.queue.push(order)
+
+    def _wake_for_retries(self) -> None:
+        # orders backing off after a failure are not handed out until their delay is over
+        when = self.queue.next_retry()
+        if when and when != self._retry_wakeup:
+            self._retry_wakeup = when
+            self.wake_at(when)
+
+    async def dispatch(self) -> None:
+        if not len(self.queue):
+            return
+        for ship, order in await self.queue.async_assign(self.idle_ships()):
+            self._running[ship.symbol] = order.key
+            self.controllers[ship.symbol].assign(order.build_for(ship))
+        self._wake_for_retries()
+
+    def start_controllers(self) -> None:
+        for symbol, controller in self.controllers.items():
+            spawn(controller.run(), name=f"controller {symbol}")
 
     async def run(self):
+        await self.load_ships()
         logger.info("MANAGER RUNNING")
-        contract = None
-        for controller in self.controllers.values():
-            asyncio.Task(controller.run())
+        self.start_controllers()
 
+        # only runs when something changed: a controller went idle, work was queued or a deadline passed
+        self.wake()
         while True:
-            await asyncio.sleep(0.2)
-            if not contract:
-                logger.info("No Contract")
-                contracts = get_open_contracts()
-                if not contracts:
-                    logger.info("No open contracts, negotiating")
-                    self.contract_negotiator.negotiate_contract()
-                    contracts = get_open_contracts()
-                contract = contracts[0]
-                logger.info(f"New Contract is {contract.id}")
-            elif contract.fulfilled:
-                logger.info(f"Contract Fulfilled {contract.id}")
-                contract = None
-            elif not contract.accepted:
-                logger.info(f"Accepting {contract.id}, Assigning to SHOCSOARES-1")
-                contract.accept()
-            elif contract.accepted and (not self.controllers["SHOCSOARES-1"].work_order):
-                self.controllers["SHOCSOARES-1"].work_order= FulfillProcurementContract(self.ships["SHOCSOARES-1"], contract)
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            await self.update_contract()
+            await self.dispatch()
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import Future
+from itertools import count
+from multiprocessing.connection import Connection
+from typing import Dict, List, Optional, Set
+import login
+from ai.ship_controller import ShipController
+from crud import load_reference_data
+from management.fleet_manager import FleetManager
+from management.work_orders.queue import PendingWorkOrder, WorkOrderKind
+from schemas.ship import Ship, get_ship_list
+from utils.rate_limiter import Priority
+from utils.tasks import spawn
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+# messages are tuples whose first item says what they are
+# shard -> coordinator: ("acquire", request id, priority), ("penalize", seconds),
+#                       ("idle", ship symbol, ship json, whether its last order succeeded)
+# coordinator -> shard: ("granted", request id), ("assign", ship symbol, key, kind, payload)
+
+
+class _Channel:
+    """One end of a pipe shared by threads and the event loop, sends are serialized and
+    everything received is handed to on_message from a reader thread."""
+
+    def __init__(self, connection: Connection, on_message, name: str) -> None:
+        self.connection = connection
+        self._send_lock = threading.Lock()
+        self._on_message = on_message
+        self._reader = threading.Thread(target=self._read, name=name, daemon=True)
+
+    def start(self) -> None:
+        self._reader.start()
+
+    def send(self, *message) -> None:
+        with self._send_lock:
+            self.connection.send(message)
+
+    def _read(self) -> None:
+        while True:
+            try:
+                message = self.connection.recv()
+            except (EOFError, OSError):
+                self._on_message(("closed",))
+                return
+            self._on_message(message)
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, f, *args) -> None:
+    try:
+        loop.call_soon_threadsafe(f, *args)
+    except RuntimeError:
+        # the loop is gone, we are shutting down
+        pass
+
+
+class CoordinatorLost(ConnectionError):
+    """The pipe to the coordinator closed, no more tokens will be granted."""
+
+
+class RemoteRateLimiter:
+    """Stands in for login.rate_limiter inside a shard, every token comes from the coordinator's limiter."""
+
+    def __init__(self) -> None:
+        self.channel: Optional[_Channel] = None
+        self._counter = count()
+        self._grants: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._lost = False
+
+    def lost(self) -> None:
+        """Fail every request waiting for a token and all later ones, the coordinator is gone."""
+        with self._lock:
+            self._lost = True
+            waiting = list(self._grants.values())
+            self._grants.clear()
+        for future in waiting:
+            if not future.done():
+                future.set_exception(CoordinatorLost("coordinator exited"))
+
+    def granted(self, request_id: int) -> None:
+        with self._lock:
+            future = self._grants.pop(request_id, None)
+        if future:
+            future.set_result(None)
+
+    def _request(self, priority: Priority) -> Future:
+        future = Future()
+        with self._lock:
+            if self._lost:
+                raise CoordinatorLost("coordinator exited")
+            request_id = next(self._counter)
+            self._grants[request_id] = future
+        try:
+            self.channel.send("acquire", request_id, int(priority))
+        except (BrokenPipeError, EOFError, OSError) as e:
+            self.lost()
+            raise CoordinatorLost("coordinator exited") from e
+        return future
+
+    def penalize(self, seconds: float) -> None:
+        try:
+            self.channel.send("penalize", seconds)
+        except (BrokenPipeError, EOFError, OSError):
+            self.lost()
+
+    def acquire(self, priority: Priority = Priority.NORMAL) -> None:
+        self._request(priority).result()
+
+    async def async_acquire(self, priority: Priority = Priority.NORMAL) -> None:
+        await asyncio.wrap_future(self._request(priority))
+
+
+class Shard:
+    """Runs the controllers of a slice of the fleet, work comes from the coordinator."""
+
+    def __init__(self, connection: Connection) -> None:
+        self.limiter = RemoteRateLimiter()
+        self.channel = _Channel(connection, self._on_message, "shard-pipe")
+        self.limiter.channel = self.channel
+        self.ships: Dict[str, Ship] = {}
+        self.controllers: Dict[str, ShipController] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed: Optional[asyncio.Event] = None
+
+    def _on_message(self, message) -> None:
+        match message:
+            case ("granted", request_id):
+                self.limiter.granted(request_id)
+            case ("closed",):
+                # callers blocked on a token in other threads must not wait for the loop
+                self.limiter.lost()
+                _call_soon(self._loop, self._handle, message)
+            case _:
+                _call_soon(self._loop, self._handle, message)
+
+    def _handle(self, message) -> None:
+        match message:
+            case ("assign", symbol, key, kind, payload):
+                order = PendingWorkOrder(key, WorkOrderKind(kind), self.ships[symbol].nav.waypointSymbol, payload=payload)
+                self.controllers[symbol].assign(order.build_for(self.ships[symbol]))
+            case ("closed",):
+                self._closed.set()
+            case _:
+                logger.error(f"unknown message {message!r}")
+
+    def _report_idle(self, controller: ShipController) -> None:
+        ship = controller.ship
+        try:
+            self.channel.send("idle", ship.symbol, ship.model_dump(mode="json", by_alias=True), controller.succeeded)
+        except (BrokenPipeError, EOFError, OSError):
+            # the reader sees the pipe close as well and shuts the shard down
+            logger.error(f"coordinator gone, dropping idle report of {ship.symbol}")
+
+    async def run(self, ships: List[dict]) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._closed = asyncio.Event()
+        # the api client reads login.rate_limiter on every request
+        login.rate_limiter = self.limiter
+        self.channel.start()
+        self.ships = {ship.symbol: ship for ship in map(Ship.model_validate, ships)}
+        for symbol, ship in self.ships.items():
+            self.controllers[symbol] = ShipController(ship, on_idle=self._report_idle)
+            spawn(self.controllers[symbol].run(), name=f"controller {symbol}")
+            self._report_idle(self.controllers[symbol])
+        await self._closed.wait()
+
+
+def run_shard(connection: Connection, index: int, ships: List[dict]) -> None:
+    """Entry point of a shard process, it has its own event loop and database connections."""
+    logging.basicConfig(filename=f'data/logs/shard-{index}.log', level=logging.INFO)
+    load_reference_data()
+    login.run_async(Shard(connection).run(ships))
+
+
+class Coordinator(FleetManager):
+    """Owns the rate limiter, contracts and work-order queue, the ships run in shard processes."""
+
+    def __init__(self, shards: int, solver: str = "greedy") -> None:
+        super().__init__(solver)
+        self.shard_count = shards
+        self.channels: List[_Channel] = []
+        self.processes: List[multiprocessing.Process] = []
+        self._shard_of: Dict[str, int] = {}
+        self._idle: Set[str] = set()
+        self._dead: Set[int] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def idle_ships(self) -> List[Ship]:
+        return [self.ships[symbol] for symbol in sorted(self._idle)]
+
+    def push(self, order: PendingWorkOrder) -> None:
+        if not order.portable:
+            raise ValueError(f"{order} can not be sent to a shard, give it a payload instead of build")
+        super().push(order)
+
+    async def load_ships(self):
+        # the controllers live in the shards
+        self.ships = {ship.symbol: ship for ship in await get_ship_list()}
+        for i, symbol in enumerate(sorted(self.ships)):
+            self._shard_of[symbol] = i % self.shard_count
+
+    def start_controllers(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("spawn")
+        for i in range(self.shard_count):
+            ours, theirs = context.Pipe()
+            ships = [ship.model_dump(mode="json", by_alias=True)
+                     for symbol, ship in self.ships.items() if self._shard_of[symbol] == i]
+            process = context.Process(target=run_shard, args=(theirs, i, ships),
+                                      name=f"shard-{i}", daemon=True)
+            process.start()
+            theirs.close()
+            channel = _Channel(ours, lambda message, i=i: _call_soon(self._loop, self._handle, i, message),
+                               f"coordinator-pipe-{i}")
+            channel.start()
+            self.processes.append(process)
+            self.channels.append(channel)
+            logger.info(f"shard {i} started with {len(ships)} ships")
+
+    def _send(self, shard: int, *message) -> bool:
+        if shard in self._dead:
+            return False
+        try:
+            self.channels[shard].send(*message)
+            return True
+        except (BrokenPipeError, EOFError, OSError) as e:
+            logger.error(f"sending to shard {shard} failed: {e!r}")
+            self._drop_shard(shard)
+            return False
+
+    def _drop_shard(self, shard: int) -> None:
+        if shard in self._dead:
+            return
+        self._dead.add(shard)
+        logger.error(f"shard {shard} exited, its ships are no longer controlled")
+        for symbol, i in self._shard_of.items():
+            if i == shard:
+                self._idle.discard(symbol)
+                # the order it was running goes back to the queue for the other shards
+                self.finished(symbol, succeeded=False)
+
+    async def _grant(self, shard: int, request_id: int, priority: Priority) -> None:
+        await login.rate_limiter.async_acquire(priority)
+        self._send(shard, "granted", request_id)
+
+    def _handle(self, shard: int, message) -> None:
+        match message:
+            case ("acquire", request_id, priority):
+                spawn(self._grant(shard, request_id, Priority(priority)), name=f"grant {shard}/{request_id}")
+            case ("penalize", seconds):
+                login.rate_limiter.penalize(seconds)
+            case ("idle", symbol, ship, succeeded):
+                self.ships[symbol] = Ship.model_validate(ship)
+                self._idle.add(symbol)
+                self.finished(symbol, succeeded)
+            case ("closed",):
+                self._drop_shard(shard)
+            case _:
+                logger.error(f"unknown message from shard {shard} {message!r}")
+
+    async def dispatch(self) -> None:
+        if not len(self.queue):
+            return
+        for ship, order in await self.queue.async_assign(self.idle_ships()):
+            self._idle.discard(ship.symbol)
+            self._running[ship.symbol] = order.key
+            if not self._send(self._shard_of[ship.symbol], "assign", ship.symbol, order.key, str(order.kind), order.payload):
+                self.finished(ship.symbol, succeeded=False)
+        self._wake_for_retries()
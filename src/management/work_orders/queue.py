@@ -0,0 +1,163 @@
+from datetime import datetime, timedelta
+from enum import StrEnum
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+import numpy as np
+from management.assignment import SOLVERS, AssignmentSolver
+from management.work_orders.work_order import FulfillProcurementContract, WorkOrder
+from pathfinding.galaxy import async_plan_interstellar_route
+from pathfinding.planner import async_plan_route, leg_time
+from schemas.contract import Contract
+from schemas.navigation import ShipNavFlightMode
+from schemas.ship import Ship
+from utils.utils import system_symbol_from_wp_symbol, utcnow
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+# an order that failed waits RETRY_BASE before it is handed out again, doubling on every failure in a row
+RETRY_BASE = timedelta(seconds=30)
+RETRY_MAX = timedelta(minutes=30)
+
+
+class WorkOrderKind(StrEnum):
+    # every kind needs a builder in WORK_ORDER_BUILDERS, otherwise its orders cannot cross to a shard
+    CONTRACT = "CONTRACT"
+
+
+# builds the WorkOrder for an order described by plain data, so orders can be sent to other processes
+WORK_ORDER_BUILDERS: Dict[WorkOrderKind, Callable[[Ship, Any], WorkOrder]] = {
+    WorkOrderKind.CONTRACT: lambda ship, payload: FulfillProcurementContract(ship, Contract.model_validate(payload)),
+}
+
+
+class PendingWorkOrder:
+    """Work waiting for a ship, the WorkOrder itself is only built once a ship is chosen."""
+
+    def __init__(self, key: str, kind: WorkOrderKind, location: str, build: Optional[Callable[[Ship], WorkOrder]] = None,
+                 work_time: float = 0, can_do: Optional[Callable[[Ship], bool]] = None, payload: Any = None) -> None:
+        # orders with the same key are the same piece of work, it is never queued or run twice
+        self.key = key
+        self.kind = kind
+        # waypoint the ship has to reach before the work starts
+        self.location = location
+        # without build the order is made by WORK_ORDER_BUILDERS[kind] from the json-able payload
+        self.build = build
+        self.payload = payload
+        # seconds of work once there, not counting the trip
+        self.work_time = work_time
+        self.can_do = can_do
+
+    @property
+    def portable(self) -> bool:
+        return self.build is None and self.kind in WORK_ORDER_BUILDERS
+
+    def build_for(self, ship: Ship) -> WorkOrder:
+        if self.build:
+            return self.build(ship)
+        return WORK_ORDER_BUILDERS[self.kind](ship, self.payload)
+
+    def __repr__(self) -> str:
+        return f"PendingWorkOrder({self.key}, {self.kind}, {self.location})"
+
+
+async def async_travel_time(ship: Ship, destination: str) -> float:
+    """Seconds for ship to get from where it is to destination, inf when there is no known way."""
+    start = ship.nav.waypointSymbol
+    if start == destination:
+        return 0
+    if system_symbol_from_wp_symbol(start) == system_symbol_from_wp_symbol(destination):
+        plan = await async_plan_route(start, destination, ship.fuel.capacity, ship.fuel.current,
+                                      ship.engine.speed, ship.nav.flightMode)
+        return plan.travel_time if plan else float("inf")
+    route = await async_plan_interstellar_route(start, destination, ship.fuel.capacity)
+    if route is None:
+        return float("inf")
+    return leg_time(round(route.cost), ShipNavFlightMode.CRUISE, ship.engine.speed)
+
+
+async def async_completion_times(ships: List[Ship], orders: List[PendingWorkOrder]) -> np.ndarray:
+    """ships x orders estimated seconds from now until each ship would be done with each order.
+
+    Every route is planned concurrently on the planning pool.
+    """
+    now = utcnow()
+    times = np.full((len(ships), len(orders)), np.inf)
+    pairs = [(i, j) for i, ship in enumerate(ships) for j, order in enumerate(orders)
+             if not order.can_do or order.can_do(ship)]
+    travel = await asyncio.gather(*(async_travel_time(ships[i], orders[j].location) for i, j in pairs))
+    for (i, j), seconds in zip(pairs, travel):
+        busy = max(0.0, (ships[i].timeline.ready_at() - now).total_seconds())
+        times[i, j] = busy + seconds + orders[j].work_time
+    return times
+
+
+class WorkOrderQueue:
+    def __init__(self, solver: AssignmentSolver | str = "greedy") -> None:
+        self.solver: AssignmentSolver = SOLVERS[solver] if isinstance(solver, str) else solver
+        self._pending: Dict[str, PendingWorkOrder] = {}
+        self._running: Set[str] = set()
+        # key -> failures in a row and when the order may be handed out again
+        self._failures: Dict[str, Tuple[int, datetime]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._pending or key in self._running
+
+    def push(self, order: PendingWorkOrder) -> bool:
+        if order.key in self:
+            return False
+        self._pending[order.key] = order
+        return True
+
+    def cancel(self, key: str) -> None:
+        self._pending.pop(key, None)
+        self._failures.pop(key, None)
+
+    def finish(self, key: str, succeeded: bool = True) -> None:
+        self._running.discard(key)
+        if succeeded:
+            self._failures.pop(key, None)
+            return
+        attempts = self._failures.get(key, (0, None))[0] + 1
+        delay = min(RETRY_MAX, RETRY_BASE * 2 ** (attempts - 1))
+        self._failures[key] = attempts, utcnow() + delay
+        logger.info(f"{key} failed {attempts} times in a row, retrying in {delay}")
+
+    def retry_at(self, key: str) -> Optional[datetime]:
+        if failure := self._failures.get(key):
+            return failure[1]
+        return None
+
+    def next_retry(self) -> Optional[datetime]:
+        """Earliest moment a pending order that is backing off can be handed out again."""
+        now = utcnow()
+        waiting = [when for key in self._pending if (when := self.retry_at(key)) and when > now]
+        return min(waiting, default=None)
+
+    def _ready(self) -> List[PendingWorkOrder]:
+        now = utcnow()
+        return [order for key, order in self._pending.items()
+                if (when := self.retry_at(key)) is None or when <= now]
+
+    async def async_assign(self, ships: List[Ship]) -> List[Tuple[Ship, PendingWorkOrder]]:
+        """Match idle ships to pending orders minimizing completion time, matched orders leave the queue."""
+        orders = self._ready()
+        if not ships or not orders:
+            return []
+        times = await async_completion_times(ships, orders)
+        # orders taken or cancelled while the routes were being planned are not ours to hand out
+        times[:, [j for j, order in enumerate(orders) if order.key not in self._pending]] = np.inf
+        return self._take(ships, orders, times)
+
+    def _take(self, ships: List[Ship], orders: List[PendingWorkOrder], times: np.ndarray) -> List[Tuple[Ship, PendingWorkOrder]]:
+        assignments = []
+        for i, j in self.solver(times):
+            order = orders[j]
+            logger.info(f"{order} -> {ships[i].symbol}, done in {times[i, j]:.0f}s")
+            del self._pending[order.key]
+            self._running.add(order.key)
+            assignments.append((ships[i], order))
+        return assignments
@@ -1,34 +1,35 @@
 
 
-from asyncio import sleep
 from typing import Any, Coroutine, List, Set, override
-from crud.market import get_markets_exporting
-from crud.waypoint import get_waypoint_with_symbol
+from crud.market import async_get_markets_exporting
+from crud.waypoint import async_get_waypoint_with_symbol
+from pathfinding.graph import async_get_system_graph
 from schemas.contract import Contract
 from schemas.navigation import Waypoint
 from schemas.ship import Ship, ShipNavStatus
 from schemas.survey import Survey
+from utils.scheduler import scheduler
 
 
 class WorkOrder:
     def __init__(self, ship: Ship) -> None:
         self.ship = ship
 
-    def setup(self) -> bool:
+    async def setup(self) -> bool:
         return True
 
-    def cleanup(self) -> bool:
+    async def cleanup(self) -> bool:
         return True
 
     async def run() -> bool:
         return True
 
     async def execute(self) -> bool:
-        if not self.setup():
+        if not await self.setup():
             return False
         if not await self.run():
             return False
-        if not self.cleanup():
+        if not await self.cleanup():
             return False
         return True
 
@@ -41,7 +42,7 @@ class TravelToWaypoint(WorkOrder):
         super().__init__(ship)
 
     @override
-    def setup(self) -> bool:
+    async def setup(self) -> bool:
         return True
 
     async def run(self) -> Coroutine[Any, Any, bool]:
@@ -53,7 +54,7 @@ class WaitFor(WorkOrder):
         super().__init__(ship)
         self.time = t
     async def run(self):
-        await sleep(self.t)
+        await scheduler.sleep(self.time)
         return True
 
 
@@ -64,18 +65,24 @@ class FulfillProcurementContract(WorkOrder):
         super().__init__(ship)
 
     @override
-    def setup(self):
+    async def setup(self):
         self.ship.log("Procurement Contract Work Order Setup")
         self.good = self.contract.terms.deliver[0]
-        self.delivery_waypoint = get_waypoint_with_symbol(
+        self.delivery_waypoint = await async_get_waypoint_with_symbol(
             self.good.destinationSymbol)
 
-        markets = get_markets_exporting(self.good.tradeSymbol)
+        markets = await async_get_markets_exporting(self.good.tradeSymbol)
         if not markets:
             return False
-        markets.sort(key=lambda x: self.delivery_waypoint.distance_to(
-            get_waypoint_with_symbol(x.symbol)))
-        self.purchase_waypoint = markets[0]
+        graph = await async_get_system_graph(self.delivery_waypoint.systemSymbol)
+
+        def distance_to_delivery(market):
+            if market.symbol in graph and self.delivery_waypoint.symbol in graph:
+                return graph.distance_between(market.symbol, self.delivery_waypoint.symbol)
+            return float("inf")
+        markets.sort(key=distance_to_delivery)
+        # a Market rather than a Waypoint, route_navigate only needs its symbol
+        self.purchase_market = markets[0]
         self.units_to_deliver = self.good.unitsRequired - self.good.unitsFulfilled
         if self.units_to_deliver <= 0:
             return True
@@ -85,42 +92,41 @@ class FulfillProcurementContract(WorkOrder):
             self.units_to_pickup = self.units_to_deliver
         for symbol, units in self.ship.cargo.items().items():
             if symbol != self.good.tradeSymbol:
-                self.ship.jettison(symbol, units)
+                await self.ship.jettison(symbol, units)
         return True
 
     async def run(self):
         while True:
             if self.units_to_deliver == 0:  # we delivered everything
                 return True
-            if self.ship.nav.status == ShipNavStatus.IN_TRANSIT:
-                await sleep(self.ship.nav.route.time_remaining.total_seconds())
+            await self.ship.wait_for_arrival()
             # full cargo,or exact , head to destination
             if self.ship.cargo.capacity_remaining == 0 or self.ship.cargo.units == self.units_to_deliver:
                 if not await self.ship.route_navigate(self.delivery_waypoint):
                     return False
                 self.units_to_deliver -= self.ship.cargo.units
                 if self.ship.nav.status != ShipNavStatus.DOCKED:
-                    if not self.ship.dock():
+                    if not await self.ship.dock():
                         return False
-                if not self.ship.deliver_to_contract(
+                if not await self.ship.deliver_to_contract(
                         self.contract.id, self.good.tradeSymbol, self.ship.cargo.units):
                     return False
             else:
-                if not await self.ship.route_navigate(self.purchase_waypoint):
+                if not await self.ship.route_navigate(self.purchase_market):
                     return False
                 if self.ship.nav.status != ShipNavStatus.DOCKED:
-                    if not self.ship.dock():
+                    if not await self.ship.dock():
                         return False
                 batch_to_buy = self.units_to_pickup \
                     if self.units_to_pickup < self.ship.cargo.capacity_remaining \
                     else self.ship.cargo.capacity_remaining
-                if not self.ship.purchase(self.good.tradeSymbol, batch_to_buy):
+                if not await self.ship.purchase(self.good.tradeSymbol, batch_to_buy):
                     return False
                 self.units_to_pickup -= batch_to_buy
 
     @override
-    def cleanup(self):
-        return self.contract.fulfill()
+    async def cleanup(self):
+        return await self.contract.fulfill()
 
 
 class MineUntilFull(WorkOrder):
@@ -129,17 +135,17 @@ class MineUntilFull(WorkOrder):
         super().__init__(ship)
         self.look_for = look_for
 
-    def setup(self) -> bool:
+    async def setup(self) -> bool:
         return True
 
-    def cleanup(self) -> bool:
+    async def cleanup(self) -> bool:
         return True
 
     async def run(self) -> bool:
         surveys: List[Survey] = []
         while True:
             if not surveys:
-                success, surveys = self.ship.survey()
+                success, surveys = await self.ship.survey()
                 def sort_func(x): return x.rank_survey(self.look_for)
                 surveys = list(filter(sort_func, surveys))
                 if surveys:
@@ -150,7 +156,7 @@ class MineUntilFull(WorkOrder):
                     if not survey.is_valid:
                         surveys = []
                         continue
-                success, extraction = self.ship.extract(survey)
+                success, extraction = await self.ship.extract(survey)
                 if success and extraction.yield_field.symbol not in self.look_for:
-                    self.ship.jettison(
+                    await self.ship.jettison(
                         extraction.yield_field.symbol, extraction.yield_field.units)
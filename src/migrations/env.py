@@ -0,0 +1,42 @@
+from alembic import context
+
+from login import engine
+from models import Base
+import models.waypoint  # noqa: F401 register every table on Base.metadata
+import models.market  # noqa: F401
+import models.system  # noqa: F401
+import models.crawl  # noqa: F401
+import models.data_version  # noqa: F401
+
+config = context.config
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    context.configure(url=str(engine.url), target_metadata=target_metadata,
+                      literal_binds=True, render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # create_tables.py hands over its own connection, the alembic cli uses the app engine
+    if (connection := config.attributes.get("connection")) is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    # sqlite can only alter tables by copying them, batch mode does that for us
+    context.configure(connection=connection, target_metadata=target_metadata,
+                      render_as_batch=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
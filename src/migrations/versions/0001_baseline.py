@@ -0,0 +1,136 @@
+"""baseline, the schema create_tables.py used to create
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 17:24:48.010250
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('modifiers',
+    sa.Column('symbol', sa.Text(length=20), nullable=False),
+    sa.Column('name', sa.Text(length=30), nullable=False),
+    sa.Column('description', sa.Text(length=500), nullable=False),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+    op.create_table('trade_goods',
+    sa.Column('symbol', sa.Text(length=20), nullable=False),
+    sa.Column('name', sa.Text(length=30), nullable=False),
+    sa.Column('description', sa.Text(length=500), nullable=False),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+    op.create_table('traits',
+    sa.Column('symbol', sa.Text(length=20), nullable=False),
+    sa.Column('name', sa.Text(length=30), nullable=False),
+    sa.Column('description', sa.Text(length=500), nullable=False),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+    op.create_table('waypoints',
+    sa.Column('symbol', sa.Text(length=20), nullable=False),
+    sa.Column('systemSymbol', sa.Text(length=20), nullable=False),
+    sa.Column('wp_type', sa.Text(length=20), nullable=False),
+    sa.Column('x', sa.Integer(), nullable=False),
+    sa.Column('y', sa.Integer(), nullable=False),
+    sa.Column('isUnderConstruction', sa.Boolean(), nullable=True),
+    sa.Column('parent_symbol', sa.Text(length=20), nullable=True),
+    sa.Column('faction', sa.Text(length=20), nullable=True),
+    sa.Column('time_updated', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['parent_symbol'], ['waypoints.symbol'], ),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+    op.create_table('markets',
+    sa.Column('symbol', sa.Text(length=20), nullable=False),
+    sa.Column('time_updated', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['symbol'], ['waypoints.symbol'], ),
+    sa.PrimaryKeyConstraint('symbol')
+    )
+    op.create_table('waypoint_modifiers',
+    sa.Column('wp_symbol', sa.Text(length=20), nullable=False),
+    sa.Column('modifier_symbol', sa.Text(length=20), nullable=False),
+    sa.ForeignKeyConstraint(['modifier_symbol'], ['modifiers.symbol'], ),
+    sa.ForeignKeyConstraint(['wp_symbol'], ['waypoints.symbol'], ),
+    sa.PrimaryKeyConstraint('wp_symbol', 'modifier_symbol')
+    )
+    op.create_table('waypoint_traits',
+    sa.Column('wp_symbol', sa.Text(length=20), nullable=False),
+    sa.Column('trait_symbol', sa.Text(length=20), nullable=False),
+    sa.ForeignKeyConstraint(['trait_symbol'], ['traits.symbol'], ),
+    sa.ForeignKeyConstraint(['wp_symbol'], ['waypoints.symbol'], ),
+    sa.PrimaryKeyConstraint('wp_symbol', 'trait_symbol')
+    )
+    op.create_table('market_exchanges',
+    sa.Column('market_symbol', sa.Text(length=20), nullable=False),
+    sa.Column('good_symbol', sa.Text(length=20), nullable=False),
+    sa.ForeignKeyConstraint(['good_symbol'], ['trade_goods.symbol'], ),
+    sa.ForeignKeyConstraint(['market_symbol'], ['markets.symbol'], ),
+    sa.PrimaryKeyConstraint('market_symbol', 'good_symbol')
+    )
+    op.create_table('market_exports',
+    sa.Column('market_symbol', sa.Text(length=20), nullable=False),
+    sa.Column('good_symbol', sa.Text(length=20), nullable=False),
+    sa.ForeignKeyConstraint(['good_symbol'], ['trade_goods.symbol'], ),
+    sa.ForeignKeyConstraint(['market_symbol'], ['markets.symbol'], ),
+    sa.PrimaryKeyConstraint('market_symbol', 'good_symbol')
+    )
+    op.create_table('market_imports',
+    sa.Column('market_symbol', sa.Text(length=20), nullable=False),
+    sa.Column('good_symbol', sa.Text(length=20), nullable=False),
+    sa.ForeignKeyConstraint(['good_symbol'], ['trade_goods.symbol'], ),
+    sa.ForeignKeyConstraint(['market_symbol'], ['markets.symbol'], ),
+    sa.PrimaryKeyConstraint('market_symbol', 'good_symbol')
+    )
+    op.create_table('market_trade_goods',
+    sa.Column('market_symbol', sa.Text(length=20), nullable=False),
+    sa.Column('good_symbol', sa.Text(length=20), nullable=False),
+    sa.Column('type', sa.Text(length=20), nullable=False),
+    sa.Column('trade_volume', sa.Integer(), nullable=False),
+    sa.Column('supply', sa.Text(length=20), nullable=False),
+    sa.Column('activity', sa.Text(length=20), nullable=True),
+    sa.Column('purchase_price', sa.Integer(), nullable=False),
+    sa.Column('sell_price', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['good_symbol'], ['trade_goods.symbol'], ),
+    sa.ForeignKeyConstraint(['market_symbol'], ['markets.symbol'], ),
+    sa.PrimaryKeyConstraint('market_symbol', 'good_symbol')
+    )
+    op.create_table('market_transactions',
+    sa.Column('ship_symbol', sa.Text(length=20), nullable=False),
+    sa.Column('time_stamp', sa.DateTime(), nullable=False),
+    sa.Column('symbol', sa.Text(length=20), nullable=False),
+    sa.Column('trade_symbol', sa.Text(length=20), nullable=False),
+    sa.Column('type', sa.Text(length=20), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('price_per_unit', sa.Integer(), nullable=False),
+    sa.Column('total_price', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['symbol'], ['markets.symbol'], ),
+    sa.ForeignKeyConstraint(['trade_symbol'], ['trade_goods.symbol'], ),
+    sa.PrimaryKeyConstraint('ship_symbol', 'time_stamp')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('market_transactions')
+    op.drop_table('market_trade_goods')
+    op.drop_table('market_imports')
+    op.drop_table('market_exports')
+    op.drop_table('market_exchanges')
+    op.drop_table('waypoint_traits')
+    op.drop_table('waypoint_modifiers')
+    op.drop_table('markets')
+    op.drop_table('waypoints')
+    op.drop_table('traits')
+    op.drop_table('trade_goods')
+    op.drop_table('modifiers')
@@ -0,0 +1,116 @@
+"""systems, jump gates, price history and crawl frontier
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 17:25:30.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# databases made by create_all before migrations existed may already have some of these
+def _has_table(table: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def _has_index(table: str, index: str) -> bool:
+    return index in {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _has_table('systems'):
+        op.create_table('systems',
+        sa.Column('symbol', sa.Text(length=20), nullable=False),
+        sa.Column('sectorSymbol', sa.Text(length=20), nullable=False),
+        sa.Column('system_type', sa.Text(length=20), nullable=False),
+        sa.Column('x', sa.Integer(), nullable=False),
+        sa.Column('y', sa.Integer(), nullable=False),
+        sa.Column('jump_gate_symbol', sa.Text(length=20), nullable=True),
+        sa.Column('time_updated', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('symbol')
+        )
+    if not _has_table('jump_gates'):
+        op.create_table('jump_gates',
+        sa.Column('symbol', sa.Text(length=20), nullable=False),
+        sa.Column('system_symbol', sa.Text(length=20), nullable=False),
+        sa.Column('time_updated', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('symbol')
+        )
+    if not _has_table('jump_gate_connections'):
+        op.create_table('jump_gate_connections',
+        sa.Column('gate_symbol', sa.Text(length=20), nullable=False),
+        sa.Column('connection_symbol', sa.Text(length=20), nullable=False),
+        sa.ForeignKeyConstraint(['gate_symbol'], ['jump_gates.symbol'], ),
+        sa.PrimaryKeyConstraint('gate_symbol', 'connection_symbol')
+        )
+    if not _has_table('market_price_history'):
+        op.create_table('market_price_history',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('market_symbol', sa.Text(length=20), nullable=False),
+        sa.Column('good_symbol', sa.Text(length=20), nullable=False),
+        sa.Column('time_stamp', sa.DateTime(), nullable=False),
+        sa.Column('purchase_price', sa.Integer(), nullable=False),
+        sa.Column('sell_price', sa.Integer(), nullable=False),
+        sa.Column('supply', sa.Text(length=20), nullable=False),
+        sa.Column('trade_volume', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('market_price_history', schema=None) as batch_op:
+            batch_op.create_index('ix_market_price_history_good_time', ['good_symbol', 'time_stamp'], unique=False)
+            batch_op.create_index('ix_market_price_history_market_good_time', ['market_symbol', 'good_symbol', 'time_stamp'], unique=False)
+    if not _has_table('crawl_frontier'):
+        op.create_table('crawl_frontier',
+        sa.Column('kind', sa.Text(length=20), nullable=False),
+        sa.Column('symbol', sa.Text(length=20), nullable=False),
+        sa.Column('status', sa.Text(length=20), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('time_updated', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('kind', 'symbol')
+        )
+        with op.batch_alter_table('crawl_frontier', schema=None) as batch_op:
+            batch_op.create_index('ix_crawl_frontier_status_kind', ['status', 'kind'], unique=False)
+
+    if not _has_column('market_trade_goods', 'time_updated'):
+        with op.batch_alter_table('market_trade_goods', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('time_updated', sa.DateTime(), nullable=True))
+    with op.batch_alter_table('market_transactions', schema=None) as batch_op:
+        if not _has_index('market_transactions', 'ix_market_transactions_good_time'):
+            batch_op.create_index('ix_market_transactions_good_time', ['trade_symbol', 'time_stamp'], unique=False)
+        if not _has_index('market_transactions', 'ix_market_transactions_market_time'):
+            batch_op.create_index('ix_market_transactions_market_time', ['symbol', 'time_stamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('market_transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_market_transactions_market_time')
+        batch_op.drop_index('ix_market_transactions_good_time')
+
+    with op.batch_alter_table('market_trade_goods', schema=None) as batch_op:
+        batch_op.drop_column('time_updated')
+
+    with op.batch_alter_table('crawl_frontier', schema=None) as batch_op:
+        batch_op.drop_index('ix_crawl_frontier_status_kind')
+    op.drop_table('crawl_frontier')
+    with op.batch_alter_table('market_price_history', schema=None) as batch_op:
+        batch_op.drop_index('ix_market_price_history_market_good_time')
+        batch_op.drop_index('ix_market_price_history_good_time')
+    op.drop_table('market_price_history')
+    op.drop_table('jump_gate_connections')
+    op.drop_table('jump_gates')
+    op.drop_table('systems')
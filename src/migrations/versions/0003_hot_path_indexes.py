@@ -0,0 +1,50 @@
+"""indexes for waypoint by system and market by good lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 17:26:10.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> (index, columns), every one of them is read by the crud layer on hot paths
+INDEXES = {
+    'waypoints': [('ix_waypoints_systemSymbol', ['systemSymbol']),
+                  ('ix_waypoints_parent_symbol', ['parent_symbol'])],
+    'waypoint_traits': [('ix_waypoint_traits_trait_wp', ['trait_symbol', 'wp_symbol'])],
+    'market_exports': [('ix_market_exports_good_market', ['good_symbol', 'market_symbol'])],
+    'market_imports': [('ix_market_imports_good_market', ['good_symbol', 'market_symbol'])],
+    'market_exchanges': [('ix_market_exchanges_good_market', ['good_symbol', 'market_symbol'])],
+    'market_trade_goods': [('ix_market_trade_goods_good_market', ['good_symbol', 'market_symbol'])],
+}
+
+
+def _has_index(table: str, index: str) -> bool:
+    return index in {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, indexes in INDEXES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for index, columns in indexes:
+                if not _has_index(table, index):
+                    batch_op.create_index(index, columns, unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, indexes in INDEXES.items():
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            for index, _ in indexes:
+                batch_op.drop_index(index)
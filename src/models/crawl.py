@@ -0,0 +1,20 @@
+from sqlalchemy import Column, DateTime, Index, Integer, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from utils.utils import utcnow
+
+from . import Base
+
+
+class CrawlTaskModel(Base):
+    """Frontier of the galaxy crawler, a task stays PENDING until its data is stored."""
+    __tablename__ = "crawl_frontier"
+    __table_args__ = (
+        Index("ix_crawl_frontier_status_kind", "status", "kind"),
+    )
+    kind: Mapped[str] = mapped_column(Text(20), primary_key=True)
+    symbol: Mapped[str] = mapped_column(Text(20), primary_key=True)
+    status: Mapped[str] = mapped_column(Text(20), default="PENDING")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    time_updated = Column(DateTime(timezone=False),
+                          default=utcnow, onupdate=utcnow)
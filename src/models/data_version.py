@@ -0,0 +1,11 @@
+from sqlalchemy import Integer, Text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from . import Base
+
+
+class DataVersionModel(Base):
+    """Change counter of a slice of the data caches are derived from, e.g. one system's waypoints."""
+    __tablename__ = "data_versions"
+    scope: Mapped[str] = mapped_column(Text(40), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, default=0)
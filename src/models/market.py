@@ -1,6 +1,6 @@
 from datetime import UTC
 from typing import List, Optional
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, Table, Text
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, Table, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from models.waypoint import WaypointModel
@@ -15,6 +15,8 @@ market_exports = Table(
            primary_key=True, type_=Text(20)),
     Column("good_symbol", ForeignKey("trade_goods.symbol"),
            primary_key=True, type_=Text(20)),
+    # the primary key leads with the market, markets trading a good need the reverse
+    Index("ix_market_exports_good_market", "good_symbol", "market_symbol"),
 )
 market_imports = Table(
     "market_imports",
@@ -23,6 +25,7 @@ market_imports = Table(
            primary_key=True, type_=Text(20)),
     Column("good_symbol", ForeignKey("trade_goods.symbol"),
            primary_key=True, type_=Text(20)),
+    Index("ix_market_imports_good_market", "good_symbol", "market_symbol"),
 )
 
 market_exchanges = Table(
@@ -32,6 +35,7 @@ market_exchanges = Table(
            primary_key=True, type_=Text(20)),
     Column("good_symbol", ForeignKey("trade_goods.symbol"),
            primary_key=True, type_=Text(20)),
+    Index("ix_market_exchanges_good_market", "good_symbol", "market_symbol"),
 )
 
 
@@ -62,6 +66,8 @@ class MarketModel(Base):
     exchanges: Mapped[List[TradeGoodModel]] = relationship(
         secondary=market_exchanges, back_populates="exchangers")
     transactions: Mapped[List["MarketTransactionModel"]] = relationship(back_populates="market")
+    trade_goods: Mapped[List["MarketTradeGoodModel"]] = relationship(
+        back_populates="market", cascade="all, delete-orphan")
     time_updated = Column(DateTime(timezone=False),
                         default=utcnow, onupdate=utcnow)
 
@@ -72,6 +78,10 @@ class MarketModel(Base):
 
 class MarketTransactionModel(Base):
     __tablename__ = "market_transactions"
+    __table_args__ = (
+        Index("ix_market_transactions_market_time", "symbol", "time_stamp"),
+        Index("ix_market_transactions_good_time", "trade_symbol", "time_stamp"),
+    )
     ship_symbol = mapped_column(Text(20), primary_key=True)
     time_stamp: Mapped[DateTime] = mapped_column(DateTime(timezone=False), primary_key=True)
     symbol: Mapped[str] = mapped_column(
@@ -88,8 +98,12 @@ class MarketTransactionModel(Base):
 
 class MarketTradeGoodModel(Base):
     __tablename__ = "market_trade_goods"
+    __table_args__ = (
+        Index("ix_market_trade_goods_good_market", "good_symbol", "market_symbol"),
+    )
     market_symbol: Mapped[str] = mapped_column(
         Text(20), ForeignKey(MarketModel.symbol), primary_key=True)
+    market: Mapped[MarketModel] = relationship(back_populates="trade_goods")
     good_symbol:  Mapped[str] = mapped_column(
         Text(20), ForeignKey(TradeGoodModel.symbol), primary_key=True)
     type:  Mapped[str] = mapped_column(Text(20))
@@ -98,3 +112,23 @@ class MarketTradeGoodModel(Base):
     activity: Mapped[Optional[str]] = mapped_column(Text(20))
     purchase_price: Mapped[Integer] = mapped_column(Integer)
     sell_price: Mapped[Integer] = mapped_column(Integer)
+    time_updated = Column(DateTime(timezone=False),
+                          default=utcnow, onupdate=utcnow)
+
+
+class MarketPriceHistoryModel(Base):
+    """Append only, one row per good every time a market reports its prices."""
+    __tablename__ = "market_price_history"
+    __table_args__ = (
+        Index("ix_market_price_history_good_time", "good_symbol", "time_stamp"),
+        Index("ix_market_price_history_market_good_time",
+              "market_symbol", "good_symbol", "time_stamp"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    market_symbol: Mapped[str] = mapped_column(Text(20))
+    good_symbol: Mapped[str] = mapped_column(Text(20))
+    time_stamp: Mapped[DateTime] = mapped_column(DateTime(timezone=False))
+    purchase_price: Mapped[Integer] = mapped_column(Integer)
+    sell_price: Mapped[Integer] = mapped_column(Integer)
+    supply: Mapped[str] = mapped_column(Text(20))
+    trade_volume: Mapped[Integer] = mapped_column(Integer)
@@ -0,0 +1,46 @@
+from datetime import UTC
+from typing import List, Optional
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, Text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+
+from utils.utils import utcnow
+
+from . import Base
+
+
+class SystemModel(Base):
+    __tablename__ = "systems"
+    symbol: Mapped[str] = mapped_column(Text(20), primary_key=True)
+    sectorSymbol: Mapped[str] = mapped_column(Text(20))
+    system_type: Mapped[str] = mapped_column(Text(20))
+    x: Mapped[int] = mapped_column(Integer)
+    y: Mapped[int] = mapped_column(Integer)
+    jump_gate_symbol: Mapped[Optional[str]] = mapped_column(Text(20))
+    time_updated = Column(DateTime(timezone=False),
+                          default=utcnow, onupdate=utcnow)
+
+    @property
+    def time_updated_utc(self):
+        return self.time_updated.replace(tzinfo=UTC)
+
+
+class JumpGateModel(Base):
+    __tablename__ = "jump_gates"
+    symbol: Mapped[str] = mapped_column(Text(20), primary_key=True)
+    system_symbol: Mapped[str] = mapped_column(Text(20))
+    connections: Mapped[List["JumpGateConnectionModel"]] = relationship(
+        back_populates="gate", cascade="all, delete-orphan")
+    time_updated = Column(DateTime(timezone=False),
+                          default=utcnow, onupdate=utcnow)
+
+    @property
+    def time_updated_utc(self):
+        return self.time_updated.replace(tzinfo=UTC)
+
+
+class JumpGateConnectionModel(Base):
+    __tablename__ = "jump_gate_connections"
+    gate_symbol: Mapped[str] = mapped_column(
+        Text(20), ForeignKey(JumpGateModel.symbol), primary_key=True)
+    connection_symbol: Mapped[str] = mapped_column(Text(20), primary_key=True)
+    gate: Mapped[JumpGateModel] = relationship(back_populates="connections")
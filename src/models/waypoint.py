@@ -1,6 +1,6 @@
 from datetime import UTC
 from typing import List, Optional
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, Table, Text
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, Table, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from utils.utils import utcnow
@@ -16,6 +16,7 @@ waypoint_traits = Table(
            primary_key=True, type_=Text(20)),
     Column("trait_symbol", ForeignKey("traits.symbol"),
            primary_key=True, type_=Text(20)),
+    Index("ix_waypoint_traits_trait_wp", "trait_symbol", "wp_symbol"),
 )
 
 waypoint_modifiers = Table(
@@ -49,17 +50,18 @@ class TraitModel(Base):
 class WaypointModel(Base):
     __tablename__ = "waypoints"
     symbol: Mapped[str] = mapped_column(Text(20), primary_key=True)
-    systemSymbol: Mapped[str] = mapped_column(Text(20))
+    systemSymbol: Mapped[str] = mapped_column(Text(20), index=True)
     wp_type: Mapped[str] = mapped_column(Text(20))
     x: Mapped[int] = mapped_column(Integer)
     y: Mapped[int] = mapped_column(Integer)
     isUnderConstruction: Mapped[Optional[bool]] = mapped_column(Boolean)
     parent_symbol: Mapped[Optional[str]] = mapped_column(
-        Text(20), ForeignKey("waypoints.symbol"))
+        Text(20), ForeignKey("waypoints.symbol"), index=True)
     faction: Mapped[Optional[str]] = mapped_column(Text(20))
-    orbits: Mapped["WaypointModel"] = relationship(back_populates="orbitals")
+    orbits: Mapped[Optional["WaypointModel"]] = relationship(
+        back_populates="orbitals", remote_side=[symbol])
     orbitals: Mapped[List["WaypointModel"]] = relationship(
-        back_populates="orbits", remote_side=[symbol], uselist=True, lazy='subquery')
+        back_populates="orbits")
     traits: Mapped[List[TraitModel]] = relationship(
         secondary=waypoint_traits, back_populates="waypoints")
     modifiers: Mapped[List[ModifierModel]] = relationship(
@@ -0,0 +1,76 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count, environ
+from typing import Any, Callable, Dict, List, Optional
+from pathfinding.graph import GraphSnapshot, SystemGraph, cached_graphs
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+# 0 plans on a thread of this process instead
+PLANNING_WORKERS = int(environ.get("SPACETRADERS_PLANNING_WORKERS", max(1, (cpu_count() or 2) - 1)))
+
+
+class GraphMissing(Exception):
+    """The worker does not hold the graph the task needs yet."""
+
+
+# graphs a worker process has been sent, kept for every later task on that worker
+_worker_graphs: Dict[str, SystemGraph] = {}
+
+
+def _load_graphs(snapshots: List[GraphSnapshot]) -> None:
+    for snapshot in snapshots:
+        graph = SystemGraph.from_snapshot(snapshot)
+        _worker_graphs[graph.system_symbol] = graph
+
+
+def _run_on_graph(f: Callable, system_symbol: str, version: int, snapshot: Optional[GraphSnapshot], args: tuple, kwargs: dict):
+    graph = _worker_graphs.get(system_symbol)
+    if graph is None or graph.version != version:
+        if snapshot is None:
+            raise GraphMissing(system_symbol)
+        graph = _worker_graphs[system_symbol] = SystemGraph.from_snapshot(snapshot)
+    return f(*args, graph=graph, **kwargs)
+
+
+class PlanningExecutor:
+    """Runs planners on a process pool so they never stall the event loop.
+
+    Tasks only name their graph, a worker that does not have it yet answers GraphMissing
+    and gets it sent along on the retry, so each graph crosses to each worker once.
+    """
+
+    def __init__(self, workers: int = PLANNING_WORKERS) -> None:
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # whatever graphs are already built go out with the workers' start up
+            snapshots = [graph.snapshot() for graph in cached_graphs()]
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_load_graphs, initargs=(snapshots,))
+            logger.info(f"planning pool started with {self.workers} workers, {len(snapshots)} graphs preloaded")
+        return self._pool
+
+    async def run(self, graph: SystemGraph, f: Callable, *args, **kwargs) -> Any:
+        """f(*args, graph=graph, **kwargs) on a worker, f has to be a module level function."""
+        if self.workers <= 0:
+            return await asyncio.to_thread(f, *args, graph=graph, **kwargs)
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        try:
+            return await loop.run_in_executor(pool, _run_on_graph, f, graph.system_symbol, graph.version, None, args, kwargs)
+        except GraphMissing:
+            return await loop.run_in_executor(pool, _run_on_graph, f, graph.system_symbol, graph.version,
+                                              graph.snapshot(), args, kwargs)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+
+planning_executor = PlanningExecutor()
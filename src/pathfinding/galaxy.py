@@ -0,0 +1,161 @@
+import asyncio
+from enum import StrEnum
+from heapq import heappop, heappush
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+
+from crud.system import galaxy_data_version, get_jump_connection_rows, get_system_rows
+from pathfinding.graph import get_system_graph
+from pathfinding.pathfinding import dijkstra_with_fuel
+from utils.utils import system_symbol_from_wp_symbol
+
+# costs are in the same distance units the intra system dijkstra uses
+JUMP_COST = 100
+WARP_COST_FACTOR = 4
+
+
+class LegKind(StrEnum):
+    JUMP = "JUMP"
+    WARP = "WARP"
+
+
+class SystemLeg(BaseModel):
+    kind: LegKind
+    origin_system: str
+    destination_system: str
+    departure_waypoint: str
+    arrival_waypoint: str
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.departure_waypoint} -> {self.arrival_waypoint}"
+
+
+class InterstellarRoute(BaseModel):
+    legs: List[SystemLeg]
+    cost: float
+
+
+class GalaxyGraph:
+    """Systems, their jump gates and gate links as loaded from the local database."""
+
+    def __init__(self, systems: List[Tuple[str, int, int, Optional[str]]], connections: List[Tuple[str, str, str]], version: int) -> None:
+        self.version = version
+        self.symbols = [symbol for symbol, _, _, _ in systems]
+        self.index: Dict[str, int] = {
+            symbol: i for i, symbol in enumerate(self.symbols)}
+        self.coordinates = np.array(
+            [(x, y) for _, x, y, _ in systems], dtype=np.float64).reshape(-1, 2)
+        self.gates: Dict[str, str] = {
+            symbol: gate for symbol, _, _, gate in systems if gate}
+        self.jumps: Dict[str, List[Tuple[str, str]]] = {}
+        for system, gate, connection in connections:
+            self.gates.setdefault(system, gate)
+            self.jumps.setdefault(system, []).append(
+                (system_symbol_from_wp_symbol(connection), connection))
+
+    def __contains__(self, system_symbol: str) -> bool:
+        return system_symbol in self.index
+
+    def distances_from(self, system_symbol: str) -> np.ndarray:
+        delta = self.coordinates - self.coordinates[self.index[system_symbol]]
+        return np.sqrt((delta ** 2).sum(axis=1))
+
+    def systems_within(self, system_symbol: str, radius: float) -> List[Tuple[str, float]]:
+        distances = self.distances_from(system_symbol)
+        return [(self.symbols[i], float(distances[i])) for i in np.nonzero(distances <= radius)[0]
+                if self.symbols[i] != system_symbol]
+
+
+_galaxy: Optional[GalaxyGraph] = None
+
+
+def get_galaxy_graph() -> GalaxyGraph:
+    global _galaxy
+    version = galaxy_data_version()
+    if _galaxy is None or _galaxy.version != version:
+        _galaxy = GalaxyGraph(get_system_rows(),
+                              get_jump_connection_rows(), version)
+    return _galaxy
+
+
+def _intra_system_cost(start: str, destination: str, fuel_capacity: int) -> float:
+    if start == destination:
+        return 0
+    graph = get_system_graph(system_symbol_from_wp_symbol(start))
+    if start not in graph or destination not in graph:
+        # systems we have not charted yet are assumed to be cheap to cross
+        return 0
+    _, distances, _ = dijkstra_with_fuel(
+        start, destination, graph, fuel_capacity, fuel_capacity)
+    return distances.get(destination, float("inf"))
+
+
+def plan_interstellar_route(start: str, destination: str, fuel_capacity: int, can_warp: bool = False) -> Optional[InterstellarRoute]:
+    start_system = system_symbol_from_wp_symbol(start)
+    destination_system = system_symbol_from_wp_symbol(destination)
+    if start_system == destination_system:
+        return InterstellarRoute(legs=[], cost=0)
+    galaxy = get_galaxy_graph()
+    if start_system not in galaxy or destination_system not in galaxy:
+        return None
+
+    intra_costs: Dict[Tuple[str, str], float] = {}
+
+    def intra(a: str, b: str) -> float:
+        if (a, b) not in intra_costs:
+            intra_costs[(a, b)] = _intra_system_cost(a, b, fuel_capacity)
+        return intra_costs[(a, b)]
+
+    def arrival_cost(system: str, waypoint: str) -> float:
+        return intra(waypoint, destination) if system == destination_system else 0
+
+    best = {start_system: 0}
+    previous: Dict[str, Tuple[str, SystemLeg]] = {}
+    visited = set()
+    heap = [(0, start_system, start)]
+    while heap:
+        cost, system, waypoint = heappop(heap)
+        if system in visited:
+            continue
+        visited.add(system)
+        if system == destination_system:
+            legs = []
+            while system != start_system:
+                system, leg = previous[system]
+                legs.append(leg)
+            legs.reverse()
+            return InterstellarRoute(legs=legs, cost=cost)
+
+        edges: List[Tuple[float, SystemLeg]] = []
+        if (gate := galaxy.gates.get(system)) and system in galaxy.jumps:
+            leave_cost = intra(waypoint, gate)
+            for next_system, next_gate in galaxy.jumps[system]:
+                edges.append((leave_cost + JUMP_COST, SystemLeg(kind=LegKind.JUMP, origin_system=system, destination_system=next_system,
+                                                                departure_waypoint=gate, arrival_waypoint=next_gate)))
+        if can_warp and fuel_capacity > 0:
+            for next_system, distance in galaxy.systems_within(system, fuel_capacity):
+                arrival = destination if next_system == destination_system else galaxy.gates.get(
+                    next_system)
+                if not arrival:
+                    continue
+                edges.append((distance * WARP_COST_FACTOR, SystemLeg(kind=LegKind.WARP, origin_system=system, destination_system=next_system,
+                                                                     departure_waypoint=waypoint, arrival_waypoint=arrival)))
+
+        for edge_cost, leg in edges:
+            next_system = leg.destination_system
+            if next_system in visited:
+                continue
+            new_cost = cost + edge_cost + \
+                arrival_cost(next_system, leg.arrival_waypoint)
+            if new_cost < best.get(next_system, float("inf")):
+                best[next_system] = new_cost
+                previous[next_system] = (system, leg)
+                heappush(heap, (new_cost, next_system, leg.arrival_waypoint))
+    return None
+
+
+async def async_plan_interstellar_route(start: str, destination: str, fuel_capacity: int,
+                                        can_warp: bool = False) -> Optional[InterstellarRoute]:
+    """plan_interstellar_route on a worker thread, on the db thread its search would hold up every query."""
+    return await asyncio.to_thread(plan_interstellar_route, start, destination, fuel_capacity, can_warp)
@@ -0,0 +1,112 @@
+import threading
+from typing import Dict, List, Tuple
+import numpy as np
+
+from crud.db_executor import run_db
+from crud.waypoint import cached_system_data_version, get_waypoints_in_system, system_data_version
+from schemas.navigation import Waypoint
+
+# system symbol, version, waypoint symbols, coordinates, marketplace flags
+GraphSnapshot = Tuple[str, int, List[str], np.ndarray, np.ndarray]
+
+
+class SystemGraph:
+    """Distance and fuel matrices for every waypoint of a system, built once per system data version."""
+
+    def __init__(self, system_symbol: str, waypoints: List[Waypoint], version: int) -> None:
+        self.waypoints = waypoints
+        self._build(system_symbol, version, [wp.symbol for wp in waypoints],
+                    np.array([(wp.x, wp.y) for wp in waypoints], dtype=np.float64).reshape(-1, 2),
+                    np.array([wp.has_trait("MARKETPLACE") for wp in waypoints], dtype=bool))
+
+    def snapshot(self) -> GraphSnapshot:
+        """The few fields everything else is derived from, cheap to pickle to another process."""
+        return self.system_symbol, self.version, self.symbols, self.coordinates, self.has_marketplace
+
+    @classmethod
+    def from_snapshot(cls, snapshot: GraphSnapshot) -> "SystemGraph":
+        graph = cls.__new__(cls)
+        # the waypoint models stay behind, planners only need the matrices
+        graph.waypoints = []
+        graph._build(*snapshot)
+        return graph
+
+    def _build(self, system_symbol: str, version: int, symbols: List[str], coordinates: np.ndarray,
+               has_marketplace: np.ndarray) -> None:
+        self.system_symbol = system_symbol
+        self.version = version
+        self.symbols = symbols
+        self.index: Dict[str, int] = {
+            symbol: i for i, symbol in enumerate(self.symbols)}
+        self.coordinates = coordinates
+        self.has_marketplace = has_marketplace
+        n = len(symbols)
+
+        delta = self.coordinates[:, None, :] - self.coordinates[None, :, :]
+        self.distances = np.sqrt((delta ** 2).sum(axis=2))
+        # same rounding as the server, a hop always costs at least 1 fuel
+        self.fuel = np.maximum(np.rint(self.distances), 1).astype(np.int64)
+        np.fill_diagonal(self.fuel, 0)
+
+        if self.has_marketplace.any():
+            self.nearest_market_fuel = self.fuel[:, self.has_marketplace].min(axis=1)
+        else:
+            self.nearest_market_fuel = np.full(
+                n, np.iinfo(np.int64).max)
+
+        # every other node sorted by fuel cost, so searches can stop at the first unreachable one
+        order = np.argsort(self.fuel, axis=1, kind="stable")
+        order = order[order != np.arange(n)[:, None]].reshape(n, max(n - 1, 0))
+        self.neighbours = order
+        self.neighbour_fuel = np.take_along_axis(self.fuel, order, axis=1)
+
+        # plain python copies for the hot loops, indexing numpy scalars one by one is slow
+        self.markets: List[bool] = self.has_marketplace.tolist()
+        self.nearest_market: List[int] = self.nearest_market_fuel.tolist()
+        self.adjacency: List[List[Tuple[int, int]]] = [
+            list(zip(costs, nodes)) for costs, nodes in zip(self.neighbour_fuel.tolist(), self.neighbours.tolist())]
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.index
+
+    def fuel_between(self, a: str, b: str) -> int:
+        return int(self.fuel[self.index[a], self.index[b]])
+
+    def distance_between(self, a: str, b: str) -> float:
+        return float(self.distances[self.index[a], self.index[b]])
+
+
+_graphs: Dict[str, SystemGraph] = {}
+_graphs_lock = threading.Lock()
+
+
+def get_system_graph(system_symbol: str) -> SystemGraph:
+    version = system_data_version(system_symbol)
+    with _graphs_lock:
+        graph = _graphs.get(system_symbol)
+    if graph is None or graph.version != version:
+        graph = SystemGraph(
+            system_symbol, get_waypoints_in_system(system_symbol), version)
+        with _graphs_lock:
+            # a slower builder must not replace a graph of newer data
+            current = _graphs.get(system_symbol)
+            if current is None or current.version < version:
+                _graphs[system_symbol] = graph
+    return graph
+
+
+def cached_graphs() -> List[SystemGraph]:
+    with _graphs_lock:
+        return list(_graphs.values())
+
+
+async def async_get_system_graph(system_symbol: str) -> SystemGraph:
+    with _graphs_lock:
+        graph = _graphs.get(system_symbol)
+    # asking the database for the version is left to the db thread
+    if graph is not None and graph.version == cached_system_data_version(system_symbol):
+        return graph
+    return await run_db(get_system_graph, system_symbol)
@@ -1,28 +1,15 @@
-
-
 from heapq import heappop, heappush
 from math import sqrt
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
-from crud.waypoint import get_waypoint_with_symbol
+from pathfinding.graph import SystemGraph, get_system_graph
+from pathfinding.planner import planning_fuel
+from pathfinding.route_cache import route_cache
 from schemas.navigation import Waypoint
-from crud import get_waypoints_in_system
 from utils.utils import system_symbol_from_wp_symbol
 
 
-class PathFindingWaypoint:
-    __slots__ = ["symbol", "x", "y",
-                 "has_marketplace", "nearest_market_distance"]
-
-    def __init__(self, symbol, x, y, has_marketplace, nearest_market_distance=float("inf")):
-        self.symbol = symbol
-        self.x = x
-        self.y = y
-        self.has_marketplace = has_marketplace
-        self.nearest_market_distance = nearest_market_distance
-
-
-def fuel_cost(A: PathFindingWaypoint, B: PathFindingWaypoint):
+def fuel_cost(A: Waypoint, B: Waypoint):
     if A == B:
         return 0
     x = round(sqrt((A.x-B.x)**2 + (A.y-B.y)**2))
@@ -31,68 +18,65 @@ def fuel_cost(A: PathFindingWaypoint, B: PathFindingWaypoint):
     return x
 
 
-def create_graph(waypoints: List[Waypoint])-> Dict[str, PathFindingWaypoint]:
-    wps = {wp.symbol: PathFindingWaypoint(
-        wp.symbol, wp.x, wp.y, wp.has_trait("MARKETPLACE")) for wp in waypoints}
-    markets = [v for v in wps.values() if v.has_marketplace]
-    for v in wps.values():
-        markets.sort(key=lambda x: fuel_cost(v, x))
-        v.nearest_market_distance = fuel_cost(v, markets[0])
-    return wps
-
-
-def dijkstra_with_fuel(start: str, destination: str, waypoints: List[Waypoint], max_fuel: int, starting_fuel: int) -> Optional[List[Waypoint]]:
+def dijkstra_with_fuel(start: str, destination: str, graph: SystemGraph, max_fuel: int, starting_fuel: int) -> Tuple[Dict[str, Optional[str]], Dict[str, int], Dict[str, bool]]:
     distances = {}
     previous = {}
     fuel = {}
-    wps = create_graph(waypoints)
+    start_node = graph.index[start]
+    destination_node = graph.index[destination]
     heap = []
-    if wps[start].has_marketplace:
-        heappush(heap, (0, max_fuel, start, None, True))
+    if graph.markets[start_node]:
+        heappush(heap, (0, max_fuel, start_node, None, True))
     else:
-        heappush(heap, (0, starting_fuel, start, None, False))
+        heappush(heap, (0, starting_fuel, start_node, None, False))
     while heap:
-        dist, fuel_remaining, symbol, prev, refuel = heappop(heap)
-        if symbol in distances:
+        dist, fuel_remaining, node, prev, refuel = heappop(heap)
+        if node in distances:
             continue  # we visited it before
 
-        distances[symbol] = dist
-        previous[symbol] = prev
-        fuel[symbol] = refuel
-        if symbol == destination:
-            return previous, distances, fuel
-        for neighbor in wps.values():
-            if neighbor.symbol == symbol:  # skip ourselves
+        distances[node] = dist
+        previous[node] = prev
+        fuel[node] = refuel
+        if node == destination_node:
+            break
+        for cost, neighbor in graph.adjacency[node]:
+            if cost >= fuel_remaining:
+                break  # neighbours are sorted by cost, nothing further away is reachable either
+            if neighbor in distances:  # we visited this neighbour already
                 continue
-            if neighbor.symbol not in distances:  # if we havent visited this neighbour yet
-                # check if we can travel to it
-                if fuel_cost(wps[symbol], neighbor) < fuel_remaining:
-                    if neighbor.has_marketplace:  # then we refuel on arrival making current fuel = max_fuel
-                        heappush(
-                            heap, (dist + fuel_cost(wps[symbol], neighbor), max_fuel, neighbor.symbol, symbol, True))
-                    # and if we aint gonna be stranded afterwards
-                    elif neighbor.nearest_market_distance <= fuel_remaining - fuel_cost(
-                            wps[symbol], neighbor):
-                        # otherwise, we consume some fuel instead and travel to it
-                        heappush(heap, (dist + fuel_cost(wps[symbol], neighbor), fuel_remaining - fuel_cost(
-                            wps[symbol], neighbor), neighbor.symbol, symbol, False))
+            if graph.markets[neighbor]:  # then we refuel on arrival making current fuel = max_fuel
+                heappush(heap, (dist + cost, max_fuel, neighbor, node, True))
+            # and if we aint gonna be stranded afterwards
+            elif graph.nearest_market[neighbor] <= fuel_remaining - cost:
+                # otherwise, we consume some fuel instead and travel to it
+                heappush(heap, (dist + cost, fuel_remaining - cost,
+                         neighbor, node, False))
 
-    return previous, distances, fuel
+    symbols = graph.symbols
+    return ({symbols[k]: symbols[v] if v is not None else None for k, v in previous.items()},
+            {symbols[k]: v for k, v in distances.items()},
+            {symbols[k]: v for k, v in fuel.items()})
 
 
-def calculate_route(start: str, destination: str, max_fuel: int, starting_fuel: int) -> Optional[List[str]]:
+def calculate_route(start: str, destination: str, max_fuel: int, starting_fuel: int) -> Optional[List[Tuple[Waypoint, bool]]]:
     start_system = system_symbol_from_wp_symbol(start)
     destination_system = system_symbol_from_wp_symbol(destination)
+    route = None  # routes across systems are planned by pathfinding.galaxy
     if start_system == destination_system:
-        waypoints = get_waypoints_in_system(start_system)
+        graph = get_system_graph(start_system)
+        key = (start_system, "dijkstra", start, destination, max_fuel,
+               planning_fuel(starting_fuel, max_fuel), graph.version)
+        if route := route_cache.get(key):
+            return route
         previous, distances, refuel = dijkstra_with_fuel(
-            start, destination, waypoints, max_fuel, starting_fuel)
+            start, destination, graph, max_fuel, planning_fuel(starting_fuel, max_fuel))
         if destination in previous:
             current = destination
             route = []
             while current != None:
                 route.append(
-                    (get_waypoint_with_symbol(current), refuel[current]))
+                    (graph.waypoints[graph.index[current]], refuel[current]))
                 current = previous[current]
             route.reverse()
+            route_cache.put(key, route)
     return route
@@ -0,0 +1,241 @@
+from enum import StrEnum
+from heapq import heappop, heappush
+from itertools import count
+from typing import Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel
+
+from pathfinding.executor import planning_executor
+from pathfinding.graph import SystemGraph, async_get_system_graph, get_system_graph
+from pathfinding.route_cache import route_cache
+from schemas.navigation import ShipNavFlightMode
+from utils.utils import system_symbol_from_wp_symbol
+
+# seconds per distance unit are multiplier / engine speed, every hop adds a fixed 15s
+FLIGHT_MODE_MULTIPLIER = {
+    ShipNavFlightMode.BURN: 12.5,
+    ShipNavFlightMode.CRUISE: 25,
+    ShipNavFlightMode.STEALTH: 30,
+    ShipNavFlightMode.DRIFT: 250,
+}
+HOP_BASE_TIME = 15
+DEFAULT_FLIGHT_MODES = (ShipNavFlightMode.CRUISE,
+                        ShipNavFlightMode.BURN, ShipNavFlightMode.DRIFT)
+# one api call to switch modes, three (dock, refuel, orbit) to refuel
+FLIGHT_MODE_CHANGE_TIME = 0.5
+REFUEL_TIME = 1.5
+# credits spent on fuel dominate the fuel objective, travel time only breaks ties
+FUEL_WEIGHT = 10_000
+FUEL_BUCKETS = 10
+
+
+class PlanObjective(StrEnum):
+    TIME = "TIME"
+    FUEL = "FUEL"
+
+
+class PlanAction(StrEnum):
+    FLIGHT_MODE = "FLIGHT_MODE"
+    NAVIGATE = "NAVIGATE"
+    REFUEL = "REFUEL"
+
+
+class PlanStep(BaseModel):
+    action: PlanAction
+    waypoint_symbol: str
+    flight_mode: Optional[ShipNavFlightMode] = None
+
+    def __str__(self) -> str:
+        if self.action == PlanAction.FLIGHT_MODE:
+            return f"{self.action} {self.flight_mode}"
+        return f"{self.action} {self.waypoint_symbol}"
+
+
+class RoutePlan(BaseModel):
+    steps: List[PlanStep]
+    travel_time: float
+    fuel_used: int
+
+    @property
+    def waypoints(self) -> List[str]:
+        return [step.waypoint_symbol for step in self.steps if step.action == PlanAction.NAVIGATE]
+
+
+def leg_fuel(distance_fuel: int, mode: ShipNavFlightMode) -> int:
+    match mode:
+        case ShipNavFlightMode.DRIFT:
+            return 1
+        case ShipNavFlightMode.BURN:
+            return 2 * distance_fuel
+        case _:
+            return distance_fuel
+
+
+def leg_time(distance_fuel: int, mode: ShipNavFlightMode, engine_speed: int) -> int:
+    return round(distance_fuel * FLIGHT_MODE_MULTIPLIER[mode] / engine_speed + HOP_BASE_TIME)
+
+
+def fuel_bucket(fuel: int, capacity: int) -> int:
+    if capacity <= 0:
+        return 0
+    return fuel * FUEL_BUCKETS // capacity
+
+
+def bucket_floor(fuel: int, capacity: int) -> int:
+    # the least fuel that still falls in the same bucket, routes planned with it stay valid for the whole bucket
+    if capacity <= 0:
+        return fuel
+    bucket = fuel_bucket(fuel, capacity)
+    return min(fuel, -(-bucket * capacity // FUEL_BUCKETS))
+
+
+def planning_fuel(fuel: int, capacity: int) -> int:
+    """Fuel a search starts with, the bucket floor except in the lowest bucket where that would be an empty tank."""
+    floor = bucket_floor(fuel, capacity)
+    return floor if floor > 0 else fuel
+
+
+def astar_with_fuel(start: str, destination: str, graph: SystemGraph, fuel_capacity: int, fuel_current: int,
+                    engine_speed: int, flight_mode: ShipNavFlightMode = ShipNavFlightMode.CRUISE,
+                    objective: PlanObjective = PlanObjective.TIME,
+                    flight_modes: Iterable[ShipNavFlightMode] = DEFAULT_FLIGHT_MODES) -> Optional[RoutePlan]:
+    """A* over (waypoint, fuel bucket, flight mode) states.
+
+    The heuristic is the straight line to the destination flown at the fastest
+    allowed multiplier, ignoring the fixed per hop time, so it never overestimates.
+    """
+    if start == destination:
+        return RoutePlan(steps=[], travel_time=0, fuel_used=0)
+    start_node = graph.index[start]
+    destination_node = graph.index[destination]
+    flight_modes = tuple(flight_modes)
+    uses_fuel = fuel_capacity > 0
+    fastest = min(FLIGHT_MODE_MULTIPLIER[mode]
+                  for mode in flight_modes) / engine_speed
+    to_destination = graph.distances[:, destination_node].tolist()
+
+    def heuristic(node: int) -> float:
+        if node == destination_node:
+            return 0
+        h = to_destination[node] * fastest
+        if objective == PlanObjective.FUEL:
+            return h + (FUEL_WEIGHT if uses_fuel else 0)
+        return h
+
+    def edge_cost(time: float, fuel: int) -> float:
+        if objective == PlanObjective.FUEL:
+            return fuel * FUEL_WEIGHT + time
+        return time
+
+    # state key -> (parent key, flight mode of the leg into it, refuel on arrival)
+    parents: Dict[Tuple[int, int, ShipNavFlightMode], tuple] = {}
+    closed = set()
+    heap = []
+    tie = count()
+
+    def push(g: float, node: int, fuel: int, mode: ShipNavFlightMode, time: float, used: int, parent, refuel: bool):
+        heappush(heap, (g + heuristic(node), g, next(tie), node,
+                 fuel, mode, time, used, parent, refuel))
+
+    push(0, start_node, fuel_current, flight_mode, 0, 0, None, False)
+    if uses_fuel and graph.markets[start_node] and fuel_current < fuel_capacity:
+        push(edge_cost(REFUEL_TIME, 0), start_node, fuel_capacity,
+             flight_mode, REFUEL_TIME, 0, None, True)
+
+    while heap:
+        _, g, _, node, fuel, mode, time, used, parent, refuel = heappop(heap)
+        key = (node, fuel_bucket(fuel, fuel_capacity), mode)
+        if key in closed:
+            continue
+        closed.add(key)
+        parents[key] = (parent, mode, refuel)
+        if node == destination_node:
+            return _build_plan(graph, parents, key, flight_mode, time, used)
+        for next_mode in flight_modes:
+            switch_time = FLIGHT_MODE_CHANGE_TIME if next_mode != mode else 0
+            for distance_fuel, neighbor in graph.adjacency[node]:
+                needed = leg_fuel(distance_fuel, next_mode) if uses_fuel else 0
+                if next_mode == ShipNavFlightMode.DRIFT:
+                    # drifting still works on an empty tank
+                    needed = min(needed, fuel)
+                if needed > fuel:
+                    break  # sorted by distance, the rest is out of reach too
+                hop_time = leg_time(distance_fuel, next_mode,
+                                    engine_speed) + switch_time
+                remaining = fuel - needed
+                arrival_time = time + hop_time
+                arrival_g = g + edge_cost(hop_time, needed)
+                push(arrival_g, neighbor, remaining, next_mode,
+                     arrival_time, used + needed, key, False)
+                if uses_fuel and graph.markets[neighbor] and neighbor != destination_node and remaining < fuel_capacity:
+                    push(arrival_g + edge_cost(REFUEL_TIME, 0), neighbor, fuel_capacity, next_mode,
+                         arrival_time + REFUEL_TIME, used + needed, key, True)
+    return None
+
+
+def _build_plan(graph: SystemGraph, parents: Dict, key, flight_mode: ShipNavFlightMode, time: float, used: int) -> RoutePlan:
+    legs = []
+    while key is not None:
+        parent, mode, refuel = parents[key]
+        legs.append((key[0], mode, refuel, parent is None))
+        key = parent
+    legs.reverse()
+    steps: List[PlanStep] = []
+    current_mode = flight_mode
+    previous_symbol = None
+    for node, mode, refuel, is_start in legs:
+        symbol = graph.symbols[node]
+        if not is_start:
+            if mode != current_mode:
+                steps.append(PlanStep(action=PlanAction.FLIGHT_MODE,
+                             waypoint_symbol=previous_symbol, flight_mode=mode))
+                current_mode = mode
+            steps.append(PlanStep(action=PlanAction.NAVIGATE,
+                         waypoint_symbol=symbol, flight_mode=mode))
+        if refuel:
+            steps.append(PlanStep(action=PlanAction.REFUEL,
+                         waypoint_symbol=symbol))
+        previous_symbol = symbol
+    return RoutePlan(steps=steps, travel_time=time, fuel_used=used)
+
+
+def plan_route(start: str, destination: str, fuel_capacity: int, fuel_current: int, engine_speed: int,
+               flight_mode: ShipNavFlightMode = ShipNavFlightMode.CRUISE,
+               objective: PlanObjective = PlanObjective.TIME) -> Optional[RoutePlan]:
+    system_symbol = system_symbol_from_wp_symbol(start)
+    if system_symbol != system_symbol_from_wp_symbol(destination):
+        return None
+    graph = get_system_graph(system_symbol)
+    if start not in graph or destination not in graph:
+        return None
+    key = _route_key(graph, start, destination, fuel_capacity, fuel_current, engine_speed, flight_mode, objective)
+    if (plan := route_cache.get(key)) is None:
+        plan = astar_with_fuel(start, destination, graph, fuel_capacity, planning_fuel(fuel_current, fuel_capacity),
+                               engine_speed, flight_mode, objective)
+        route_cache.put(key, plan)
+    return plan
+
+
+async def async_plan_route(start: str, destination: str, fuel_capacity: int, fuel_current: int, engine_speed: int,
+                           flight_mode: ShipNavFlightMode = ShipNavFlightMode.CRUISE,
+                           objective: PlanObjective = PlanObjective.TIME) -> Optional[RoutePlan]:
+    """plan_route with the search on the planning pool."""
+    system_symbol = system_symbol_from_wp_symbol(start)
+    if system_symbol != system_symbol_from_wp_symbol(destination):
+        return None
+    graph = await async_get_system_graph(system_symbol)
+    if start not in graph or destination not in graph:
+        return None
+    key = _route_key(graph, start, destination, fuel_capacity, fuel_current, engine_speed, flight_mode, objective)
+    if (plan := route_cache.get(key)) is None:
+        plan = await planning_executor.run(graph, astar_with_fuel, start, destination,
+                                           fuel_capacity=fuel_capacity,
+                                           fuel_current=planning_fuel(fuel_current, fuel_capacity),
+                                           engine_speed=engine_speed, flight_mode=flight_mode, objective=objective)
+        route_cache.put(key, plan)
+    return plan
+
+
+def _route_key(graph: SystemGraph, start: str, destination: str, fuel_capacity: int, fuel_current: int, engine_speed: int,
+               flight_mode: ShipNavFlightMode, objective: PlanObjective) -> tuple:
+    return (graph.system_symbol, "astar", start, destination, fuel_capacity, planning_fuel(fuel_current, fuel_capacity),
+            graph.version, engine_speed, flight_mode, objective)
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Hashable, Optional, Tuple
+
+from crud.waypoint import add_system_change_listener
+
+ROUTE_CACHE_SIZE = 512
+
+
+class RouteCache:
+    """LRU of computed routes, keys start with the system symbol so a system can be evicted at once."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Tuple[Hashable, ...], Any] = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Tuple[Hashable, ...]) -> Optional[Any]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple[Hashable, ...], value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def evict_system(self, system_symbol: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == system_symbol]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+route_cache = RouteCache(ROUTE_CACHE_SIZE)
+add_system_change_listener(route_cache.evict_system)
@@ -0,0 +1,112 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+
+from crud.market import get_trade_price_rows
+from pathfinding.graph import SystemGraph, get_system_graph
+from pathfinding.planner import FLIGHT_MODE_MULTIPLIER, HOP_BASE_TIME
+from schemas.navigation import ShipNavFlightMode
+
+# dock, buy, orbit at one end and dock, sell at the other
+TRADE_OVERHEAD_TIME = 2.5
+
+
+class TradeRoute(BaseModel):
+    good: str
+    buy_market: str
+    sell_market: str
+    purchase_price: int
+    sell_price: int
+    units: int
+    profit: int
+    travel_time: float
+    profit_per_second: float
+
+    def __str__(self) -> str:
+        return f"{self.units} {self.good} {self.buy_market} -> {self.sell_market}: {self.profit} ({self.profit_per_second:.1f}/s)"
+
+
+def hop_times(graph: SystemGraph, fuel_capacity: int, engine_speed: int,
+              flight_mode: ShipNavFlightMode = ShipNavFlightMode.CRUISE) -> np.ndarray:
+    """Seconds for a direct hop between every pair of waypoints, drifting where flight_mode needs more fuel than the tank holds."""
+    fuel = graph.fuel
+    times = np.rint(fuel * FLIGHT_MODE_MULTIPLIER[flight_mode] / engine_speed + HOP_BASE_TIME)
+    if fuel_capacity > 0:
+        needed = fuel * 2 if flight_mode == ShipNavFlightMode.BURN else fuel
+        drift = np.rint(fuel * FLIGHT_MODE_MULTIPLIER[ShipNavFlightMode.DRIFT] / engine_speed + HOP_BASE_TIME)
+        times = np.where(needed > fuel_capacity, drift, times)
+    np.fill_diagonal(times, 0)
+    return times
+
+
+def find_trade_routes(system_symbol: str, cargo_capacity: int, fuel_capacity: int, engine_speed: int,
+                      start: Optional[str] = None, credits: Optional[int] = None, top_k: int = 10,
+                      flight_mode: ShipNavFlightMode = ShipNavFlightMode.CRUISE) -> List[TradeRoute]:
+    """Best (buy market, sell market, good) runs in a system ranked by profit per second of travel.
+
+    Uses the last prices seen at each market, a ship starting at start first has to fly to the buy market.
+    A run moves at most one trade volume, past that the prices seen no longer hold.
+    """
+    return rank_trade_routes(get_trade_price_rows(system_symbol), cargo_capacity, fuel_capacity, engine_speed,
+                             start, credits, top_k, flight_mode, graph=get_system_graph(system_symbol))
+
+
+def rank_trade_routes(rows: List[Tuple[str, str, int, int, int]], cargo_capacity: int, fuel_capacity: int, engine_speed: int,
+                      start: Optional[str], credits: Optional[int], top_k: int, flight_mode: ShipNavFlightMode,
+                      graph: SystemGraph) -> List[TradeRoute]:
+    """The search behind find_trade_routes over price rows from get_trade_price_rows, needs no database."""
+    rows = [row for row in rows if row[0] in graph]
+    if not rows or cargo_capacity <= 0:
+        return []
+    markets = sorted({row[0] for row in rows})
+    goods = sorted({row[1] for row in rows})
+    market_index = {symbol: i for i, symbol in enumerate(markets)}
+    good_index = {symbol: i for i, symbol in enumerate(goods)}
+
+    # goods x markets, a market that does not trade a good can neither sell nor buy it
+    buy = np.full((len(goods), len(markets)), np.inf)
+    sell = np.full((len(goods), len(markets)), -np.inf)
+    volume = np.full((len(goods), len(markets)), np.inf)
+    for market, good, purchase_price, sell_price, trade_volume in rows:
+        buy[good_index[good], market_index[market]] = purchase_price
+        sell[good_index[good], market_index[market]] = sell_price
+        if trade_volume is not None:
+            volume[good_index[good], market_index[market]] = trade_volume
+
+    units = np.minimum(volume, cargo_capacity)
+    if credits is not None:
+        with np.errstate(divide="ignore"):
+            units = np.minimum(units, np.floor(credits / buy))
+    # goods x buy market x sell market, the sell market only takes its own volume at that price too
+    units = np.minimum(units[:, :, None], volume[:, None, :])
+    with np.errstate(invalid="ignore"):
+        profit = (sell[:, None, :] - buy[:, :, None]) * units
+
+    nodes = np.array([graph.index[symbol] for symbol in markets])
+    times = hop_times(graph, fuel_capacity, engine_speed, flight_mode)
+    travel = times[np.ix_(nodes, nodes)]
+    if start is not None and start in graph:
+        travel = travel + times[graph.index[start], nodes][:, None]
+    travel = travel + TRADE_OVERHEAD_TIME
+
+    with np.errstate(invalid="ignore"):
+        rate = np.where(profit > 0, profit / travel[None, :, :], -np.inf)
+    flat = rate.ravel()
+    k = min(top_k, int(np.count_nonzero(np.isfinite(flat))))
+    if k <= 0:
+        return []
+    best = np.argpartition(-flat, k - 1)[:k]
+    best = best[np.argsort(-flat[best])]
+
+    routes = []
+    for g, b, s in zip(*np.unravel_index(best, rate.shape)):
+        routes.append(TradeRoute(good=goods[g],
+                                 buy_market=markets[b],
+                                 sell_market=markets[s],
+                                 purchase_price=int(buy[g, b]),
+                                 sell_price=int(sell[g, s]),
+                                 units=int(units[g, b, s]),
+                                 profit=int(profit[g, b, s]),
+                                 travel_time=float(travel[b, s]),
+                                 profit_per_second=float(rate[g, b, s])))
+    return routes
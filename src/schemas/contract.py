@@ -2,7 +2,10 @@ from datetime import datetime
 from enum import StrEnum
 from typing import List
 from pydantic import BaseModel, Field, TypeAdapter
-from login import CONTRACTS_BASE_URL, HEADERS, get, post
+from login import CONTRACTS_BASE_URL, HEADERS, ApiError, async_get, async_post
+from logging import getLogger
+
+logger = getLogger(__name__)
 
 
 class ContractType(StrEnum):
@@ -38,46 +41,52 @@ class Contract(BaseModel):
     fulfilled: bool
     deadlineToAccept: datetime
 
-    def accept(self):
+    async def accept(self):
         print(f"Accepting {self.id}")
-        self.accepted = post(
-            f"{CONTRACTS_BASE_URL}/{self.id}/accept", headers=HEADERS).ok
+        response = await async_post(
+            f"{CONTRACTS_BASE_URL}/{self.id}/accept", headers=HEADERS)
+        self.accepted = response.is_success
         print(self.accepted)
         return self.accepted
 
-    def fulfill(self):
-        self.fulfilled = post(
-            f"{CONTRACTS_BASE_URL}/{self.id}/fulfill", headers=HEADERS).ok
+    async def fulfill(self):
+        response = await async_post(
+            f"{CONTRACTS_BASE_URL}/{self.id}/fulfill", headers=HEADERS)
+        self.fulfilled = response.is_success
         return self.fulfilled
 
 
-def get_contract(id: str):
-    response = get(f"{CONTRACTS_BASE_URL}/{id}", headers=HEADERS)
-    if response.ok:
+async def get_contract(id: str):
+    response = await async_get(f"{CONTRACTS_BASE_URL}/{id}", headers=HEADERS)
+    if response.is_success:
         print(response.json())
         return Contract.model_validate(response.json()["data"])
     else:
         return None
 
 
-def get_all_contracts(limit=20):
+async def get_all_contracts(limit=20) -> List[Contract]:
+    """Every contract of the agent, raises ApiError when a page can not be fetched."""
     contracts: list[Contract] = []
     ta = TypeAdapter(List[Contract])
     current = 0
     m = float("inf")
     page = 1
     while current < m:
-        response = get(CONTRACTS_BASE_URL +
-                       f"?page={page}&limit={limit}", headers=HEADERS)
-        if response.ok:
+        response = await async_get(CONTRACTS_BASE_URL +
+                                   f"?page={page}&limit={limit}", headers=HEADERS)
+        if response.is_success:
             js = response.json()
             m = js["meta"]["total"]
             current += len(js["data"])
             page += 1
             new_contracts = ta.validate_python(js["data"])
             contracts.extend(new_contracts)
+        else:
+            logger.warning(f"listing contracts failed with {response.status_code}: {response.text}")
+            raise ApiError(str(response.url), response.status_code, response.text)
     return contracts
 
 
-def get_open_contracts() -> List[Contract]:
-    return [contract for contract in get_all_contracts() if not contract.fulfilled]
+async def get_open_contracts() -> List[Contract]:
+    return [contract for contract in await get_all_contracts() if not contract.fulfilled]
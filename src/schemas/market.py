@@ -1,11 +1,13 @@
 from datetime import datetime
 from typing import List, Optional
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 
 
 class Good(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     symbol: str
     name: str
     description: str
@@ -1,19 +1,37 @@
-from login import HEADERS, SYSTEM_BASE_URL, get
-from pydantic import BaseModel, TypeAdapter, ValidationError
+from login import HEADERS, SYSTEM_BASE_URL, ApiError, async_get, get
+from enum import Enum
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
 from typing import List, Optional, Self
 import math
 from datetime import datetime
 
 from utils.utils import system_symbol_from_wp_symbol
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+class ShipNavFlightMode(str, Enum):
+    DRIFT = "DRIFT"
+    STEALTH = "STEALTH"
+    CRUISE = "CRUISE"
+    BURN = "BURN"
+
+    def __str__(self) -> str:
+        return self.value
 
 
 class WaypointTrait(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     symbol: str
     name: str
     description: str
 
 
 class WaypointModifier(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     symbol: str
     name: str
     description: str
@@ -62,16 +80,17 @@ class System(BaseModel):
     waypoints: List[Waypoint]
     factions: List[WaypointFaction]
 
-    def get_filtered_waypoints(self, query, limit=20) -> List[Waypoint]:
+    async def get_filtered_waypoints(self, query, limit=20) -> List[Waypoint]:
+        """Waypoints of the system matching query, raises ApiError when a page can not be fetched."""
         wps: list[Waypoint] = []
         ta = TypeAdapter(List[Waypoint])
         current = 0
         m = float("inf")
         page = 1
         while current < m:
-            response = get(SYSTEM_BASE_URL + self.symbol +
-                           f"/waypoints?{query}&page={page}&limit={limit}", headers=HEADERS)
-            if response.ok:
+            response = await async_get(SYSTEM_BASE_URL + self.symbol +
+                                       f"/waypoints?{query}&page={page}&limit={limit}", headers=HEADERS)
+            if response.is_success:
                 js = response.json()
                 m = js["meta"]["total"]
                 current += len(js["data"])
@@ -79,6 +98,9 @@ class System(BaseModel):
                 new_wps = ta.validate_python(js["data"])
                 wps.extend(new_wps)
                 print(f"{current} out of {m}")
+            else:
+                logger.warning(f"listing waypoints of {self.symbol} failed with {response.status_code}: {response.text}")
+                raise ApiError(str(response.url), response.status_code, response.text)
         return wps
 
 
@@ -90,19 +112,32 @@ def split_symbol(symbol: str):
     return symbol.split("-")
 
 
-def get_system_with_symbol(symbol: str) -> Optional[System]:
+def _system_symbol(symbol: str) -> str:
     if is_system_symbol(symbol):
-        system_symbol = symbol
-    else:
-        system_symbol = system_symbol_from_wp_symbol(symbol)
-    response = get(f"{SYSTEM_BASE_URL}/{system_symbol}")
+        return symbol
+    return system_symbol_from_wp_symbol(symbol)
+
+
+def _validate_system(js) -> Optional[System]:
+    try:
+        return System.model_validate(js["data"])
+    except ValidationError as e:
+        print(e)
+        return None
+
+
+def get_system_with_symbol(symbol: str) -> Optional[System]:
+    response = get(f"{SYSTEM_BASE_URL}/{_system_symbol(symbol)}")
     if response.ok:
-        js = response.json()
-        try:
-            return System.model_validate(js["data"])
-        except ValidationError as e:
-            print(e)
-            return None
+        return _validate_system(response.json())
+    print(response)
+    return None
+
+
+async def async_get_system_with_symbol(symbol: str) -> Optional[System]:
+    response = await async_get(f"{SYSTEM_BASE_URL}/{_system_symbol(symbol)}")
+    if response.is_success:
+        return _validate_system(response.json())
     print(response)
     return None
 
@@ -1,18 +1,23 @@
-from asyncio import sleep
+import asyncio
 from datetime import UTC, datetime, timedelta
 from enum import Enum
 import json
-from typing import Callable, Dict, List, Optional, Tuple
-from pydantic import BaseModel, Field, TypeAdapter, ValidationError, computed_field
-from login import CONTRACTS_BASE_URL, HEADERS
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from pydantic import BaseModel, Field, PrivateAttr, TypeAdapter, ValidationError, computed_field
+from login import CONTRACTS_BASE_URL, HEADERS, async_get, async_patch, async_post
+from utils.rate_limiter import Priority
+from utils.tasks import spawn
+from utils.scheduler import scheduler
+from crud.market import async_refresh_market
+from crud.waypoint import async_get_waypoint_with_symbol
 from schemas.contract import Contract
-from schemas.market import Good, MarketTransaction
-from schemas.navigation import Waypoint
+from schemas.market import Good, Market, MarketTransaction
+from schemas.navigation import ShipNavFlightMode, Waypoint
 from utils.observable import Observable
 from schemas.survey import Survey
-from utils.utils import error_wrap, format_time_ms, success_wrap, time_until
-from requests import Response, get, post, patch
-from pathfinding.pathfinding import calculate_route
+from utils.utils import error_wrap, format_time_ms, success_wrap, system_symbol_from_wp_symbol, time_until, utcnow
+from pathfinding.galaxy import LegKind, async_plan_interstellar_route
+from pathfinding.planner import PlanAction, PlanObjective, async_plan_route
 from custom_logging import create_ship_logger
 SHIPS_BASE_URL = 'https://api.spacetraders.io/v2/my/ships'
 
@@ -73,16 +78,6 @@ class ShipNavStatus(str, Enum):
         return self.value.replace("_", " ")
 
 
-class ShipNavFlightMode(str, Enum):
-    DRIFT = "DRIFT"
-    STEALTH = "STEALTH"
-    CRUISE = "CRUISE"
-    BURN = "BURN"
-
-    def __str__(self) -> str:
-        return self.value
-
-
 class ShipNav(BaseModel):
     systemSymbol: str
     waypointSymbol: str
@@ -146,6 +141,45 @@ class ShipEngine(ShipComponent):
     speed: int
 
 
+class ShipTimeline:
+    """When a ship is next free to act, taken from its last api responses.
+
+    Controllers await arrived, ready_for_extract and docked instead of re-reading the clock
+    on every pass of their loop. A wait started before a later response moved the deadline
+    keeps waiting for the new one.
+    """
+
+    def __init__(self) -> None:
+        self.status: Optional[ShipNavStatus] = None
+        self.arrival: datetime = datetime.min.replace(tzinfo=UTC)
+        self.cooldown_expiration: datetime = datetime.min.replace(tzinfo=UTC)
+        self._docked = asyncio.Event()
+
+    def observe(self, nav: ShipNav, cooldown: ShipCooldown) -> None:
+        self.status = nav.status
+        self.arrival = nav.route.arrival if nav.status == ShipNavStatus.IN_TRANSIT else datetime.min.replace(tzinfo=UTC)
+        self.cooldown_expiration = cooldown.expiration or datetime.min.replace(tzinfo=UTC)
+        if nav.status == ShipNavStatus.DOCKED:
+            self._docked.set()
+        else:
+            self._docked.clear()
+
+    def ready_at(self) -> datetime:
+        """Earliest moment the ship is both in place and off cooldown."""
+        return max(self.arrival, self.cooldown_expiration)
+
+    async def arrived(self) -> None:
+        while (when := self.arrival) > utcnow():
+            await scheduler.sleep_until(when)
+
+    async def ready_for_extract(self) -> None:
+        while (when := self.ready_at()) > utcnow():
+            await scheduler.sleep_until(when)
+
+    async def docked(self) -> None:
+        await self._docked.wait()
+
+
 class Ship(BaseModel, Observable):
     symbol: str
     registration: ShipRegistration
@@ -158,9 +192,25 @@ class Ship(BaseModel, Observable):
     engine: ShipEngine
     mounts: List[ShipMount]
     logger: Optional[Callable[[str], None]] = Field(print, exclude=True)
+    _timeline: ShipTimeline = PrivateAttr(default_factory=ShipTimeline)
 
     def model_post_init(self, __context) -> None:
         self.logger= create_ship_logger(self.symbol)
+        self._timeline.observe(self.nav, self.cooldown)
+
+    @property
+    def timeline(self) -> ShipTimeline:
+        return self._timeline
+
+    def update(self):
+        self._timeline.observe(self.nav, self.cooldown)
+        super().update()
+
+    async def wait_for_arrival(self) -> None:
+        await self._timeline.arrived()
+        if self.nav.status == ShipNavStatus.IN_TRANSIT:
+            self.nav.status = ShipNavStatus.IN_ORBIT
+            self.update()
     def log(self, log: str, success: bool = False, error: bool = False) -> None:
         msg = f"[{self.symbol}@{format_time_ms(datetime.now(UTC))}]{self.nav.waypointSymbol}: {log}"
         if success:
@@ -170,14 +220,14 @@ class Ship(BaseModel, Observable):
         else:
             self.logger(msg)
 
-    def orbit(self) -> bool:
+    async def orbit(self) -> bool:
         self.log(f"Attempting to Orbit")
         if self.nav.status != ShipNavStatus.DOCKED:
             self.log("Attempt Failed: Ship is NOT DOCKED", error=True)
             return False
-        response: Response = post(
+        response = await async_post(
             f"{SHIPS_BASE_URL}/{self.symbol}/orbit", headers=HEADERS)
-        if response.ok:
+        if response.is_success:
             try:
                 new_nav = ShipNav.model_validate(
                     response.json()["data"]["nav"])
@@ -193,14 +243,20 @@ class Ship(BaseModel, Observable):
                 response.json(), indent=1)}", error=True)
             return False
 
-    def dock(self) -> bool:
+    async def _snapshot_market(self) -> None:
+        # prices are only visible while a ship is at the market
+        waypoint = await async_get_waypoint_with_symbol(self.nav.waypointSymbol)
+        if waypoint and waypoint.traits and waypoint.has_trait("MARKETPLACE"):
+            await async_refresh_market(waypoint.symbol, force=False)
+
+    async def dock(self, snapshot_market: bool = True) -> bool:
         self.log(f"Attempting to Dock")
         if self.nav.status != ShipNavStatus.IN_ORBIT:
             self.log("Attempt Failed: Ship is NOT IN ORBIT", error=True)
             return False
-        response: Response = post(
+        response = await async_post(
             f"{SHIPS_BASE_URL}/{self.symbol}/dock", headers=HEADERS)
-        if response.ok:
+        if response.is_success:
             try:
                 new_nav = ShipNav.model_validate(
                     response.json()["data"]["nav"])
@@ -211,20 +267,23 @@ class Ship(BaseModel, Observable):
                     response.json(), indent=1)}", error=True)
 
             self.log("Dock Successful", success=True)
+            if snapshot_market:
+                spawn(self._snapshot_market(),
+                      name=f"market snapshot {self.nav.waypointSymbol}")
             return True
         else:
             self.log(f"Attempt Failed: \n{json.dumps(
                 response.json(), indent=1)}", error=True)
             return False
 
-    def survey(self) -> Tuple[bool, Optional[List[Survey]]]:
+    async def survey(self) -> Tuple[bool, Optional[List[Survey]]]:
         self.log(f"Attempting to Survey")
         if self.nav.status != ShipNavStatus.IN_ORBIT:
             self.log("Attempt Failed: Ship is NOT IN ORBIT", error=True)
             return False, None
-        response = post(
+        response = await async_post(
             f"{SHIPS_BASE_URL}/{self.symbol}/survey", headers=HEADERS)
-        if response.ok:
+        if response.is_success:
             ta = TypeAdapter(List[Survey])
             try:
                 js = response.json()
@@ -243,25 +302,25 @@ class Ship(BaseModel, Observable):
                 response.json(), indent=1)}", error=True)
             return False, None
 
-    def extract(self, survey: Survey = None) -> Tuple[bool, Optional[Extraction]]:
+    async def extract(self, survey: Survey = None) -> Tuple[bool, Optional[Extraction]]:
         self.log(f"Attempting to Extract")
         if self.nav.status != ShipNavStatus.IN_ORBIT:
             self.log("Attempt Failed: Ship is NOT IN ORBIT", error=True)
             return False, None
-        if self.cooldown.time_remaining.total_seconds() > 0:
+        if self._timeline.cooldown_expiration > utcnow():
             self.log("Attempt Failed: Ship is ON COOLDOWN", error=True)
             return False, None
         if survey:
             self.log(f"Using survey {survey.signature}")
             self.log(survey.deposits)
-            response = post(f"{SHIPS_BASE_URL}/{self.symbol}/extract",
-                            survey.model_dump_json(), headers=HEADERS)
+            response = await async_post(f"{SHIPS_BASE_URL}/{self.symbol}/extract", Priority.CRITICAL,
+                                        json=survey.model_dump(mode="json"), headers=HEADERS)
         else:
-            response = post(
-                f"{SHIPS_BASE_URL}/{self.symbol}/extract", headers=HEADERS)
+            response = await async_post(
+                f"{SHIPS_BASE_URL}/{self.symbol}/extract", Priority.CRITICAL, headers=HEADERS)
 
         js = response.json()
-        if response.ok:
+        if response.is_success:
             try:
                 new_cooldown = ShipCooldown.model_validate(
                     js["data"]["cooldown"])
@@ -284,7 +343,7 @@ class Ship(BaseModel, Observable):
                 js, indent=1)}", error=True)
             return False, None
 
-    def sell(self, good_symbol: str, units=-1) -> bool:
+    async def sell(self, good_symbol: str, units=-1) -> bool:
         if units == -1:
             units = self.cargo.items()[good_symbol]
         self.log(f"Attempting To Sell {units} Units of {good_symbol}")
@@ -293,10 +352,10 @@ class Ship(BaseModel, Observable):
         if self.nav.status != ShipNavStatus.DOCKED:
             self.log("Attempt Failed: Ship is NOT DOCKED", error=True)
             return False
-        response = post(f"{SHIPS_BASE_URL}/{self.symbol}/sell",
-                        json=payload, headers=HEADERS)
+        response = await async_post(f"{SHIPS_BASE_URL}/{self.symbol}/sell",
+                                    json=payload, headers=HEADERS)
         js = response.json()
-        if response.ok:
+        if response.is_success:
             try:
                 new_cargo = ShipCargo.model_validate(js["data"]["cargo"])
                 transaction = MarketTransaction.model_validate(
@@ -316,7 +375,7 @@ class Ship(BaseModel, Observable):
                 js, indent=1)}", error=True)
             return False
 
-    def purchase(self, good_symbol: str, units=-1) -> bool:
+    async def purchase(self, good_symbol: str, units=-1) -> bool:
         if units == -1:
             units = self.cargo.capacity_remaining
         self.log(f"Attempting To PURCHASE {units} Units of {good_symbol}")
@@ -330,10 +389,10 @@ class Ship(BaseModel, Observable):
             units_left -= units_to_purchase
             payload = {"symbol": good_symbol,
                        "units": units_to_purchase}
-            response = post(f"{SHIPS_BASE_URL}/{self.symbol}/purchase",
-                            json=payload, headers=HEADERS)
+            response = await async_post(f"{SHIPS_BASE_URL}/{self.symbol}/purchase",
+                                        json=payload, headers=HEADERS)
             js = response.json()
-            if response.ok:
+            if response.is_success:
                 try:
                     new_cargo = ShipCargo.model_validate(js["data"]["cargo"])
                     transaction = MarketTransaction.model_validate(
@@ -354,7 +413,7 @@ class Ship(BaseModel, Observable):
                 return False
         return False
 
-    def jettison(self, good_symbol, units=0) -> bool:
+    async def jettison(self, good_symbol, units=0) -> bool:
         if units == 0:
             units = self.cargo.items()[good_symbol]
         self.log(f"Attempting To Jettison {units} Units of {good_symbol}")
@@ -363,10 +422,10 @@ class Ship(BaseModel, Observable):
         if self.nav.status != ShipNavStatus.IN_ORBIT:
             self.log("Attempt Failed: Ship is NOT IN ORBIT", error=True)
             return False
-        response = post(f"{SHIPS_BASE_URL}/{self.symbol}/jettison",
-                        json=payload, headers=HEADERS)
+        response = await async_post(f"{SHIPS_BASE_URL}/{self.symbol}/jettison",
+                                    json=payload, headers=HEADERS)
         js = response.json()
-        if response.ok:
+        if response.is_success:
             try:
                 new_cargo = ShipCargo.model_validate(js["data"]["cargo"])
                 self.cargo = new_cargo
@@ -383,16 +442,16 @@ class Ship(BaseModel, Observable):
                 js, indent=1)}", error=True)
             return False
 
-    def refuel(self) -> bool:
+    async def refuel(self) -> bool:
         self.log(f"Attempting To Refuel")
         if self.nav.status != ShipNavStatus.DOCKED:
             self.log("Attempt Failed: Ship is NOT DOCKED", error=True)
             return False
-        response = post(
+        response = await async_post(
             f"{SHIPS_BASE_URL}/{self.symbol}/refuel", headers=HEADERS)
         js = response.json()
         self.log(json.dumps(js, indent=2))
-        if response.ok:
+        if response.is_success:
             try:
                 new_fuel = ShipFuel.model_validate(js["data"]["fuel"])
                 transaction = MarketTransaction.model_validate(
@@ -412,15 +471,15 @@ class Ship(BaseModel, Observable):
                 js, indent=1)}", error=True)
             return False
 
-    def change_flight_mode(self, flight_mode: ShipNavFlightMode) -> bool:
+    async def change_flight_mode(self, flight_mode: ShipNavFlightMode) -> bool:
         self.log(f"Attempting To Change Flight Mode to {flight_mode}")
         data = {"flightMode": flight_mode}
 
-        response = patch(
+        response = await async_patch(
             f"{SHIPS_BASE_URL}/{self.symbol}/nav", json=data, headers=HEADERS)
         js = response.json()
-        self.log(dumps(js, indent=2))
-        if response.ok:
+        self.log(json.dumps(js, indent=2))
+        if response.is_success:
             try:
                 nav = ShipNav.model_validate(js["data"])
                 self.nav = nav
@@ -443,10 +502,10 @@ class Ship(BaseModel, Observable):
             self.log("Attempt Failed: Ship is NOT IN ORBIT", error=True)
             return False
         data = {"waypointSymbol": destination.symbol}
-        response = post(f"{SHIPS_BASE_URL}/{self.symbol}/navigate",
-                        headers=HEADERS, json=data)
+        response = await async_post(f"{SHIPS_BASE_URL}/{self.symbol}/navigate", Priority.CRITICAL,
+                                    headers=HEADERS, json=data)
         js = response.json()
-        if response.ok:
+        if response.is_success:
             try:
                 new_fuel = ShipFuel.model_validate(js["data"]["fuel"])
                 new_nav = ShipNav.model_validate(js["data"]["nav"])
@@ -455,8 +514,7 @@ class Ship(BaseModel, Observable):
                 self.log(f"Navigation Successful Arriving at {
                          self.nav.route.arrival}", success=True)
                 self.update()
-                await sleep(self.nav.route.time_remaining.total_seconds())
-                self.nav.status = ShipNavStatus.IN_ORBIT
+                await self.wait_for_arrival()
                 return True
             except ValidationError as e:
                 self.log(f"Bad RESPONSE: {
@@ -468,12 +526,12 @@ class Ship(BaseModel, Observable):
                 js, indent=1)}", error=True)
             return False
 
-    def negotiate_contract(self) -> None:
-        response = post(
+    async def negotiate_contract(self) -> None:
+        response = await async_post(
             f"{SHIPS_BASE_URL}/{self.symbol}/negotiate/contract", headers=HEADERS)
         self.log(response.json())
 
-    def deliver_to_contract(self, contract_id: str, trade_symbol: str, units: int) -> Optional[Contract]:
+    async def deliver_to_contract(self, contract_id: str, trade_symbol: str, units: int) -> Optional[Contract]:
         self.log(f"Attempting To Deliver Contract {contract_id} Cargo")
         if self.nav.status != ShipNavStatus.DOCKED:
             self.log("Attempt Failed: Ship is NOT DOCKED", error=True)
@@ -483,10 +541,10 @@ class Ship(BaseModel, Observable):
             "tradeSymbol": trade_symbol,
             "units": units
         }
-        response = post(
+        response = await async_post(
             f"{CONTRACTS_BASE_URL}/{contract_id}/deliver", json=body, headers=HEADERS)
         js = response.json()
-        if response.ok:
+        if response.is_success:
             try:
                 new_cargo = ShipCargo.model_validate(js["data"]["cargo"])
                 self.cargo = new_cargo
@@ -502,54 +560,133 @@ class Ship(BaseModel, Observable):
                 js, indent=1)}", error=True)
             return None
 
-    async def route_navigate(self, destination: Waypoint, dock: bool = False) -> bool:
-        if self.nav.status == ShipNavStatus.IN_TRANSIT:
-            self.log("ERROR: Ship is in transit")
-        route = calculate_route(
-            self.nav.waypointSymbol, destination.symbol, self.fuel.capacity, self.fuel.current)
-        self.log("Route Calculated\n" +
-                 "\n".join(f"{wp.symbol} {refuel}" for wp, refuel in route))
-        if not route:
+    async def jump(self, waypoint_symbol: str) -> bool:
+        self.log(f"Attempting to Jump To {waypoint_symbol}")
+        if self.nav.status != ShipNavStatus.IN_ORBIT:
+            self.log("Attempt Failed: Ship is NOT IN ORBIT", error=True)
+            return False
+        data = {"waypointSymbol": waypoint_symbol}
+        response = await async_post(f"{SHIPS_BASE_URL}/{self.symbol}/jump", Priority.CRITICAL,
+                                    headers=HEADERS, json=data)
+        js = response.json()
+        if response.is_success:
+            try:
+                new_nav = ShipNav.model_validate(js["data"]["nav"])
+                new_cooldown = ShipCooldown.model_validate(
+                    js["data"]["cooldown"])
+                self.nav = new_nav
+                self.cooldown = new_cooldown
+                self.log("Jump Successful", success=True)
+                self.update()
+                return True
+            except ValidationError as e:
+                self.log(f"Bad RESPONSE: {
+                         json.dumps(js, indent=1)}", error=True)
+                self.log(e)
+                return False
+        else:
+            self.log(f"Attempt Failed:\n{json.dumps(
+                js, indent=1)}", error=True)
+            return False
+
+    async def warp(self, waypoint_symbol: str) -> bool:
+        self.log(f"Attempting to Warp To {waypoint_symbol}")
+        if self.nav.status != ShipNavStatus.IN_ORBIT:
+            self.log("Attempt Failed: Ship is NOT IN ORBIT", error=True)
+            return False
+        data = {"waypointSymbol": waypoint_symbol}
+        response = await async_post(f"{SHIPS_BASE_URL}/{self.symbol}/warp", Priority.CRITICAL,
+                                    headers=HEADERS, json=data)
+        js = response.json()
+        if response.is_success:
+            try:
+                new_fuel = ShipFuel.model_validate(js["data"]["fuel"])
+                new_nav = ShipNav.model_validate(js["data"]["nav"])
+                self.fuel = new_fuel
+                self.nav = new_nav
+                self.log(f"Warp Successful Arriving at {
+                         self.nav.route.arrival}", success=True)
+                self.update()
+                await self.wait_for_arrival()
+                return True
+            except ValidationError as e:
+                self.log(f"Bad RESPONSE: {
+                         json.dumps(js, indent=1)}", error=True)
+                self.log(e)
+                return False
+        else:
+            self.log(f"Attempt Failed:\n{json.dumps(
+                js, indent=1)}", error=True)
+            return False
+
+    async def follow_plan(self, destination_symbol: str, objective: PlanObjective = PlanObjective.TIME) -> bool:
+        plan = await async_plan_route(self.nav.waypointSymbol, destination_symbol, self.fuel.capacity,
+                                      self.fuel.current, self.engine.speed, self.nav.flightMode, objective)
+        if not plan:
+            self.log(f"No Route Found To {destination_symbol}", error=True)
             return False
-        if len(route) > 1:
-            wp, refuel = route[0]
-            if refuel:
+        self.log("Route Calculated\n" + "\n".join(str(step) for step in plan.steps))
+        for step in plan.steps:
+            match step.action:
+                case PlanAction.FLIGHT_MODE:
+                    if not await self.change_flight_mode(step.flight_mode):
+                        return False
+                case PlanAction.NAVIGATE:
+                    if self.nav.status == ShipNavStatus.DOCKED and not await self.orbit():
+                        return False
+                    if not await self.navigate(Waypoint(symbol=step.waypoint_symbol)):
+                        return False
+                case PlanAction.REFUEL:
+                    # a refuel stop on the way is not worth an api call for its prices
+                    if self.nav.status == ShipNavStatus.IN_ORBIT and not await self.dock(snapshot_market=False):
+                        return False
+                    # the next hop was planned with a full tank, without one it would fail anyway
+                    if not await self.refuel() or not await self.orbit():
+                        return False
+        return True
+
+    async def route_navigate(self, destination: Union[Waypoint, Market], dock: bool = False,
+                             objective: PlanObjective = PlanObjective.TIME, can_warp: bool = False) -> bool:
+        if self.nav.status == ShipNavStatus.IN_TRANSIT:
+            self.log("Ship is in transit, waiting for arrival")
+            await self.wait_for_arrival()
+        # work orders also pass markets here, the symbol is all they share with a waypoint
+        if system_symbol_from_wp_symbol(destination.symbol) != self.nav.systemSymbol:
+            route = await async_plan_interstellar_route(self.nav.waypointSymbol, destination.symbol,
+                                                        self.fuel.capacity, can_warp)
+            if not route:
+                self.log(f"No Interstellar Route Found To {destination.symbol}", error=True)
+                return False
+            self.log("Interstellar Route Calculated\n" + "\n".join(str(leg) for leg in route.legs))
+            for leg in route.legs:
+                if not await self.follow_plan(leg.departure_waypoint, objective):
+                    return False
                 if self.nav.status == ShipNavStatus.DOCKED:
-                    self.refuel()
-                    self.orbit()
-                elif self.nav.status == ShipNavStatus.IN_ORBIT:
-                    self.dock()
-                    self.refuel()
-                    self.orbit()
-            for wp, refuel in route[1:-1]:
-                await self.navigate(wp)
-                if refuel:
-                    self.dock()
-                    self.refuel()
-                    self.orbit()
-            wp, refuel = route[-1]
-            await self.navigate(wp)
-            if dock:
-                self.dock()
-                if refuel:
-                    self.refuel()
-            elif refuel:
-                self.dock()
-                self.refuel()
-                self.orbit()
+                    await self.orbit()
+                match leg.kind:
+                    case LegKind.JUMP:
+                        if not await self.jump(leg.arrival_waypoint):
+                            return False
+                    case LegKind.WARP:
+                        if not await self.warp(leg.arrival_waypoint):
+                            return False
+        if not await self.follow_plan(destination.symbol, objective):
+            return False
+        if dock and self.nav.status != ShipNavStatus.DOCKED:
+            await self.dock()
         return True
 
 
-def get_ship_list() -> List[Ship]:
+async def get_ship_list() -> List[Ship]:
     ta = TypeAdapter(List[Ship])
-    ships = ta.validate_python(
-        get(SHIPS_BASE_URL, headers=HEADERS).json()["data"])
+    response = await async_get(SHIPS_BASE_URL, headers=HEADERS)
+    ships = ta.validate_python(response.json()["data"])
     return ships
 
 
-def get_ship_with_symbol(symbol: str) -> Optional[Ship]:
-    response: Response = get(f"{SHIPS_BASE_URL}/{symbol}", headers=HEADERS)
-    if not response.ok:
+async def get_ship_with_symbol(symbol: str) -> Optional[Ship]:
+    response = await async_get(f"{SHIPS_BASE_URL}/{symbol}", headers=HEADERS)
+    if not response.is_success:
         print(response)
         return None
     return Ship.model_validate(response.json()["data"])
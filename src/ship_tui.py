@@ -1,10 +1,53 @@
 from argparse import ArgumentParser, Namespace
-import asyncio
+from login import run_async
 
-from crud.waypoint import get_waypoint_with_symbol
+from crud.waypoint import async_get_waypoint_with_symbol
 from schemas.ship import Ship, ShipNavFlightMode, get_ship_list, get_ship_with_symbol
 from utils.utils import console
 
+
+async def main(args: Namespace):
+    match args.command:
+        case "list":
+            print(*(ship.model_dump_json(indent=2)
+                  for ship in await get_ship_list()))
+        case "ship":
+            if args.id:
+                ship: Ship = await get_ship_with_symbol(args.id)
+                if args.orbit:
+                    await ship.orbit()
+                elif args.dock:
+                    await ship.dock()
+                elif args.navigate:
+                    await ship.navigate(
+                        await async_get_waypoint_with_symbol(args.navigate))
+                elif args.route:
+                    await ship.route_navigate(
+                        await async_get_waypoint_with_symbol(args.route))
+                elif args.patch_navigation:
+                    await ship.change_flight_mode(
+                        ShipNavFlightMode(args.patch_navigation))
+                elif args.survey:
+                    await ship.survey()
+                elif args.extract:
+                    await ship.extract()
+                elif args.refuel:
+                    await ship.refuel()
+                elif args.jettison:
+                    await ship.jettison(args.jettison[0], int(args.jettison[1]))
+                elif args.sell:
+                    await ship.sell(args.sell)
+                elif args.purchase:
+                    await ship.purchase(args.purchase[0], int(args.purchase[1]))
+                elif args.deliver:
+                    await ship.deliver_to_contract(*args.deliver)
+                elif args.negotiate:
+                    await ship.negotiate_contract()
+                else:
+                    print(f"{args.id}: SHIP DATA")
+                    print(ship.model_dump_json(indent=2))
+
+
 if __name__ == "__main__":
     parser = ArgumentParser()
     subparsers = parser.add_subparsers(dest="command")
@@ -29,42 +72,4 @@ if __name__ == "__main__":
     extract_options.add_argument("-s", "--survey", action="store_true")
     extract_options.add_argument("-e", "--extract", action="store_true")
     args: Namespace = parser.parse_args()
-    match args.command:
-        case "list":
-            print(*(ship.model_dump_json(indent=2)
-                  for ship in get_ship_list()))
-        case "ship":
-            if args.id:
-                ship: Ship = get_ship_with_symbol(args.id)
-                if args.orbit:
-                    ship.orbit()
-                elif args.dock:
-                    ship.dock()
-                elif args.navigate:
-                    asyncio.run(ship.navigate(
-                        get_waypoint_with_symbol(args.navigate)))
-                elif args.route:
-                    asyncio.run(ship.route_navigate(
-                        get_waypoint_with_symbol(args.route)))
-                elif args.patch_navigation:
-                    ship.change_flight_mode(
-                        ShipNavFlightMode(args.patch_navigation))
-                elif args.survey:
-                    ship.survey()
-                elif args.extract:
-                    ship.extract()
-                elif args.refuel:
-                    ship.refuel()
-                elif args.jettison:
-                    ship.jettison(args.jettison[0], int(args.jettison[1]))
-                elif args.sell:
-                    ship.sell(args.sell)
-                elif args.purchase:
-                    ship.purchase(args.purchase[0], int(args.purchase[1]))
-                elif args.deliver:
-                    ship.deliver_to_contract(*args.deliver)
-                elif args.negotiate:
-                    ship.negotiate_contract()
-                else:
-                    print(f"{args.id}: SHIP DATA")
-                    print(ship.model_dump_json(indent=2))
\ No newline at end of file
+    run_async(main(args))
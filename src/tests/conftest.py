@@ -0,0 +1,50 @@
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+# modules import each other from src, like the scripts do when run from there
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    """Empty in-memory database swapped in for the one login.py opens."""
+    import crud.data_version
+    import crud.market
+    import crud.transaction
+    import crud.waypoint
+    import models.crawl  # noqa: F401 register every table on Base.metadata
+    import models.data_version  # noqa: F401
+    import models.market  # noqa: F401
+    import models.system  # noqa: F401
+    import models.waypoint  # noqa: F401
+    from models import Base
+    engine = create_engine("sqlite://", poolclass=StaticPool,
+                           connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    for module in (crud.data_version, crud.market, crud.transaction, crud.waypoint):
+        if hasattr(module, "engine"):
+            monkeypatch.setattr(module, "engine", engine)
+    # versions read from an earlier test's database mean nothing here
+    monkeypatch.setattr(crud.data_version, "_seen", {})
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def count_queries(engine):
+    @contextmanager
+    def counting():
+        statements = []
+
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return counting
@@ -0,0 +1,67 @@
+import pytest
+from sqlalchemy.orm import Session
+from crud.market import _store_market_in_db, get_markets_in_system
+from crud.waypoint import _get_waypoint_from_db, _record_to_schema, get_waypoints_in_system, upsert_waypoints
+from schemas.market import Good, Market, MarketTradeGood, MarketTransaction
+from schemas.navigation import Waypoint, WaypointModifier, WaypointTrait
+
+# one select for the rows plus one per relationship in _WAYPOINT_LOAD_OPTIONS / _MARKET_LOAD_OPTIONS
+WAYPOINT_QUERIES = 1 + 3
+MARKET_QUERIES = 1 + 4
+
+MARKETPLACE = WaypointTrait(symbol="MARKETPLACE", name="Marketplace", description="d")
+SHIPYARD = WaypointTrait(symbol="SHIPYARD", name="Shipyard", description="d")
+UNSTABLE = WaypointModifier(symbol="UNSTABLE", name="Unstable", description="d")
+IRON = Good(symbol="IRON", name="Iron", description="d")
+FUEL = Good(symbol="FUEL", name="Fuel", description="d")
+
+
+def _waypoints(n: int):
+    return [Waypoint(symbol=f"X1-A-B{i}", type="PLANET", x=i, y=i, orbits="X1-A-B0" if i else None,
+                     traits=[MARKETPLACE, SHIPYARD], modifiers=[UNSTABLE], isUnderConstruction=False)
+            for i in range(n)]
+
+
+def _store_markets(engine, n: int):
+    with Session(engine) as session:
+        for i in range(n):
+            _store_market_in_db(Market(symbol=f"X1-A-B{i}", exports=[IRON], imports=[FUEL], exchange=[],
+                                       tradeGoods=[MarketTradeGood(symbol="IRON", type="EXPORT", tradeVolume=10,
+                                                                   supply="HIGH", purchasePrice=9, sellPrice=7)],
+                                       transactions=[MarketTransaction(waypointSymbol=f"X1-A-B{i}", shipSymbol="S-1",
+                                                                       tradeSymbol="IRON", type="PURCHASE", units=1,
+                                                                       pricePerUnit=9, totalPrice=9,
+                                                                       timestamp=f"2024-01-01T00:00:{t:02}Z")
+                                                     for t in range(3)]),
+                                session)
+
+
+@pytest.mark.parametrize("n", [1, 25])
+def test_waypoints_in_system_load_in_fixed_queries(engine, count_queries, n):
+    upsert_waypoints(_waypoints(n))
+    with count_queries() as statements:
+        waypoints = get_waypoints_in_system("X1-A")
+    assert len(waypoints) == n
+    assert all(len(wp.traits) == 2 and len(wp.modifiers) == 1 for wp in waypoints)
+    assert len(statements) == WAYPOINT_QUERIES
+
+
+def test_single_waypoint_loads_in_fixed_queries(engine, count_queries):
+    upsert_waypoints(_waypoints(5))
+    with Session(engine) as session, count_queries() as statements:
+        wp = _record_to_schema(_get_waypoint_from_db("X1-A-B0", session))
+    assert len(wp.orbitals) == 4 and wp.traits == [MARKETPLACE, SHIPYARD]
+    assert len(statements) == WAYPOINT_QUERIES
+
+
+@pytest.mark.parametrize("n", [1, 25])
+def test_markets_in_system_load_in_fixed_queries(engine, count_queries, n):
+    upsert_waypoints(_waypoints(n))
+    _store_markets(engine, n)
+    with count_queries() as statements:
+        markets = get_markets_in_system("X1-A")
+    assert len(markets) == n
+    assert all(m.exports == [IRON] and m.imports == [FUEL] and len(m.tradeGoods) == 1 for m in markets)
+    # the ever growing transaction history stays in the database
+    assert all(m.transactions is None for m in markets)
+    assert len(statements) == MARKET_QUERIES
@@ -0,0 +1,89 @@
+import asyncio
+import pytest
+import schemas.ship
+from schemas.market import Market
+from pathfinding.planner import PlanAction, PlanStep, RoutePlan
+from schemas.ship import Ship
+from utils.utils import utcnow
+
+WAYPOINT = {"symbol": "X1-A-B", "type": "PLANET", "systemSymbol": "X1-A", "x": 0, "y": 0}
+REQUIREMENTS = {"power": 1, "crew": 0, "slots": 0}
+COMPONENT = {"symbol": "C", "name": "c", "description": "d", "condition": 1, "integrity": 1,
+             "requirements": REQUIREMENTS}
+
+
+@pytest.fixture
+def ship(monkeypatch, tmp_path):
+    # ships log to data/logs/ships under the working directory
+    (tmp_path / "data" / "logs" / "ships").mkdir(parents=True)
+    monkeypatch.chdir(tmp_path)
+    now = utcnow().isoformat()
+    return Ship.model_validate({
+        "symbol": "S-1", "registration": {"name": "S-1", "factionSymbol": "VOID", "role": "HAULER"},
+        "nav": {"systemSymbol": "X1-A", "waypointSymbol": "X1-A-B", "status": "IN_ORBIT", "flightMode": "CRUISE",
+                "route": {"destination": WAYPOINT, "origin": WAYPOINT, "departureTime": now, "arrival": now}},
+        "fuel": {"current": 100, "capacity": 100, "consumed": {"amount": 0, "timestamp": now}},
+        "cooldown": {"shipSymbol": "S-1", "totalSeconds": 0, "remainingSeconds": 0},
+        "cargo": {"capacity": 10, "units": 0, "inventory": []},
+        "frame": COMPONENT | {"moduleSlots": 1, "mountingPoints": 1, "fuelCapacity": 100},
+        "reactor": COMPONENT | {"powerOutput": 1}, "engine": COMPONENT | {"speed": 10}, "mounts": []})
+
+
+def test_route_navigate_accepts_a_market(ship, monkeypatch):
+    followed = []
+
+    async def follow_plan(self, destination_symbol, objective):
+        followed.append(destination_symbol)
+        return True
+
+    async def plan_interstellar_route(*args):
+        raise AssertionError("the market is in the ship's own system")
+    monkeypatch.setattr(Ship, "follow_plan", follow_plan)
+    monkeypatch.setattr(schemas.ship, "async_plan_interstellar_route", plan_interstellar_route)
+    market = Market(symbol="X1-A-C", exports=[], imports=[], exchange=[])
+    assert asyncio.run(ship.route_navigate(market))
+    assert followed == ["X1-A-C"]
+
+
+def test_follow_plan_stops_when_refuel_fails(ship, monkeypatch):
+    calls = []
+
+    async def plan_route(*args):
+        return RoutePlan(steps=[PlanStep(action=PlanAction.NAVIGATE, waypoint_symbol="X1-A-C"),
+                                PlanStep(action=PlanAction.REFUEL, waypoint_symbol="X1-A-C"),
+                                PlanStep(action=PlanAction.NAVIGATE, waypoint_symbol="X1-A-D")],
+                         travel_time=1, fuel_used=1)
+
+    def step(name, result):
+        async def f(self, *args, **kwargs):
+            calls.append(name)
+            return result
+        return f
+    monkeypatch.setattr(schemas.ship, "async_plan_route", plan_route)
+    monkeypatch.setattr(Ship, "navigate", step("navigate", True))
+    monkeypatch.setattr(Ship, "dock", step("dock", True))
+    monkeypatch.setattr(Ship, "refuel", step("refuel", False))
+    monkeypatch.setattr(Ship, "orbit", step("orbit", True))
+    assert not asyncio.run(ship.follow_plan("X1-A-D"))
+    assert calls == ["navigate", "dock", "refuel"]
+
+
+def test_refuel_stops_skip_the_market_snapshot(ship, monkeypatch):
+    docks = []
+
+    async def plan_route(*args):
+        return RoutePlan(steps=[PlanStep(action=PlanAction.REFUEL, waypoint_symbol="X1-A-B")],
+                         travel_time=0, fuel_used=0)
+
+    async def dock(self, snapshot_market=True):
+        docks.append(snapshot_market)
+        return True
+
+    async def succeed(self, *args):
+        return True
+    monkeypatch.setattr(schemas.ship, "async_plan_route", plan_route)
+    monkeypatch.setattr(Ship, "dock", dock)
+    monkeypatch.setattr(Ship, "refuel", succeed)
+    monkeypatch.setattr(Ship, "orbit", succeed)
+    assert asyncio.run(ship.follow_plan("X1-A-B"))
+    assert docks == [False]
@@ -0,0 +1,41 @@
+from sqlalchemy.orm import Session
+import crud.data_version
+from crud.data_version import bump_version
+from crud.waypoint import system_data_version, upsert_waypoints
+from schemas.navigation import Waypoint, WaypointTrait
+
+MARKETPLACE = WaypointTrait(symbol="MARKETPLACE", name="Marketplace", description="d")
+
+
+def _waypoint(symbol="X1-A-B0", x=0, y=0, traits=None):
+    return Waypoint(symbol=symbol, type="PLANET", x=x, y=y, traits=traits, isUnderConstruction=False)
+
+
+def test_refreshing_unchanged_waypoint_keeps_version(engine):
+    upsert_waypoints([_waypoint(traits=[MARKETPLACE])])
+    version = system_data_version("X1-A")
+    upsert_waypoints([_waypoint(traits=[MARKETPLACE])])
+    upsert_waypoints([_waypoint()])
+    assert system_data_version("X1-A") == version
+
+
+def test_graph_changes_bump_version(engine):
+    upsert_waypoints([_waypoint()])
+    version = system_data_version("X1-A")
+    upsert_waypoints([_waypoint(symbol="X1-A-B1", x=3)])
+    assert system_data_version("X1-A") == version + 1
+    upsert_waypoints([_waypoint(x=5)])
+    assert system_data_version("X1-A") == version + 2
+    upsert_waypoints([_waypoint(x=5, traits=[MARKETPLACE])])
+    assert system_data_version("X1-A") == version + 3
+
+
+def test_version_bumped_by_another_process_is_seen(engine, monkeypatch):
+    version = system_data_version("X1-A")
+    # what a shard or the crawler commits, this process is not told about it
+    with Session(engine) as session:
+        bump_version("system:X1-A", session)
+        session.commit()
+    assert system_data_version("X1-A") == version
+    monkeypatch.setattr(crud.data_version, "VERSION_RECHECK_SECONDS", 0)
+    assert system_data_version("X1-A") == version + 1
@@ -0,0 +1,28 @@
+from pathfinding.graph import SystemGraph
+from pathfinding.trade import rank_trade_routes
+from schemas.navigation import ShipNavFlightMode, Waypoint
+
+
+def _graph():
+    return SystemGraph("X1-A", [Waypoint(symbol=f"X1-A-M{i}", type="PLANET", x=10 * i, y=0, traits=[])
+                                for i in range(2)], 0)
+
+
+def _rank(rows, cargo_capacity=40, credits=None):
+    return rank_trade_routes(rows, cargo_capacity, 400, 30, None, credits, 1, ShipNavFlightMode.CRUISE, graph=_graph())
+
+
+def test_units_capped_at_trade_volume():
+    route, = _rank([("X1-A-M0", "IRON", 10, 8, 15), ("X1-A-M1", "IRON", 25, 20, 30)])
+    assert route.units == 15 and route.profit == 15 * (20 - 10)
+
+
+def test_sell_market_volume_caps_units():
+    route, = _rank([("X1-A-M0", "IRON", 10, 8, 30), ("X1-A-M1", "IRON", 25, 20, 5)])
+    assert route.units == 5
+
+
+def test_cargo_and_credits_still_cap_units():
+    rows = [("X1-A-M0", "IRON", 10, 8, 100), ("X1-A-M1", "IRON", 25, 20, 100)]
+    assert _rank(rows)[0].units == 40
+    assert _rank(rows, credits=95)[0].units == 9
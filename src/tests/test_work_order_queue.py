@@ -0,0 +1,36 @@
+import asyncio
+from types import SimpleNamespace
+import numpy as np
+import management.work_orders.queue as queue_module
+from management.work_orders.queue import RETRY_BASE, PendingWorkOrder, WorkOrderKind, WorkOrderQueue
+from utils.utils import utcnow
+
+SHIP = SimpleNamespace(symbol="S-1")
+
+
+def _queue(monkeypatch):
+    async def completion_times(ships, orders):
+        return np.zeros((len(ships), len(orders)))
+    monkeypatch.setattr(queue_module, "async_completion_times", completion_times)
+    queue = WorkOrderQueue()
+    queue.push(PendingWorkOrder("K", WorkOrderKind.CONTRACT, "X1-A-B", build=lambda ship: None))
+    return queue
+
+
+def test_failed_order_waits_before_it_is_handed_out_again(monkeypatch):
+    queue = _queue(monkeypatch)
+    assert len(asyncio.run(queue.async_assign([SHIP]))) == 1
+    queue.finish("K", succeeded=False)
+    queue.push(PendingWorkOrder("K", WorkOrderKind.CONTRACT, "X1-A-B", build=lambda ship: None))
+    assert asyncio.run(queue.async_assign([SHIP])) == []
+    assert queue.next_retry() > utcnow() + RETRY_BASE * 0.9
+
+
+def test_backoff_doubles_and_resets_on_success(monkeypatch):
+    queue = _queue(monkeypatch)
+    queue.finish("K", succeeded=False)
+    queue.finish("K", succeeded=False)
+    assert queue.retry_at("K") > utcnow() + RETRY_BASE * 1.9
+    queue.finish("K", succeeded=True)
+    assert queue.retry_at("K") is None
+    assert len(asyncio.run(queue.async_assign([SHIP]))) == 1
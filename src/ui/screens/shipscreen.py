@@ -37,8 +37,8 @@ class ShipInventoryTable(CustomDataTable):
             self.ship.cargo.units}/{self.ship.cargo.capacity}"
         self.update(self.ship)
 
-    def on_data_table_row_selected(self, row_selected):
-        self.ship.jettison(row_selected.row_key.value)
+    async def on_data_table_row_selected(self, row_selected):
+        await self.ship.jettison(row_selected.row_key.value)
 
     def update(self, ship):
         inventory = self.ship.cargo.items()
@@ -127,17 +127,17 @@ class ShipScreen(Screen):
 
         yield Footer()
 
-    def action_dock(self) -> None:
-        self.ship.dock()
+    async def action_dock(self) -> None:
+        await self.ship.dock()
 
-    def action_orbit(self) -> None:
-        self.ship.orbit()
+    async def action_orbit(self) -> None:
+        await self.ship.orbit()
 
-    def action_survey(self) -> None:
-        self.ship.survey()
+    async def action_survey(self) -> None:
+        await self.ship.survey()
 
-    def action_extract(self) -> None:
-        self.ship.extract()
+    async def action_extract(self) -> None:
+        await self.ship.extract()
 
     def update_mounts(self):
         self.mounts_table.clear()
@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+from enum import IntEnum
+from heapq import heapify, heappop, heappush
+from itertools import count
+from typing import Callable, List, Optional
+
+
+class Priority(IntEnum):
+    CRITICAL = 0
+    NORMAL = 1
+    BACKGROUND = 2
+
+
+class TokenBucket:
+    __slots__ = ["rate", "capacity", "tokens", "last"]
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+
+    def refill(self, now: float) -> None:
+        if now <= self.last:
+            return
+        self.tokens = min(self.capacity, self.tokens +
+                          (now - self.last) * self.rate)
+        self.last = now
+
+    def take(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_token(self, now: float) -> float:
+        return max(0.0, self.last - now) + max(0.0, (1 - self.tokens) / self.rate)
+
+    def drain(self, now: float, seconds: float) -> None:
+        self.refill(now)
+        self.tokens = 0
+        self.last = max(self.last, now + seconds)
+
+
+class _Waiter:
+    __slots__ = ["priority", "seq", "wake"]
+
+    def __init__(self, priority: Priority, seq: int) -> None:
+        self.priority = priority
+        self.seq = seq
+        self.wake: Callable[[], None] = lambda: None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class RateLimiter:
+    """Process wide token bucket scheduler shared by the sync and async API clients.
+
+    A request spends a token from the sustained bucket when one is available and
+    falls back to the burst pool otherwise. Waiting requests are served strictly
+    in priority order, so only the head of the queue ever sleeps on the buckets.
+    """
+
+    def __init__(self, per_second: float, burst: int, burst_period: float) -> None:
+        self.sustained = TokenBucket(per_second, per_second)
+        self.burst = TokenBucket(burst / burst_period, burst)
+        self._lock = threading.Lock()
+        self._waiting: List[_Waiter] = []
+        self._counter = count()
+
+    def _take_token(self) -> float:
+        now = time.monotonic()
+        self.sustained.refill(now)
+        self.burst.refill(now)
+        if self.sustained.take() or self.burst.take():
+            return 0.0
+        return min(self.sustained.time_until_token(now), self.burst.time_until_token(now))
+
+    def _poll(self, waiter: _Waiter) -> Optional[float]:
+        # 0 when the token was granted, the delay until the next token when we are
+        # at the head of the queue and None when someone more urgent is ahead of us
+        with self._lock:
+            if self._waiting[0] is not waiter:
+                return None
+            delay = self._take_token()
+            if delay == 0:
+                heappop(self._waiting)
+                if self._waiting:
+                    self._waiting[0].wake()
+            return delay
+
+    def _enqueue(self, priority: Priority) -> _Waiter:
+        waiter = _Waiter(priority, next(self._counter))
+        with self._lock:
+            heappush(self._waiting, waiter)
+        return waiter
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        with self._lock:
+            if waiter not in self._waiting:
+                return
+            was_head = self._waiting[0] is waiter
+            self._waiting.remove(waiter)
+            heapify(self._waiting)
+            if was_head and self._waiting:
+                self._waiting[0].wake()
+
+    def penalize(self, seconds: float) -> None:
+        """Empty both buckets and hold them empty for the given time, used when the server pushes back."""
+        with self._lock:
+            now = time.monotonic()
+            self.sustained.drain(now, seconds)
+            self.burst.drain(now, seconds)
+
+    def acquire(self, priority: Priority = Priority.NORMAL) -> None:
+        waiter = self._enqueue(priority)
+        event = threading.Event()
+        waiter.wake = event.set
+        granted = False
+        try:
+            while True:
+                event.clear()
+                delay = self._poll(waiter)
+                if delay == 0:
+                    granted = True
+                    return
+                event.wait(delay)
+        finally:
+            if not granted:
+                self._abandon(waiter)
+
+    async def async_acquire(self, priority: Priority = Priority.NORMAL) -> None:
+        loop = asyncio.get_running_loop()
+        waiter = self._enqueue(priority)
+        event = asyncio.Event()
+        waiter.wake = lambda: loop.call_soon_threadsafe(event.set)
+        granted = False
+        try:
+            while True:
+                event.clear()
+                delay = self._poll(waiter)
+                if delay == 0:
+                    granted = True
+                    return
+                try:
+                    await asyncio.wait_for(event.wait(), delay)
+                except TimeoutError:
+                    pass
+        finally:
+            if not granted:
+                self._abandon(waiter)
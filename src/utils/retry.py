@@ -0,0 +1,57 @@
+from datetime import UTC, datetime
+from email.utils import parsedate_to_datetime
+from random import uniform
+from typing import Optional
+
+from utils.utils import utcnow
+
+MAX_RETRIES = 5
+BASE_DELAY = 0.5
+MAX_DELAY = 60
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def backoff(attempt: int) -> float:
+    # exponential backoff with jitter so ships that failed together do not retry together
+    delay = min(MAX_DELAY, BASE_DELAY * 2 ** attempt)
+    return uniform(delay / 2, delay)
+
+
+def _parse_retry_after_header(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when: datetime = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=UTC)
+    return max(0.0, (when - utcnow()).total_seconds())
+
+
+def _parse_retry_after_body(response) -> Optional[float]:
+    # rate limit errors carry {"error": {"code": 429, "data": {"retryAfter": seconds, ...}}}
+    try:
+        data = response.json()["error"]["data"]
+        return max(0.0, float(data["retryAfter"]))
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def retry_after(response) -> Optional[float]:
+    if (delay := _parse_retry_after_header(response.headers.get("Retry-After"))) is not None:
+        return delay
+    return _parse_retry_after_body(response)
+
+
+def retry_delay(attempt: int, response) -> Optional[float]:
+    """Seconds to wait before retrying the request, or None when the response should be returned as is."""
+    if response.status_code not in RETRY_STATUSES or attempt >= MAX_RETRIES:
+        return None
+    if (delay := retry_after(response)) is not None:
+        return min(MAX_DELAY, delay) + uniform(0, BASE_DELAY)
+    return backoff(attempt)
@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta
+from heapq import heappop, heappush
+from itertools import count
+from typing import List, Optional, Tuple
+from utils.utils import utcnow
+
+
+class Scheduler:
+    """Heap of wall clock deadlines served by a single timer on the event loop.
+
+    Ships waiting for an arrival, a cooldown or a contract deadline park a future here
+    and cost nothing until it is their turn.
+    """
+
+    def __init__(self) -> None:
+        self._deadlines: List[Tuple[datetime, int, asyncio.Future]] = []
+        self._counter = count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def wait_until(self, when: datetime) -> asyncio.Future:
+        """Future resolved once when has passed, cancelling it just drops the wait."""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # futures parked on a previous loop can never be woken, start over
+            self._deadlines.clear()
+            self._timer = None
+            self._loop = loop
+        future = loop.create_future()
+        heappush(self._deadlines, (when, next(self._counter), future))
+        if self._deadlines[0][2] is future:
+            self._arm()
+        return future
+
+    async def sleep_until(self, when: datetime) -> None:
+        if when > utcnow():
+            await self.wait_until(when)
+
+    async def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            await self.wait_until(utcnow() + timedelta(seconds=seconds))
+
+    def _arm(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self._deadlines:
+            delay = (self._deadlines[0][0] - utcnow()).total_seconds()
+            self._timer = self._loop.call_later(max(0.0, delay), self._fire)
+
+    def _fire(self) -> None:
+        self._timer = None
+        now = utcnow()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, future = heappop(self._deadlines)
+            if not future.done():
+                future.set_result(None)
+        self._arm()
+
+
+scheduler = Scheduler()
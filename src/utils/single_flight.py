@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+from utils.rate_limiter import Priority
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlightStats:
+    __slots__ = ["issued", "merged"]
+
+    def __init__(self) -> None:
+        self.issued = 0
+        self.merged = 0
+
+    @property
+    def saved_ratio(self) -> float:
+        total = self.issued + self.merged
+        return self.merged / total if total else 0.0
+
+    def __repr__(self) -> str:
+        return f"SingleFlightStats(issued={self.issued}, merged={self.merged}, saved={self.saved_ratio:.0%})"
+
+
+class SingleFlight:
+    """Merges identical calls already in flight into one, every caller gets the same result or exception.
+
+    A caller only joins a call made at the same or a more urgent priority, so a critical
+    request never ends up waiting behind a background one in the rate limiter.
+    Sync and async calls are tracked apart, their results are different types anyway.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._sync: Dict[Hashable, Tuple[Priority, Future]] = {}
+        self._async: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], Tuple[Priority, asyncio.Task]] = {}
+        self.stats = SingleFlightStats()
+
+    def do(self, key: Hashable, priority: Priority, f: Callable[[], T]) -> T:
+        with self._lock:
+            flight = self._sync.get(key)
+            if flight is not None and flight[0] <= priority:
+                self.stats.merged += 1
+                future = flight[1]
+            else:
+                self.stats.issued += 1
+                future = Future()
+                self._sync[key] = (priority, future)
+                flight = None
+        if flight is not None:
+            logger.debug(f"joined in flight call {key}")
+            return future.result()
+        try:
+            future.set_result(f())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                if self._sync.get(key, (None, None))[1] is future:
+                    del self._sync[key]
+        return future.result()
+
+    async def async_do(self, key: Hashable, priority: Priority, f: Callable[[], Awaitable[T]]) -> T:
+        loop_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            flight = self._async.get(loop_key)
+            if flight is not None and flight[0] <= priority:
+                self.stats.merged += 1
+                task = flight[1]
+                logger.debug(f"joined in flight call {key}")
+            else:
+                self.stats.issued += 1
+                task = asyncio.ensure_future(f())
+                self._async[loop_key] = (priority, task)
+                task.add_done_callback(lambda _: self._forget(loop_key, task))
+        # a waiter giving up must not cancel the call for everyone else
+        return await asyncio.shield(task)
+
+    def _forget(self, loop_key, task: asyncio.Task) -> None:
+        with self._lock:
+            if self._async.get(loop_key, (None, None))[1] is task:
+                del self._async[loop_key]
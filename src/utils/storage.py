@@ -0,0 +1,140 @@
+import atexit
+import sqlite3
+import threading
+from multiprocessing import parent_process
+from os import path
+from itertools import count
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.pool import QueuePool
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+
+class StorageProfile(BaseModel):
+    journal_mode: str = "WAL"
+    # with WAL, NORMAL only syncs at checkpoints, a crash can lose the last commits but never corrupts
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024
+    # negative values are KiB for sqlite
+    cache_size: int = -64 * 1024
+    temp_store: str = "MEMORY"
+    busy_timeout_ms: int = 5000
+    foreign_keys: bool = False
+    pool_size: int = 8
+    max_overflow: int = 16
+    # keep the whole database in memory, loaded from and periodically copied back to the file,
+    # journal_mode then only accepts MEMORY or OFF. only the main process writes the copy back,
+    # shards and planning workers get a private copy that is dropped when they exit
+    in_memory: bool = False
+    snapshot_interval: Optional[float] = 300
+
+
+PROFILES: Dict[str, StorageProfile] = {
+    "default": StorageProfile(),
+    "durable": StorageProfile(synchronous="FULL"),
+    "simulation": StorageProfile(journal_mode="MEMORY", synchronous="OFF", in_memory=True),
+}
+
+
+_memory_databases = count()
+_memory_keepers: List[sqlite3.Connection] = []
+
+
+def _database_file(url: str) -> Optional[str]:
+    prefix = "sqlite:///"
+    if url.startswith(prefix) and len(url) > len(prefix):
+        return url[len(prefix):]
+    return None
+
+
+def _apply_pragmas(profile: StorageProfile):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile.journal_mode}")
+        if not profile.in_memory:
+            cursor.execute(f"PRAGMA mmap_size={profile.mmap_size}")
+        cursor.execute(f"PRAGMA synchronous={profile.synchronous}")
+        cursor.execute(f"PRAGMA cache_size={profile.cache_size}")
+        cursor.execute(f"PRAGMA temp_store={profile.temp_store}")
+        cursor.execute(f"PRAGMA busy_timeout={profile.busy_timeout_ms}")
+        cursor.execute(
+            f"PRAGMA foreign_keys={'ON' if profile.foreign_keys else 'OFF'}")
+        cursor.close()
+    return on_connect
+
+
+def create_storage_engine(url: str, profile: StorageProfile = PROFILES["default"]) -> Engine:
+    """Engine for a sqlite url tuned by profile, shared by every coroutine and thread of the process."""
+    database = _database_file(url)
+    if profile.in_memory:
+        # sqlite's memdb vfs lets every connection of the process open the same memory database with
+        # the usual locking, so the db thread, the refresh workers and snapshots each get their own
+        name = f"/spacetraders-{next(_memory_databases)}"
+        memory_uri = f"file:{name}?vfs=memdb"
+        # the database is freed when its last connection closes, this one keeps it alive
+        _memory_keepers.append(sqlite3.connect(memory_uri, uri=True, check_same_thread=False))
+        engine = create_engine(f"sqlite:///{memory_uri}&uri=true", poolclass=QueuePool,
+                               pool_size=profile.pool_size, max_overflow=profile.max_overflow,
+                               connect_args={"check_same_thread": False,
+                                             "timeout": profile.busy_timeout_ms / 1000})
+    else:
+        engine = create_engine(url, poolclass=QueuePool, pool_size=profile.pool_size,
+                               max_overflow=profile.max_overflow,
+                               connect_args={"check_same_thread": False,
+                                             "timeout": profile.busy_timeout_ms / 1000})
+    event.listen(engine, "connect", _apply_pragmas(profile))
+    if profile.in_memory and database:
+        if path.exists(database):
+            restore_snapshot(engine, database)
+        if parent_process() is not None:
+            # a child's stale copy must never overwrite what the main process saved
+            logger.info(f"child process, {database} is not snapshotted from here")
+        else:
+            if profile.snapshot_interval:
+                start_snapshots(engine, database, profile.snapshot_interval)
+            atexit.register(snapshot, engine, database)
+    return engine
+
+
+def snapshot(engine: Engine, database: str) -> None:
+    """Copy the whole database to a file with sqlite's online backup, readers and writers keep going."""
+    connection = engine.raw_connection()
+    try:
+        target = sqlite3.connect(database)
+        try:
+            connection.driver_connection.backup(target)
+        finally:
+            target.close()
+    finally:
+        connection.close()
+    logger.info(f"database snapshot written to {database}")
+
+
+def restore_snapshot(engine: Engine, database: str) -> None:
+    connection = engine.raw_connection()
+    try:
+        source = sqlite3.connect(database)
+        try:
+            source.backup(connection.driver_connection)
+        finally:
+            source.close()
+    finally:
+        connection.close()
+    logger.info(f"database loaded from {database}")
+
+
+def start_snapshots(engine: Engine, database: str, interval: float) -> threading.Event:
+    """Snapshot every interval seconds on a daemon thread until the returned event is set."""
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval):
+            try:
+                snapshot(engine, database)
+            except sqlite3.Error as e:
+                logger.error(f"database snapshot failed: {e!r}")
+    threading.Thread(target=run, name="db-snapshot", daemon=True).start()
+    return stop
@@ -0,0 +1,22 @@
+import asyncio
+from typing import Coroutine, Set
+from logging import getLogger
+
+logger = getLogger(__name__)
+
+# the event loop only keeps weak references to tasks, hold on to them until they finish
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _task_done(task: asyncio.Task) -> None:
+    _background_tasks.discard(task)
+    if not task.cancelled() and (e := task.exception()):
+        logger.error(f"background task {task.get_name()} failed: {e!r}")
+
+
+def spawn(coroutine: Coroutine, name: str = None) -> asyncio.Task:
+    """Run coroutine in the background without awaiting it, errors are logged instead of lost."""
+    task = asyncio.create_task(coroutine, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_task_done)
+    return task